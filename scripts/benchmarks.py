@@ -0,0 +1,1006 @@
+"""
+scripts\\benchmarks.py
+
+Micro-benchmarks for the performance-sensitive parts of the NHANES pipeline.
+
+Run all benchmarks, or only the named ones:
+    python scripts/benchmarks.py
+    python scripts/benchmarks.py xpt_reader
+"""
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import get_context
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, Optional
+
+from scripts.config import RAW_DATA_DIR, datasets
+from scripts.xpt_reader import read_xpt_columns
+from scripts.feature_engineering import (
+    THRESHOLD_TABLE,
+    SCALAR_CATEGORIZERS,
+    categorize_column,
+    label_meds,
+    label_meds_column,
+    glucose_flags,
+    glucose_flag_columns
+)
+from scripts.calculating_usda_hei_score import (
+    FPED_NUTRIENT_COLS,
+    build_fped_matrix,
+    aggregate_fped_intake,
+    score_recall_days,
+    stack_recall_days
+)
+from scripts.data_loading import load_dataset
+from scripts.dataset_specs import DATASET_SPECS
+from scripts.db_utils import (
+    aggregate_sql,
+    bulk_load,
+    clear_query_cache,
+    close_connection_pools,
+    create_connection,
+    create_nhanes_tables,
+    create_participant_wide,
+    create_table_indexes,
+    export_query,
+    get_backend,
+    query,
+    refresh_participant_wide,
+    run_query
+)
+from scripts.pipeline_log import log_level
+from scripts.profiling import profile_stage
+from scripts.utils import (
+    pretty_path,
+    set_copy_on_write,
+    replace_close_values_with_nan,
+    normalize_participant_id,
+    PARTICIPANT_ID_DTYPES
+)
+
+# Float artifact that XPT files decode zeros into
+XPT_ARTIFACT = 5.39760534693402e-79
+
+
+def time_call(func: Callable, repeat: int = 3) -> float:
+    """
+    Runs a function several times and returns the best wall time in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# 1. Column-projected XPT reader vs pandas.read_sas
+def benchmark_xpt_reader(raw_data_dir: Path = RAW_DATA_DIR, repeat: int = 3) -> pd.DataFrame:
+    """
+    Compares pd.read_sas (full decode, then column slice) with the column-projected
+    reader on every .xpt file in the raw data folder.
+
+    Args:
+        raw_data_dir: Folder containing the raw .xpt files.
+        repeat: Number of timed runs per reader; the best run is reported.
+
+    Returns:
+        pd.DataFrame: One row per file with timings and speed-up.
+    """
+    columns_by_file = {
+        Path(info["file_path"]).name: info.get("columns") for info in datasets.values()
+    }
+
+    results = []
+    for path in sorted(Path(raw_data_dir).glob("*.xpt")):
+        columns = columns_by_file.get(path.name)
+        pandas_time = time_call(lambda: pd.read_sas(path, format="xport")[columns or slice(None)], repeat)
+        projected_time = time_call(lambda: read_xpt_columns(path, columns), repeat)
+        results.append({
+            "file": pretty_path(path),
+            "columns": len(columns) if columns else "all",
+            "read_sas_s": round(pandas_time, 4),
+            "projected_s": round(projected_time, 4),
+            "speedup": round(pandas_time / projected_time, 2),
+        })
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 2. Vectorized replace_close_values_with_nan vs the per-cell Series.apply version
+def _replace_close_values_apply(df: pd.DataFrame, target: float, tolerance: float, columns: List[str]) -> pd.DataFrame:
+    """
+    Reference implementation that applies a Python lambda to every cell.
+    """
+    df = df.copy()
+    for col in columns:
+        df[col] = df[col].apply(
+            lambda x: np.nan if pd.notna(x) and abs(x - target) <= tolerance else x
+        )
+    return df
+
+
+def make_artifact_frame(n_rows: int = 1_000_000, n_cols: int = 3, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a synthetic float frame where about 1% of cells hold the XPT artifact
+    and 1% are missing.
+    """
+    rng = np.random.default_rng(seed)
+    values = rng.gamma(2.0, 50.0, size=(n_rows, n_cols))
+    draws = rng.random(size=(n_rows, n_cols))
+    values[draws < 0.01] = XPT_ARTIFACT
+    values[(draws >= 0.01) & (draws < 0.02)] = np.nan
+    return pd.DataFrame(values, columns=[f"col_{i}" for i in range(n_cols)])
+
+
+def benchmark_replace_close_values(n_rows: int = 1_000_000, repeat: int = 3) -> pd.DataFrame:
+    """
+    Times the Series.apply reference against the vectorized replace_close_values_with_nan
+    (copying and in-place) on a synthetic frame. Their results are compared in
+    tests/test_vectorized_parity.py.
+
+    Args:
+        n_rows: Number of rows in the synthetic frame.
+        repeat: Number of timed runs per implementation; the best run is reported.
+
+    Returns:
+        pd.DataFrame: One row per implementation with total time and cost per row.
+    """
+    df = make_artifact_frame(n_rows)
+    columns = df.columns.tolist()
+    tolerance = 1e-80
+
+    implementations = {
+        "Series.apply": lambda: _replace_close_values_apply(df, XPT_ARTIFACT, tolerance, columns),
+        "vectorized": lambda: replace_close_values_with_nan(df, XPT_ARTIFACT, tolerance, columns),
+        "vectorized (inplace)": lambda: replace_close_values_with_nan(
+            df.copy(), XPT_ARTIFACT, tolerance, columns, inplace=True
+        ),
+    }
+
+    results = []
+    for label, func in implementations.items():
+        seconds = time_call(func, repeat=1 if label == "Series.apply" else repeat)
+        results.append({
+            "implementation": label,
+            "rows": n_rows,
+            "columns": len(columns),
+            "total_s": round(seconds, 4),
+            "ns_per_row": round(seconds / n_rows * 1e9, 1),
+        })
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 3. Vectorized participant id normalization and merge cost per id dtype
+def benchmark_participant_ids(n_rows: int = 1_000_000, repeat: int = 3) -> pd.DataFrame:
+    """
+    Compares the per-row `str(int(x))` conversion with normalize_participant_id for
+    every supported id dtype, reporting conversion time, memory and the time to merge
+    two frames on the normalized ids.
+
+    Args:
+        n_rows: Number of synthetic SEQN values (about 1% missing).
+        repeat: Number of timed runs per implementation; the best run is reported.
+
+    Returns:
+        pd.DataFrame: One row per implementation.
+    """
+    rng = np.random.default_rng(0)
+    seqn = pd.Series(rng.permutation(n_rows) + 130_000, dtype=np.float64, name="participant_id")
+    seqn[rng.random(n_rows) < 0.01] = np.nan
+
+    implementations = {"Series.apply (str)": lambda: seqn.apply(
+        lambda x: str(int(x)) if pd.notnull(x) else np.nan
+    )}
+    for id_dtype in PARTICIPANT_ID_DTYPES:
+        implementations[f"vectorized ({id_dtype})"] = lambda id_dtype=id_dtype: normalize_participant_id(seqn, id_dtype)
+
+    results = []
+    for label, func in implementations.items():
+        ids = func()
+        # Missing ids would all match each other, so merge on the known ids only
+        left = pd.DataFrame({"participant_id": ids, "x": np.arange(n_rows)}).dropna()
+        right = left.sample(frac=1.0, random_state=0)
+        seconds = time_call(func, repeat=1 if label.startswith("Series.apply") else repeat)
+        merge_seconds = time_call(lambda: left.merge(right, on="participant_id"), repeat)
+        results.append({
+            "implementation": label,
+            "rows": n_rows,
+            "convert_s": round(seconds, 4),
+            "memory_mb": round(ids.memory_usage(deep=True) / 1024 ** 2, 1),
+            "merge_s": round(merge_seconds, 4),
+        })
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 4. Vectorized feature categorizers vs the scalar functions applied row by row
+def _edge_values(rng: np.random.Generator, edges: List[float], n_rows: int) -> np.ndarray:
+    """
+    Draws values around a set of edges, including the edges themselves and missing values.
+    """
+    low, high = min(edges) - 50, max(edges) + 50
+    values = rng.uniform(low, high, size=n_rows)
+    picks = rng.random(n_rows)
+    values[picks < 0.1] = rng.choice(edges, size=int((picks < 0.1).sum()))
+    values[picks > 0.95] = np.nan
+    return values
+
+
+def benchmark_categorizers(n_rows: int = 200_000, repeat: int = 3) -> pd.DataFrame:
+    """
+    Times every vectorized categorizer against its scalar counterpart on values around
+    the category edges (the labels are compared in tests/test_vectorized_parity.py).
+
+    Args:
+        n_rows: Number of synthetic rows per categorizer.
+        repeat: Number of timed runs for the vectorized version; the best run is reported.
+
+    Returns:
+        pd.DataFrame: One row per categorizer with both timings and the speed-up.
+    """
+    rng = np.random.default_rng(0)
+    cases = {}
+    for name, rule in THRESHOLD_TABLE.items():
+        columns = [pd.Series(_edge_values(rng, spec["edges"], n_rows)) for spec in rule["inputs"]]
+        scalar = SCALAR_CATEGORIZERS[name]
+        cases[name] = (
+            lambda columns=columns, scalar=scalar: pd.Series(
+                [scalar(*row) for row in zip(*columns)], index=columns[0].index
+            ),
+            lambda columns=columns, name=name: categorize_column(name, *columns),
+        )
+
+    meds = pd.Series(rng.choice([0.0, 1.0, np.nan], size=n_rows))
+    cases["label_meds"] = (lambda: meds.apply(label_meds), lambda: label_meds_column(meds))
+
+    glucose = pd.Series(_edge_values(rng, [70, 140], n_rows))
+    cases["glucose_flags"] = (
+        lambda: glucose.apply(glucose_flags).apply(pd.Series),
+        lambda: glucose_flag_columns(glucose),
+    )
+
+    results = []
+    for name, (scalar_func, vector_func) in cases.items():
+        scalar_time = time_call(scalar_func, repeat=1)
+        vector_time = time_call(vector_func, repeat)
+        results.append({
+            "categorizer": name,
+            "rows": n_rows,
+            "scalar_s": round(scalar_time, 4),
+            "vectorized_s": round(vector_time, 4),
+            "speedup": round(scalar_time / vector_time, 1),
+        })
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 5. Sparse FPED matrix aggregation vs merging FPED into every food row
+def _merge_fped_intake(foods: pd.DataFrame, fped: pd.DataFrame) -> pd.DataFrame:
+    """
+    Reference implementation: wide merge on food code, then a groupby-sum.
+    """
+    merged = pd.merge(foods, fped, left_on="food_code", right_on="FOODCODE", how="inner")
+    for col in FPED_NUTRIENT_COLS:
+        merged[col + "_TOT"] = merged[col] * merged["grams_consumed"] / 100
+    merged["energy"] = merged["energy_kcal"]
+    agg_cols = [col + "_TOT" for col in FPED_NUTRIENT_COLS] + ["energy", "food_item_weight"]
+    return merged.groupby("participant_id")[agg_cols].sum().reset_index()
+
+
+def benchmark_hei_aggregation(n_participants: int = 10_000, foods_per_day: int = 15,
+                              days: int = 2, repeat: int = 3) -> pd.DataFrame:
+    """
+    Compares the merge-based HEI nutrient aggregation with the sparse participant x
+    food code matrix engine on synthetic recall data (the totals are compared in
+    tests/test_vectorized_parity.py).
+
+    Args:
+        n_participants: Number of synthetic participants.
+        foods_per_day: Food items reported per participant per recall day.
+        days: Number of recall days stacked into the food file.
+        repeat: Number of timed runs per implementation; the best run is reported.
+
+    Returns:
+        pd.DataFrame: One row per implementation.
+    """
+    rng = np.random.default_rng(0)
+    codes = np.arange(11_000_000, 11_000_000 + 7_500)
+    fped = pd.DataFrame(rng.gamma(0.5, 1.0, size=(len(codes), len(FPED_NUTRIENT_COLS))),
+                        columns=FPED_NUTRIENT_COLS)
+    fped.insert(0, "FOODCODE", codes)
+
+    n_rows = n_participants * foods_per_day * days
+    foods = pd.DataFrame({
+        "participant_id": pd.array(np.repeat(np.arange(n_participants) + 130_000, foods_per_day * days), dtype="Int64"),
+        "food_code": rng.choice(codes, size=n_rows).astype(np.float64),
+        "grams_consumed": rng.gamma(2.0, 80.0, size=n_rows),
+        "energy_kcal": rng.gamma(2.0, 90.0, size=n_rows),
+        "food_item_weight": rng.uniform(0.5, 2.0, size=n_rows),
+    })
+
+    implementations = {
+        "merge + groupby": lambda: _merge_fped_intake(foods, fped),
+        "sparse matrix": lambda: aggregate_fped_intake(foods, build_fped_matrix(fped)),
+    }
+    results = []
+    for label, func in implementations.items():
+        seconds = time_call(func, repeat)
+        results.append({
+            "implementation": label,
+            "food_rows": n_rows,
+            "total_s": round(seconds, 4),
+        })
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 6. Scaling of HEI scoring from one to two recall days
+def benchmark_hei_recall_days(n_participants: int = 10_000, foods_per_day: int = 15,
+                              repeat: int = 3) -> pd.DataFrame:
+    """
+    Times HEI scoring keyed by (participant, day) on one and two synthetic recall days,
+    with the peak memory traced while stacking and scoring. Both should roughly double
+    with the second day.
+
+    Args:
+        n_participants: Number of synthetic participants.
+        foods_per_day: Food items reported per participant per recall day.
+        repeat: Number of timed runs per day count; the best run is reported.
+
+    Returns:
+        pd.DataFrame: One row per number of recall days.
+    """
+    rng = np.random.default_rng(0)
+    codes = np.arange(11_000_000, 11_000_000 + 7_500)
+    fped = pd.DataFrame(rng.gamma(0.5, 1.0, size=(len(codes), len(FPED_NUTRIENT_COLS))),
+                        columns=FPED_NUTRIENT_COLS)
+    fped.insert(0, "FOODCODE", codes)
+    fped_matrix = build_fped_matrix(fped)
+
+    participant_ids = pd.array(np.arange(n_participants) + 130_000, dtype="Int64")
+    n_rows = n_participants * foods_per_day
+    foods, totals = {}, {}
+    for day in (1, 2):
+        foods[day] = pd.DataFrame({
+            "participant_id": np.repeat(participant_ids, foods_per_day),
+            "food_code": rng.choice(codes, size=n_rows).astype(np.float64),
+            "grams_consumed": rng.gamma(2.0, 80.0, size=n_rows),
+            "energy_kcal": rng.gamma(2.0, 90.0, size=n_rows),
+            "food_item_weight": rng.uniform(0.5, 2.0, size=n_rows),
+        })
+        totals[day] = pd.DataFrame({
+            "participant_id": participant_ids,
+            "energy_kcal": rng.gamma(8.0, 250.0, size=n_participants),
+            "satfat_g": rng.gamma(4.0, 6.0, size=n_participants),
+            "sodium_mg": rng.gamma(6.0, 550.0, size=n_participants),
+            "total_diet_weight": rng.uniform(1_000, 100_000, size=n_participants),
+        })
+
+    def score(days):
+        return score_recall_days(
+            stack_recall_days({day: foods[day] for day in days}),
+            stack_recall_days({day: totals[day] for day in days}),
+            fped_matrix
+        )
+
+    results = []
+    for days in [(1,), (1, 2)]:
+        tracemalloc.start()
+        scores = score(days)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+        seconds = time_call(lambda: score(days), repeat)
+        results.append({
+            "recall_days": len(days),
+            "food_rows": n_rows * len(days),
+            "scored_rows": len(scores),
+            "total_s": round(seconds, 4),
+            "peak_mb": round(peak_mb, 1),
+        })
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 7. Peak memory of each cleaner, with and without pandas Copy-on-Write
+def _cleaner_peak_rss(name: str, info: Dict[str, Any], copy_on_write: bool) -> Dict[str, Any]:
+    """
+    Worker: loads one raw dataset, then cleans it as a profiled stage (see scripts/profiling.py).
+
+    Returns:
+        Dict with the raw data size, the peak RSS above the RSS before cleaning, and the time.
+    """
+    from scripts.data_cleaning import CLEANING_FUNCTIONS
+
+    set_copy_on_write(copy_on_write)
+    with redirect_stdout(io.StringIO()):
+        df = load_dataset(info["file_path"], info.get("columns"), sheet_name=info.get("sheet_name"))
+
+    with redirect_stdout(io.StringIO()), profile_stage("clean", name) as record:
+        CLEANING_FUNCTIONS[name](df)
+
+    return {
+        "raw_mb": round(df.memory_usage(deep=True).sum() / 1e6, 1),
+        "peak_rss_mb": round(record["rss_delta_mb"], 1),
+        "clean_s": round(record["wall_s"], 3),
+    }
+
+
+def benchmark_cleaner_memory(
+    names: Optional[List[str]] = None,
+    dataset_config: Optional[Dict[str, Dict[str, Any]]] = None
+) -> pd.DataFrame:
+    """
+    Measures the peak RSS of each cleaner with pandas Copy-on-Write off and on.
+
+    Every run happens in a fresh process, so one cleaner's freed memory does not hide
+    the next one's allocations. Cleaned files are written to a temporary BASE_PATH and
+    discarded. Datasets whose raw file is missing are skipped.
+
+    Args:
+        names: Datasets to clean (all configured datasets by default).
+        dataset_config: Dataset config (like config.datasets). Defaults to config.datasets;
+            cycles.cycle_datasets gives the files of another (e.g. synthetic) cycle.
+
+    Returns:
+        pd.DataFrame: One row per dataset and Copy-on-Write mode.
+    """
+    dataset_config = dataset_config or datasets
+    names = [name for name in names or list(dataset_config) if Path(dataset_config[name]["file_path"]).exists()]
+
+    results = []
+    base_path = os.environ.get("BASE_PATH")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Workers read config at import, so their outputs go to the temporary folder
+        os.environ["BASE_PATH"] = tmp
+        try:
+            for name in names:
+                for copy_on_write in (False, True):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                        run = pool.submit(_cleaner_peak_rss, name, dataset_config[name], copy_on_write).result()
+                    results.append({"dataset": name, "copy_on_write": copy_on_write, **run})
+        finally:
+            if base_path is None:
+                os.environ.pop("BASE_PATH", None)
+            else:
+                os.environ["BASE_PATH"] = base_path
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 8. Bulk SQLite load vs DataFrame.to_sql
+def make_table_frames(rows_per_table: int = 10_000, scale: int = 100, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """
+    Builds synthetic frames for every NHANES table, following its schema in the dataset specs.
+
+    TEXT columns get a few category labels, INTEGER columns 0/1 flags and REAL columns
+    floats with about 5% missing values.
+
+    Args:
+        rows_per_table: Rows of one cycle (the current tables hold 3,000 to 12,000 rows).
+        scale: Multiplier of the row count.
+        seed: Random seed.
+
+    Returns:
+        Dict[str, pd.DataFrame]: Table name -> frame with participant_id and the table columns.
+    """
+    rng = np.random.default_rng(seed)
+    n_rows = rows_per_table * scale
+    frames = {}
+    for spec in DATASET_SPECS.values():
+        if "table" not in spec:
+            continue
+        table = spec["table"]
+        data = {"participant_id": pd.array(np.arange(n_rows) + 130_000, dtype="Int64")}
+        for column, sql_type in table["columns"].items():
+            if sql_type == "TEXT":
+                data[column] = rng.choice([f"{column}_{i}" for i in range(5)], size=n_rows)
+            elif sql_type == "INTEGER":
+                data[column] = rng.integers(0, 2, size=n_rows)
+            else:
+                values = rng.normal(100, 25, size=n_rows)
+                values[rng.random(n_rows) < 0.05] = np.nan
+                data[column] = values
+        frames[table["name"]] = pd.DataFrame(data)
+    return frames
+
+
+def benchmark_sqlite_load(rows_per_table: int = 10_000, scale: int = 100) -> pd.DataFrame:
+    """
+    Loads all NHANES tables at `scale` times a cycle's rows into a fresh database file:
+    with DataFrame.to_sql per table (default PRAGMAs, indexes already in place), with
+    db_utils.bulk_load, and with bulk_load again over the loaded rows (every row an upsert).
+
+    Args:
+        rows_per_table: Rows of one cycle per table.
+        scale: Multiplier of the row count (100 by default).
+
+    Returns:
+        pd.DataFrame: One row per load method.
+    """
+    frames = make_table_frames(rows_per_table, scale)
+    total_rows = sum(len(df) for df in frames.values())
+
+    def to_sql(conn: sqlite3.Connection) -> None:
+        for table_name, df in frames.items():
+            df.to_sql(table_name, conn, if_exists="append", index=False)
+        conn.commit()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for method in ["to_sql", "bulk_load", "bulk_load (upsert)"]:
+            db_path = Path(tmp) / f"{method.split()[0]}.db"
+            conn = sqlite3.connect(db_path)
+            with log_level("QUIET"):
+                if method != "bulk_load (upsert)":
+                    create_nhanes_tables(conn)
+                if method == "to_sql":
+                    for table_name in frames:
+                        create_table_indexes(conn, table_name)
+                    conn.commit()
+                start = time.perf_counter()
+                if method == "to_sql":
+                    to_sql(conn)
+                else:
+                    bulk_load(conn, frames)
+                seconds = time.perf_counter() - start
+            conn.close()
+            results.append({
+                "method": method,
+                "tables": len(frames),
+                "rows": total_rows,
+                "total_s": round(seconds, 2),
+                "rows_per_s": int(total_rows / seconds),
+                "db_mb": round(db_path.stat().st_size / 1e6, 1),
+            })
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 9. Dashboard queries: joined tables vs participant_wide
+# Each query as written on the narrow tables and on the wide table. Labels are the
+# synthetic ones of make_table_frames (e.g. 'gender_0').
+DASHBOARD_QUERIES: Dict[str, Dict[str, str]] = {
+    "weighted counts by pir": {
+        "narrow": """
+            SELECT pir_category, COUNT(*) AS n, SUM(interview_sample_weight) AS weighted_n
+            FROM demographics GROUP BY pir_category
+        """,
+        "wide": """
+            SELECT pir_category, COUNT(*) AS n, SUM(interview_sample_weight) AS weighted_n
+            FROM participant_wide GROUP BY pir_category
+        """,
+    },
+    "sleep by gender x race": {
+        "narrow": """
+            SELECT d.gender, d.race_ethnicity,
+                   SUM(d.interview_sample_weight * s.sleep_avg_hr)
+                   / SUM(CASE WHEN s.sleep_avg_hr IS NOT NULL THEN d.interview_sample_weight END) AS sleep_hr
+            FROM demographics d JOIN sleep s ON d.participant_id = s.participant_id
+            GROUP BY d.gender, d.race_ethnicity
+        """,
+        "wide": """
+            SELECT gender, race_ethnicity,
+                   SUM(interview_sample_weight * sleep_avg_hr)
+                   / SUM(CASE WHEN sleep_avg_hr IS NOT NULL THEN interview_sample_weight END) AS sleep_hr
+            FROM participant_wide
+            GROUP BY gender, race_ethnicity
+        """,
+    },
+    "weighted diet score by gender x race": {
+        "narrow": """
+            SELECT d.gender, d.race_ethnicity, di.diet_score_category,
+                   SUM(d.interview_sample_weight) AS weighted_n
+            FROM demographics d JOIN diet di ON d.participant_id = di.participant_id
+            GROUP BY d.gender, d.race_ethnicity, di.diet_score_category
+        """,
+        "wide": """
+            SELECT gender, race_ethnicity, diet_score_category,
+                   SUM(interview_sample_weight) AS weighted_n
+            FROM participant_wide
+            WHERE diet_score_category IS NOT NULL
+            GROUP BY gender, race_ethnicity, diet_score_category
+        """,
+    },
+    "bp category by pir (one gender)": {
+        "narrow": """
+            SELECT d.pir_category, b.bp_category, COUNT(*) AS n, AVG(b.systolic_avg) AS systolic
+            FROM demographics d JOIN bp b ON d.participant_id = b.participant_id
+            WHERE d.gender = 'gender_0'
+            GROUP BY d.pir_category, b.bp_category
+        """,
+        "wide": """
+            SELECT pir_category, bp_category, COUNT(*) AS n, AVG(systolic_avg) AS systolic
+            FROM participant_wide
+            WHERE gender = 'gender_0' AND bp_category IS NOT NULL
+            GROUP BY pir_category, bp_category
+        """,
+    },
+    "lifestyle by race x pir (5 tables)": {
+        "narrow": """
+            SELECT d.race_ethnicity, d.pir_category, AVG(s.sleep_avg_hr) AS sleep_hr,
+                   AVG(p.total_weekly_min) AS weekly_min, AVG(di.hei_score) AS hei_score,
+                   AVG(i.has_health_insurance = 'has_health_insurance_0') AS insured
+            FROM demographics d
+            LEFT JOIN health_insurance i ON d.participant_id = i.participant_id
+            LEFT JOIN sleep s ON d.participant_id = s.participant_id
+            LEFT JOIN physical_activity p ON d.participant_id = p.participant_id
+            LEFT JOIN diet di ON d.participant_id = di.participant_id
+            GROUP BY d.race_ethnicity, d.pir_category
+        """,
+        "wide": """
+            SELECT race_ethnicity, pir_category, AVG(sleep_avg_hr) AS sleep_hr,
+                   AVG(total_weekly_min) AS weekly_min, AVG(hei_score) AS hei_score,
+                   AVG(has_health_insurance = 'has_health_insurance_0') AS insured
+            FROM participant_wide
+            GROUP BY race_ethnicity, pir_category
+        """,
+    },
+}
+
+
+def benchmark_wide_table(rows_per_table: int = 10_000, scale: int = 10, repeats: int = 5) -> pd.DataFrame:
+    """
+    Times the dashboard queries on the joined narrow tables and on participant_wide, with
+    INTEGER and TEXT participant ids, and the cost of keeping participant_wide current:
+    a full build, a one-table refresh and a refresh of 1% of a table's rows.
+
+    Args:
+        rows_per_table: Rows of one cycle per table.
+        scale: Multiplier of the row count (10 by default).
+        repeats: Runs per query; the best time is reported.
+
+    Returns:
+        pd.DataFrame: One row per key type and query (or maintenance step).
+    """
+    frames = make_table_frames(rows_per_table, scale)
+    n_rows = rows_per_table * scale
+
+    def best_ms(conn: sqlite3.Connection, sql: str) -> float:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            conn.execute(sql).fetchall()
+            times.append(time.perf_counter() - start)
+        return round(min(times) * 1000, 2)
+
+    def timed_ms(func: Callable[[], Any]) -> float:
+        start = time.perf_counter()
+        with log_level("QUIET"):
+            func()
+        return round((time.perf_counter() - start) * 1000, 1)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for id_type in ["INTEGER", "TEXT"]:
+            conn = sqlite3.connect(Path(tmp) / f"{id_type.lower()}.db")
+            with log_level("QUIET"):
+                create_nhanes_tables(conn, id_type)
+                bulk_load(conn, frames)
+
+            build_ms = timed_ms(lambda: create_participant_wide(conn))
+            refresh_ms = timed_ms(lambda: refresh_participant_wide(conn, "sleep"))
+            sample = frames["sleep"].sample(frac=0.01, random_state=0)
+            upsert_ms = timed_ms(lambda: bulk_load(conn, {"sleep": sample}))
+            for step, ms in [("build participant_wide", build_ms),
+                             ("refresh one table", refresh_ms),
+                             ("upsert 1% of a table (+ refresh)", upsert_ms)]:
+                results.append({"id_type": id_type, "query": step, "narrow_ms": None, "wide_ms": ms})
+
+            for name, queries in DASHBOARD_QUERIES.items():
+                # Same groups and values (up to float summation order) from both tables
+                narrow, wide = (pd.read_sql_query(queries[kind], conn) for kind in ("narrow", "wide"))
+                keys = list(narrow.columns[:2])
+                pd.testing.assert_frame_equal(narrow.sort_values(keys, ignore_index=True),
+                                              wide.sort_values(keys, ignore_index=True))
+                results.append({
+                    "id_type": id_type,
+                    "query": name,
+                    "narrow_ms": best_ms(conn, queries["narrow"]),
+                    "wide_ms": best_ms(conn, queries["wide"]),
+                })
+            conn.close()
+
+    report = pd.DataFrame(results)
+    report["speedup"] = (report["narrow_ms"] / report["wide_ms"]).round(1)
+    print(f"{n_rows} participants per table")
+    print(report.to_string(index=False))
+    return report
+
+
+# 10. Concurrent small queries: a connection per query vs the read-only query service
+def benchmark_query_service(
+    queries: int = 2_000,
+    threads: int = 8,
+    rows_per_table: int = 10_000
+) -> pd.DataFrame:
+    """
+    Runs many small dashboard-style queries (a few parameterized queries over the filter
+    values) from several threads: opening a connection per query, as callers of
+    create_connection_from_script do, on the pooled read-only connections, and on the
+    pool with the result cache.
+
+    Args:
+        queries: Queries run in total.
+        threads: Threads issuing them.
+        rows_per_table: Participants per table.
+
+    Returns:
+        pd.DataFrame: One row per method.
+    """
+    templates = [
+        ("SELECT pir_category, SUM(interview_sample_weight) AS weighted_n FROM demographics "
+         "WHERE gender = ? GROUP BY pir_category", "gender"),
+        ("SELECT d.gender, AVG(s.sleep_avg_hr) AS sleep_hr FROM demographics d "
+         "JOIN sleep s ON d.participant_id = s.participant_id WHERE d.race_ethnicity = ? GROUP BY d.gender",
+         "race_ethnicity"),
+        ("SELECT bp_category, COUNT(*) AS n FROM bp WHERE bp_category = ? GROUP BY bp_category", "bp_category"),
+    ]
+    workload = [(sql, [f"{column}_{i % 5}"]) for i in range(queries) for sql, column in [templates[i % 3]]]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "queries.db"
+        conn = sqlite3.connect(db_path)
+        with log_level("QUIET"):
+            create_nhanes_tables(conn)
+            bulk_load(conn, make_table_frames(rows_per_table, 1))
+        conn.close()
+
+        def per_query(sql: str, params: List[Any]) -> pd.DataFrame:
+            conn = create_connection(str(db_path))
+            try:
+                return run_query(conn, sql, params)
+            finally:
+                conn.close()
+
+        methods = {
+            "connection per query": per_query,
+            "pooled": lambda sql, params: query(sql, params, db_path=db_path, use_cache=False),
+            "pooled + result cache": lambda sql, params: query(sql, params, db_path=db_path),
+        }
+        for method, run in methods.items():
+            clear_query_cache()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                list(executor.map(lambda item: run(*item), workload))
+            seconds = time.perf_counter() - start
+            results.append({
+                "method": method,
+                "threads": threads,
+                "queries": queries,
+                "total_s": round(seconds, 3),
+                "queries_per_s": int(queries / seconds),
+                "ms_per_query": round(seconds / queries * 1000, 3),
+            })
+        close_connection_pools()
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 11. Exporting a large query: whole DataFrame vs streamed batches
+EXPORT_QUERY = """
+    SELECT d.*, i.has_health_insurance, s.sleep_avg_hr, s.sleep_category,
+           p.activity_level, p.total_weekly_min, di.hei_score, di.diet_score_category
+    FROM demographics d
+    LEFT JOIN health_insurance i ON d.participant_id = i.participant_id
+    LEFT JOIN sleep s ON d.participant_id = s.participant_id
+    LEFT JOIN physical_activity p ON d.participant_id = p.participant_id
+    LEFT JOIN diet di ON d.participant_id = di.participant_id
+"""
+
+
+def _export_peak_rss(db_path: str, method: str, storage_format: str, output_dir: str) -> Dict[str, Any]:
+    """
+    Worker: exports EXPORT_QUERY as one profiled stage and returns its peak RSS and time.
+    """
+    from scripts.storage import save_dataframe
+
+    conn = sqlite3.connect(db_path)
+    with log_level("QUIET"), profile_stage("export", method) as record:
+        if method == "run_query + save":
+            path = save_dataframe(run_query(conn, EXPORT_QUERY), Path(output_dir) / "export", storage_format)
+        else:
+            path = export_query(conn, EXPORT_QUERY, "export", storage_format=storage_format, output_dir=output_dir)
+    conn.close()
+    return {
+        "peak_rss_mb": round(record["rss_delta_mb"], 1),
+        "total_s": round(record["wall_s"], 2),
+        "file_mb": round(path.stat().st_size / 1e6, 1),
+    }
+
+
+def benchmark_query_export(rows_per_table: int = 10_000, scale: int = 50) -> pd.DataFrame:
+    """
+    Writes the result of a five-table participant-level join to Parquet and CSV, either
+    read whole with run_query and saved, or streamed in batches with export_query. Each
+    run happens in a fresh process so the peak RSS of one does not hide another's.
+
+    Args:
+        rows_per_table: Rows of one cycle per table.
+        scale: Multiplier of the row count (50 by default).
+
+    Returns:
+        pd.DataFrame: One row per method and format.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "export.db"
+        conn = sqlite3.connect(db_path)
+        with log_level("QUIET"):
+            create_nhanes_tables(conn)
+            bulk_load(conn, make_table_frames(rows_per_table, scale))
+        conn.close()
+
+        for storage_format in ["parquet", "csv"]:
+            for method in ["run_query + save", "export_query"]:
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                    run = pool.submit(_export_peak_rss, str(db_path), method, storage_format, tmp).result()
+                results.append({"format": storage_format, "method": method,
+                                "rows": rows_per_table * scale, **run})
+
+    report = pd.DataFrame(results)
+    print(report.to_string(index=False))
+    return report
+
+
+# 12. Analytical backends: SQLite vs columnar (Parquet + Arrow compute)
+# The weighted distributions and group statistics of the objective notebooks, as
+# db_utils aggregations (the weights are the ones each notebook uses)
+NOTEBOOK_AGGREGATIONS: Dict[str, Dict[str, Any]] = {
+    "gender distribution (obj 1.1)": {
+        "by": ["gender"], "values": {}, "weight": "interview_sample_weight",
+    },
+    "insurance coverage (obj 1.1)": {
+        "by": ["has_health_insurance"], "values": {}, "weight": "interview_sample_weight",
+    },
+    "sleep by gender x race (obj 2)": {
+        "by": ["gender", "race_ethnicity"], "values": {"sleep_hr": ("sleep_avg_hr", "mean")},
+        "weight": "interview_sample_weight",
+    },
+    "diet score by gender x race (obj 2)": {
+        "by": ["gender", "race_ethnicity", "diet_score_category"], "values": {"hei_score": ("hei_score", "mean")},
+        "weight": "total_diet_weight",
+    },
+    "obesity by pir x education (obj 1.3)": {
+        "by": ["pir_category", "education_level"], "values": {"obese_rate": ("obese", "mean")},
+        "weight": "exam_sample_weight",
+    },
+    "bp x glucose category (obj 1.2)": {
+        "by": ["bp_category", "glucose_category"], "values": {"systolic": ("systolic_avg", "mean")},
+    },
+    "pir by race, one gender (obj 1.1)": {
+        "by": ["race_ethnicity"], "values": {"pir": ("poverty_income_ratio", "mean")},
+        "weight": "interview_sample_weight", "filters": {"gender": "gender_0"},
+    },
+}
+
+
+def benchmark_backends(rows_per_table: int = 10_000, scale: int = 20, repeats: int = 3) -> pd.DataFrame:
+    """
+    Runs the notebook aggregations on the SQLite backend and on the columnar backend
+    (Arrow compute, and its SQL engine when DuckDB or polars is installed), after
+    checking that both give the same results.
+
+    Args:
+        rows_per_table: Rows of one cycle per table.
+        scale: Multiplier of the row count (20 by default).
+        repeats: Runs per aggregation; the best time is reported.
+
+    Returns:
+        pd.DataFrame: One row per aggregation, with the time of each backend.
+    """
+    def best_ms(func: Callable[[], Any]) -> float:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        return round(min(times) * 1000, 1)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_backend = get_backend("sqlite", db_path=Path(tmp) / "nhanes.db")
+        columnar = get_backend("columnar", root=Path(tmp) / "columnar")
+        with log_level("QUIET"):
+            bulk_load(sqlite_backend.conn, make_table_frames(rows_per_table, scale))
+            columnar.materialize_from_sqlite(sqlite_backend.conn)
+        try:
+            sql_engine = columnar._sql_engine()
+        except ImportError:
+            sql_engine = None
+
+        for name, spec in NOTEBOOK_AGGREGATIONS.items():
+            expected = sqlite_backend.aggregate(**spec)
+            pd.testing.assert_frame_equal(columnar.aggregate(**spec), expected, check_dtype=False)
+            row = {
+                "aggregation": name,
+                "groups": len(expected),
+                "sqlite_ms": best_ms(lambda: sqlite_backend.aggregate(**spec)),
+                "arrow_ms": best_ms(lambda: columnar.aggregate(**spec)),
+            }
+            if sql_engine is not None and not spec.get("filters"):
+                sql, _ = aggregate_sql(**spec)
+                row[f"{sql_engine}_sql_ms"] = best_ms(lambda: columnar.run_query(sql))
+            results.append(row)
+
+        # The database is in WAL mode: move committed pages out of nhanes.db-wal before measuring
+        sqlite_backend.conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        sizes = {
+            "sqlite": sum(path.stat().st_size for path in Path(tmp).glob("nhanes.db*")),
+            "columnar": sum(path.stat().st_size for path in (Path(tmp) / "columnar").glob("*.parquet")),
+        }
+        sqlite_backend.close()
+
+    report = pd.DataFrame(results)
+    report["speedup"] = (report["sqlite_ms"] / report["arrow_ms"]).round(1)
+    print(f"{rows_per_table * scale} participants per table; "
+          f"sqlite {sizes['sqlite'] / 1e6:.1f} MB, columnar {sizes['columnar'] / 1e6:.1f} MB")
+    print(report.to_string(index=False))
+    return report
+
+
+BENCHMARKS: Dict[str, Callable[[], pd.DataFrame]] = {
+    "xpt_reader": benchmark_xpt_reader,
+    "replace_close_values": benchmark_replace_close_values,
+    "participant_ids": benchmark_participant_ids,
+    "categorizers": benchmark_categorizers,
+    "hei_aggregation": benchmark_hei_aggregation,
+    "hei_recall_days": benchmark_hei_recall_days,
+    "cleaner_memory": benchmark_cleaner_memory,
+    "sqlite_load": benchmark_sqlite_load,
+    "wide_table": benchmark_wide_table,
+    "query_service": benchmark_query_service,
+    "query_export": benchmark_query_export,
+    "backends": benchmark_backends,
+}
+
+
+def main(names: Optional[List[str]] = None) -> None:
+    """
+    Runs the selected benchmarks (all of them by default).
+    """
+    for name in names or list(BENCHMARKS):
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark '{name}'. Available: {list(BENCHMARKS)}")
+            continue
+        print(f"\n=== Benchmark: {name} ===")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
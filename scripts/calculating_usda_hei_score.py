@@ -15,104 +15,237 @@ if str(project_root) not in sys.path:
 import pandas as pd
 import numpy as np
 from pathlib import Path
+from scipy import sparse
 
 from scripts.config import (RAW_DATA_DIR, CLEAN_DATA_DIR, PROCESSED_DATA_DIR)
 from scripts.data_loading import load_dataset
+from scripts.storage import resolve_path, save_dataframe
+from scripts.pipeline_cache import hash_file, hash_source, make_key
+from scripts.profiling import profiled
 from scripts.utils import pretty_path, explore_data
+from scripts.pipeline_log import get_logger, log_diagnostic
+
+logger = get_logger(__name__)
+
+# Cleaned individual foods and total nutrient files of each dietary recall day
+RECALL_DAY_FILES = {
+    1: ("dr1iff_l_clean.csv", "dr1tot_l_clean.csv"),
+    2: ("dr2iff_l_clean.csv", "dr2tot_l_clean.csv"),
+}
+FPED_FILE = "fped_1720_clean.csv"
+HEI_INPUT_FILES = [name for files in RECALL_DAY_FILES.values() for name in files] + [FPED_FILE]
+
+# Columns of the recall files used for scoring
+FOOD_COLUMNS = ["participant_id", "food_code", "grams_consumed", "energy_kcal", "food_item_weight"]
+TOTAL_COLUMNS = ["participant_id", "energy_kcal", "satfat_g", "sodium_mg", "total_diet_weight"]
+
+HEI_COMPONENTS = [
+    'hei_total_fruit', 'hei_whole_fruit', 'hei_total_veg', 'hei_greens_beans',
+    'hei_whole_grains', 'hei_dairy', 'hei_total_protein', 'hei_sea_plant_protein',
+    'hei_fatty_acid', 'hei_refined_grains', 'hei_added_sugars',
+    'hei_sodium', 'hei_sat_fats'
+]
+
+# FPED food pattern components (per 100 g of food) used by the HEI
+FPED_NUTRIENT_COLS = [
+    'F_TOTAL', 'F_JUICE', 'F_CITMLB', 'F_OTHER',
+    'V_TOTAL', 'V_DRKGR', 'V_LEGUMES',
+    'G_WHOLE', 'G_REFINED',
+    'D_TOTAL', 'D_MILK', 'D_YOGURT', 'D_CHEESE',
+    'PF_TOTAL', 'PF_MPS_TOTAL', 'PF_SEAFD_HI', 'PF_SEAFD_LOW',
+    'SOLID_FATS', 'ADD_SUGARS', 'OILS'
+]
+
+
+def build_fped_matrix(fped, nutrient_cols=FPED_NUTRIENT_COLS):
+    """
+    Index FPED once as a dense food_code -> nutrient vector matrix.
 
-def calculate_hei_scores(
-    clean_data_dir=CLEAN_DATA_DIR,
-    processed_data_dir=PROCESSED_DATA_DIR,
-    save_csv=True
-):
+    Food codes listed more than once have their rows summed, and their multiplicity is
+    kept so food-level sums count each item as often as a merge on food code would.
+
+    Args:
+        fped (pd.DataFrame): Cleaned FPED table with 'FOODCODE' and the nutrient columns.
+        nutrient_cols (list): Nutrient columns to include, in output order.
+
+    Returns:
+        dict: 'codes' (pd.Index of food codes), 'matrix' (codes x nutrients float array,
+        missing values as 0), 'multiplicity' (rows per code) and 'nutrient_cols'.
     """
-    Calculate Healthy Eating Index (HEI) 2015 scores for participants based on NHANES dietary data.
+    grouped = fped.groupby("FOODCODE", sort=True)
+    return {
+        "codes": grouped.size().index,
+        "matrix": grouped[nutrient_cols].sum().to_numpy(dtype=np.float64),
+        "multiplicity": grouped.size().to_numpy(dtype=np.float64),
+        "nutrient_cols": list(nutrient_cols),
+    }
 
-    This function loads cleaned NHANES individual foods and total nutrient datasets, along with the
-    Food Patterns Equivalents Database (FPED). It merges these datasets, calculates nutrient totals
-    and densities per 1000 kcal, and computes component HEI scores for each participant.
 
-    Scores are combined into a total HEI score and categorized as 'Poor', 'Needs Improvement', or 'Good'.
-    
+def aggregate_fped_intake(foods, fped_matrix, keys=("participant_id",)):
+    """
+    Total FPED nutrients, energy and food weight per key (e.g. participant, or participant
+    and recall day) without merging FPED into the food-level rows.
+
+    A sparse key x food-code matrix of grams consumed is multiplied by the FPED matrix,
+    which gives the same totals as merging on food code, scaling each nutrient by
+    grams / 100 and summing by key.
+
     Args:
-        raw_data_dir (Path): Directory containing raw datasets (e.g., FPED Excel file).
-        clean_data_dir (Path): Directory containing cleaned NHANES datasets (CSV files).
-        processed_data_dir (Path): Directory where the output CSV file will be saved.
-        save_csv (bool): Whether to save the resulting DataFrame as a CSV file.
+        foods (pd.DataFrame): Food-level recall rows with the key columns, 'food_code',
+            'grams_consumed', 'energy_kcal' and 'food_item_weight'.
+        fped_matrix (dict): Output of build_fped_matrix.
+        keys (tuple): Columns identifying one output row.
 
     Returns:
-        pd.DataFrame: DataFrame containing HEI component scores, total HEI score, and diet quality categories
-                      for each participant.
+        pd.DataFrame: One row per key with at least one food found in FPED, sorted by key,
+        with '<nutrient>_TOT', 'energy' and 'food_item_weight' columns.
+    """
+    keys = list(keys)
+
+    # Only foods with a FPED entry count, like an inner merge on food code
+    code_idx = fped_matrix["codes"].get_indexer(foods["food_code"])
+    matched = foods[code_idx >= 0]
+    code_idx = code_idx[code_idx >= 0]
+
+    # Group numbers follow the sorted keys; rows with a missing key are dropped
+    grouped = matched.groupby(keys, sort=True, observed=True)
+    row_idx = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    has_key = row_idx >= 0
+    row_idx, code_idx = row_idx[has_key], code_idx[has_key]
+    key_index = grouped.size().index
+    n_rows, n_codes = len(key_index), len(fped_matrix["codes"])
+
+    def column(name):
+        return np.nan_to_num(matched[name].to_numpy(dtype=np.float64, na_value=np.nan)[has_key])
+
+    grams = sparse.csr_matrix(
+        (column("grams_consumed") / 100, (row_idx, code_idx)), shape=(n_rows, n_codes)
+    )
+    totals = grams @ fped_matrix["matrix"]
 
-    Raises:
-        RuntimeError: If any of the required datasets fail to load.
+    multiplicity = fped_matrix["multiplicity"][code_idx]
+    result = pd.DataFrame(
+        totals, columns=[col + "_TOT" for col in fped_matrix["nutrient_cols"]]
+    )
+    result["energy"] = np.bincount(row_idx, weights=column("energy_kcal") * multiplicity, minlength=n_rows)
+    result["food_item_weight"] = np.bincount(
+        row_idx, weights=column("food_item_weight") * multiplicity, minlength=n_rows
+    )
+    result.index = key_index
+    return result.reset_index()
+
+
+# HEI-2015 scoring standards: component -> (source columns, min, max, max_score).
+# The score rises linearly from 0 at `min` to max_score at `max` (sources are summed).
+# Moderation components are reverse-scored, which is expressed by min > max.
+HEI_STANDARDS = {
+    "hei_fatty_acid": (["fatty_acid_ratio"], 1.2, 2.5, 10),
+    "hei_total_fruit": (["F_TOTAL_PER1000KCAL"], 0, 0.8, 5),
+    "hei_whole_fruit": (["F_OTHER_PER1000KCAL"], 0, 0.4, 5),
+    "hei_total_veg": (["V_TOTAL_PER1000KCAL"], 0, 1.1, 5),
+    "hei_greens_beans": (["V_DRKGR_PER1000KCAL", "V_LEGUMES_PER1000KCAL"], 0, 0.2, 5),
+    "hei_whole_grains": (["G_WHOLE_PER1000KCAL"], 0, 1.5, 10),
+    "hei_dairy": (["D_TOTAL_PER1000KCAL"], 0, 1.3, 10),
+    "hei_total_protein": (["PF_TOTAL_PER1000KCAL"], 0, 2.5, 5),
+    "hei_sea_plant_protein": (["PF_SEAFD_HI_PER1000KCAL", "PF_SEAFD_LOW_PER1000KCAL"], 0, 0.8, 5),
+    "hei_refined_grains": (["G_REFINED_PER1000KCAL"], 4.3, 1.8, 10),
+    "hei_added_sugars": (["ADD_SUGARS_PER1000KCAL"], 26, 6.5, 10),
+    "hei_sodium": (["SODIUM_PER1000KCAL"], 2.0, 1.1, 10),
+    "hei_sat_fats": (["SAT_FAT_PCT_ENERGY"], 16, 8, 10),
+}
+
+
+def score_hei_components(df, standards=HEI_STANDARDS):
     """
-    
-    # Load the data
-    dr1iff = load_dataset(clean_data_dir / "dr1iff_l_clean.csv")
-    dr1tot = load_dataset(clean_data_dir / "dr1tot_l_clean.csv")
-    fped = load_dataset(clean_data_dir / "fped_1720_clean.csv")
+    Score every HEI component for all participants in one vectorized pass.
 
-    if dr1iff is None or dr1tot is None or fped is None:
-        raise RuntimeError("One or more datasets failed to load. Please check paths and formats.")
+    Args:
+        df (pd.DataFrame): Participant-level intakes containing the source columns of `standards`.
+        standards (dict): Scoring table, component -> (source columns, min, max, max_score).
 
-    # Merge NHANES Individual Foods with FPED on food code
-    print("Merging NHANES Individual Foods with FPED using food codes...")
-    merged = pd.merge(dr1iff, fped, left_on="food_code", right_on="FOODCODE", how="inner")
-   
-    nutrient_cols = [
-        'F_TOTAL', 'F_JUICE', 'F_CITMLB', 'F_OTHER',
-        'V_TOTAL', 'V_DRKGR', 'V_LEGUMES',
-        'G_WHOLE', 'G_REFINED',
-        'D_TOTAL', 'D_MILK', 'D_YOGURT', 'D_CHEESE',
-        'PF_TOTAL', 'PF_MPS_TOTAL', 'PF_SEAFD_HI', 'PF_SEAFD_LOW',
-        'SOLID_FATS', 'ADD_SUGARS', 'OILS'
-    ]
+    Returns:
+        pd.DataFrame: One column per component, indexed like `df`. Missing intakes score 0.
+    """
+    mins = np.array([standard[1] for standard in standards.values()], dtype=np.float64)
+    maxs = np.array([standard[2] for standard in standards.values()], dtype=np.float64)
+    max_scores = np.array([standard[3] for standard in standards.values()], dtype=np.float64)
 
-    for col in nutrient_cols:
-        merged[col + "_TOT"] = merged[col] * merged["grams_consumed"] / 100
+    values = np.column_stack([
+        df[sources].sum(axis=1, min_count=len(sources)).to_numpy(dtype=np.float64)
+        for sources, *_ in standards.values()
+    ])
+    scores = np.clip(max_scores * (values - mins) / (maxs - mins), 0, max_scores)
+    scores[np.isnan(scores)] = 0
+    return pd.DataFrame(scores, index=df.index, columns=list(standards))
+
+
+def stack_recall_days(frames):
+    """
+    Stack the files of several recall days into one frame with a 'day' column.
 
-    merged["energy"] = merged["energy_kcal"]
+    Rows are only copied once, so memory grows linearly with the number of days.
+    Categorical participant ids of different days are re-encoded over all days.
 
-    print("\n Aggregate Nutrients and Energy by Participant \n")
+    Args:
+        frames (dict): Recall day -> DataFrame.
+
+    Returns:
+        pd.DataFrame: The rows of every day, in day order.
+    """
+    stacked = pd.concat(
+        [df.assign(day=np.int8(day)) for day, df in sorted(frames.items())], ignore_index=True
+    )
+    if any(isinstance(df["participant_id"].dtype, pd.CategoricalDtype) for df in frames.values()):
+        stacked["participant_id"] = stacked["participant_id"].astype("category")
+    return stacked
+
+
+def categorize_hei(hei_score):
+    """
+    Categorize total HEI scores as 'Poor' (< 60), 'Needs Improvement' (60-80) or 'Good',
+    and missing scores as 'Unknown'.
+    """
+    bins = [-float('inf'), 60, 80, float('inf')]
+    labels = ['Poor', 'Needs Improvement', 'Good']
 
-    agg_cols = [col + "_TOT" for col in nutrient_cols] + ["energy"]
+    category = pd.cut(hei_score, bins=bins, labels=labels)
+    category = category.cat.add_categories('Unknown')
+    category[hei_score.isna()] = 'Unknown'
+    return category
 
-    dietary_weight_per_person = merged.groupby("participant_id")["food_item_weight"].sum().reset_index()
-    person_level = merged.groupby("participant_id")[agg_cols].sum().reset_index()
+
+def score_recall_days(foods, totals, fped_matrix, keys=("participant_id", "day")):
+    """
+    Score HEI-2015 for every key (participant and recall day) in one vectorized pass.
+
+    Args:
+        foods (pd.DataFrame): Cleaned individual foods of all recall days with the key columns.
+        totals (pd.DataFrame): Cleaned total nutrients of all recall days with the key columns.
+        fped_matrix (dict): Output of build_fped_matrix.
+        keys (tuple): Columns identifying one scored recall.
+
+    Returns:
+        pd.DataFrame: One row per key with intakes, component scores, 'hei_score',
+        'diet_score_category' and 'has_totals' (False for recalls without a totals row),
+        sorted by key.
+    """
+    keys = list(keys)
+    nutrient_cols = fped_matrix["nutrient_cols"]
+
+    logger.info("Aggregating nutrients and energy by participant...")
+    person_level = aggregate_fped_intake(foods, fped_matrix, keys=keys)
 
     for col in nutrient_cols:
         person_level[col + "_PER1000KCAL"] = person_level[col + "_TOT"] / (person_level["energy"] / 1000)
 
-    dr1tot["SODIUM_PER1000KCAL"] = (dr1tot["sodium_mg"] / dr1tot["energy_kcal"])
-    dr1tot["SAT_FAT_PCT_ENERGY"] = (dr1tot["satfat_g"] * 9 / dr1tot["energy_kcal"]) * 100
-
-    person_level = person_level.merge(
-        dr1tot[["participant_id", "SODIUM_PER1000KCAL", "SAT_FAT_PCT_ENERGY", "total_diet_weight"]],
-        on="participant_id", how="left"
+    totals = totals[keys].assign(
+        SODIUM_PER1000KCAL=totals["sodium_mg"] / totals["energy_kcal"],
+        SAT_FAT_PCT_ENERGY=(totals["satfat_g"] * 9 / totals["energy_kcal"]) * 100,
+        total_diet_weight=totals["total_diet_weight"],
     )
 
-    person_level = person_level.merge(dietary_weight_per_person, on="participant_id", how="left")
-
-    def score_component(val, min_val, max_val, reverse=False, max_score=10):
-        if pd.isna(val):
-            return 0
-        if reverse:
-            if val <= max_val:
-                return max_score
-            elif val >= min_val:
-                return 0
-            else:
-                return max_score * (min_val - val) / (min_val - max_val)
-        else:
-            if val >= max_val:
-                return max_score
-            elif val <= min_val:
-                return 0
-            else:
-                return max_score * (val - min_val) / (max_val - min_val)
-
-    df = person_level.copy()
+    df = person_level.merge(totals, on=keys, how="left", indicator="has_totals")
+    df['has_totals'] = df['has_totals'].eq("both")
 
     df['fatty_acid_ratio'] = np.where(
         df['SOLID_FATS_PER1000KCAL'] == 0,
@@ -120,55 +253,165 @@ def calculate_hei_scores(
         df['OILS_PER1000KCAL'] / df['SOLID_FATS_PER1000KCAL']
     )
 
-    df['hei_fatty_acid'] = df['fatty_acid_ratio'].apply(lambda x: score_component(x, 1.2, 2.5, max_score=10))
+    scores = score_hei_components(df)
+    df[scores.columns] = scores
 
-    df['hei_total_fruit'] = df['F_TOTAL_PER1000KCAL'].apply(lambda x: score_component(x, 0, 0.8, max_score=5))
-    df['hei_whole_fruit'] = df['F_OTHER_PER1000KCAL'].apply(lambda x: score_component(x, 0, 0.4, max_score=5))
-    df['hei_total_veg'] = df['V_TOTAL_PER1000KCAL'].apply(lambda x: score_component(x, 0, 1.1, max_score=5))
-    df['hei_greens_beans'] = (df['V_DRKGR_PER1000KCAL'] + df['V_LEGUMES_PER1000KCAL']).apply(lambda x: score_component(x, 0, 0.2, max_score=5))
-    df['hei_whole_grains'] = df['G_WHOLE_PER1000KCAL'].apply(lambda x: score_component(x, 0, 1.5, max_score=10))
-    df['hei_dairy'] = df['D_TOTAL_PER1000KCAL'].apply(lambda x: score_component(x, 0, 1.3, max_score=10))
-    df['hei_total_protein'] = df['PF_TOTAL_PER1000KCAL'].apply(lambda x: score_component(x, 0, 2.5, max_score=5))
-    df['hei_sea_plant_protein'] = (df['PF_SEAFD_HI_PER1000KCAL'] + df['PF_SEAFD_LOW_PER1000KCAL']).apply(lambda x: score_component(x, 0, 0.8, max_score=5))
+    df[HEI_COMPONENTS] = df[HEI_COMPONENTS].fillna(0)
+    df['hei_score'] = df[HEI_COMPONENTS].sum(axis=1)
+    df['diet_score_category'] = categorize_hei(df['hei_score'])
+    return df
 
-    df['hei_refined_grains'] = df['G_REFINED_PER1000KCAL'].apply(lambda x: score_component(x, 4.3, 1.8, reverse=True, max_score=10))
-    df['hei_added_sugars'] = df['ADD_SUGARS_PER1000KCAL'].apply(lambda x: score_component(x, 26, 6.5, reverse=True, max_score=10))
 
-    df['hei_sodium'] = df['SODIUM_PER1000KCAL'].apply(lambda x: score_component(x, 2.0, 1.1, reverse=True, max_score=10))
-    df['hei_sat_fats'] = df['SAT_FAT_PCT_ENERGY'].apply(lambda x: score_component(x, 16, 8, reverse=True, max_score=10))
+def average_recall_days(day_scores):
+    """
+    Average the HEI scores of each participant over their recall days.
 
-    hei_components = [
-        'hei_total_fruit', 'hei_whole_fruit', 'hei_total_veg', 'hei_greens_beans',
-        'hei_whole_grains', 'hei_dairy', 'hei_total_protein', 'hei_sea_plant_protein',
-        'hei_fatty_acid', 'hei_refined_grains', 'hei_added_sugars',
-        'hei_sodium', 'hei_sat_fats'
-    ]
+    Only recall days with both foods and a totals row are counted and averaged.
+    Component and total scores are the mean of the daily scores, and the category is
+    taken from the mean total. 'total_diet_weight' and 'food_item_weight' are the
+    two-day dietary weight (WTDR2D) of the day-2 recall, missing for participants
+    without a valid day 2; 'day1_weight' keeps the day-1 weight (WTDRD1).
 
-    df[hei_components] = df[hei_components].fillna(0)
-    df['hei_score'] = df[hei_components].sum(axis=1)
+    Args:
+        day_scores (pd.DataFrame): Output of score_recall_days.
 
-    print("Mean HEI component scores and total:")
-    print(df[hei_components + ['hei_score']].mean().round(1))
+    Returns:
+        pd.DataFrame: One row per participant with a complete recall, sorted by
+        participant id, with a 'recall_days' count.
+    """
+    score_cols = HEI_COMPONENTS + ['hei_score']
+    complete = day_scores[day_scores['has_totals']]
+    grouped = complete.groupby("participant_id", sort=True, observed=True)
+
+    averaged = grouped[score_cols].mean()
+    by_day = complete.set_index("participant_id")
+    day1, day2 = by_day[by_day['day'] == 1], by_day[by_day['day'] == 2]
+    averaged['total_diet_weight'] = day2['total_diet_weight']
+    averaged['food_item_weight'] = day2['food_item_weight']
+    averaged['day1_weight'] = day1['total_diet_weight']
+    averaged['recall_days'] = grouped.size()
+    averaged['diet_score_category'] = categorize_hei(averaged['hei_score'])
+    return averaged.reset_index()
+
+
+@profiled("hei")
+def calculate_hei_scores(
+    clean_data_dir=CLEAN_DATA_DIR,
+    processed_data_dir=PROCESSED_DATA_DIR,
+    save_csv=True,
+    storage_format=None,
+    cache=None,
+    recall_days=(1, 2)
+):
+    """
+    Calculate Healthy Eating Index (HEI) 2015 scores for participants based on NHANES dietary data.
 
-    bins = [-float('inf'), 60, 80, float('inf')]
-    labels = ['Poor', 'Needs Improvement', 'Good']
+    This function loads cleaned NHANES individual foods and total nutrient datasets, along with the
+    Food Patterns Equivalents Database (FPED). It totals FPED nutrients per participant and recall
+    day through a sparse (participant, day) x food code matrix, calculates densities per 1000 kcal,
+    and computes component HEI scores for each participant and day in one pass.
+
+    With day-2 recall files, participant scores are the average over the days recalled and the
+    daily scores are saved to hei2015_scores_by_day. Without them, day-1 scores are returned.
 
-    df = df.copy()
-    df['diet_score_category'] = pd.cut(df['hei_score'], bins=bins, labels=labels)
-    df['diet_score_category'] = df['diet_score_category'].cat.add_categories('Unknown')
-    df.loc[df['hei_score'].isna(), 'diet_score_category'] = 'Unknown'
+    Scores are combined into a total HEI score and categorized as 'Poor', 'Needs Improvement', or 'Good'.
+    
+    Args:
+        raw_data_dir (Path): Directory containing raw datasets (e.g., FPED Excel file).
+        clean_data_dir (Path): Directory containing cleaned NHANES datasets (Parquet or CSV files).
+        processed_data_dir (Path): Directory where the output file will be saved.
+        save_csv (bool): Whether to save the resulting DataFrame.
+        storage_format (str): 'parquet' or 'csv'. Defaults to config.STORAGE_FORMAT.
+        cache (PipelineCache): If given, scores are reused when the cleaned input files and
+            this module's source are unchanged.
+        recall_days (tuple): Recall days to score (see RECALL_DAY_FILES). Day 1 is required;
+            later days are skipped when their cleaned files are missing.
+
+    Returns:
+        pd.DataFrame: DataFrame containing HEI component scores, total HEI score, and diet quality categories
+                      for each participant.
 
-    final_columns = ['participant_id', 'total_diet_weight', 'food_item_weight', 'diet_score_category'] + \
-                    [col for col in df.columns if col.startswith('hei_')]
+    Raises:
+        RuntimeError: If any of the required datasets fail to load.
+    """
+    output_path = processed_data_dir / "hei2015_scores.csv"
+    by_day_path = processed_data_dir / "hei2015_scores_by_day.csv"
+
+    # Cleaned files may be stored as Parquet or CSV (see config.STORAGE_FORMAT)
+    def input_path(name):
+        return resolve_path(clean_data_dir / name) or clean_data_dir / name
+
+    day_paths = {day: [input_path(name) for name in RECALL_DAY_FILES[day]] for day in recall_days}
+    for day in [day for day in day_paths if day != 1]:
+        if not all(path.exists() for path in day_paths[day]):
+            logger.info(f"No cleaned day-{day} recall files found, scoring without day {day}.")
+            del day_paths[day]
+    input_paths = [path for paths in day_paths.values() for path in paths] + [input_path(FPED_FILE)]
+    two_day = len(day_paths) > 1
+
+    cache_key = None
+    if cache is not None and all(path.exists() for path in input_paths):
+        cache_key = make_key("hei", [hash_file(path) for path in input_paths], hash_source(calculate_hei_scores))
+        final_df = cache.get("hei", "hei2015_scores", cache_key)
+        by_day = cache.get("hei", "hei2015_scores_by_day", make_key(cache_key, "by_day")) if two_day else None
+        if final_df is not None and (by_day is not None or not two_day):
+            logger.info("[cache] Reusing HEI scores")
+            if save_csv:
+                output_path = save_dataframe(final_df, output_path, storage_format)
+                logger.info(f"Saved cleaned data to: {pretty_path(output_path)}")
+                if two_day:
+                    by_day_path = save_dataframe(by_day, by_day_path, storage_format)
+                    logger.info(f"Saved daily scores to: {pretty_path(by_day_path)}")
+            return final_df
+
+    # Load the data
+    fped = load_dataset(input_paths[-1])
+    foods, totals = {}, {}
+    for day, (foods_path, totals_path) in day_paths.items():
+        foods[day], totals[day] = load_dataset(foods_path), load_dataset(totals_path)
+
+    if fped is None or any(df is None for df in [*foods.values(), *totals.values()]):
+        raise RuntimeError("One or more datasets failed to load. Please check paths and formats.")
+
+    # Total nutrients per participant and day from the food code x nutrient matrix
+    logger.info("Aggregating NHANES Individual Foods with the FPED nutrient matrix...")
+    fped_matrix = build_fped_matrix(fped)
+
+    day_scores = score_recall_days(
+        stack_recall_days({day: df[FOOD_COLUMNS] for day, df in foods.items()}),
+        stack_recall_days({day: df[TOTAL_COLUMNS] for day, df in totals.items()}),
+        fped_matrix
+    )
+
+    score_cols = [col for col in day_scores.columns if col.startswith('hei_')]
+    final_columns = ['participant_id', 'total_diet_weight', 'food_item_weight', 'diet_score_category'] + score_cols
+
+    if two_day:
+        by_day = day_scores[['participant_id', 'day'] + final_columns[1:]]
+        df = average_recall_days(day_scores)
+        final_columns[3:3] = ['day1_weight', 'recall_days']
+        logger.info(f"Scored {len(by_day)} recalls of {len(df)} participants "
+              f"({(df['recall_days'] > 1).sum()} with two recall days).")
+    else:
+        df = day_scores
+
+    log_diagnostic(logger, "Mean HEI component scores and total:",
+                   lambda: df[HEI_COMPONENTS + ['hei_score']].mean().round(1))
 
     final_df = df[final_columns]
 
-    output_path = processed_data_dir / "hei2015_scores.csv"
+    if cache_key is not None:
+        cache.put("hei", "hei2015_scores", cache_key, final_df)
+        if two_day:
+            cache.put("hei", "hei2015_scores_by_day", make_key(cache_key, "by_day"), by_day)
 
     if save_csv:
-        final_df.to_csv(output_path, index=False)
+        output_path = save_dataframe(final_df, output_path, storage_format)
+        if two_day:
+            by_day_path = save_dataframe(by_day, by_day_path, storage_format)
+            logger.info(f"Saved daily scores to: {pretty_path(by_day_path)}")
 
-    print("Saved cleaned data to:", pretty_path(output_path))   
+    logger.info(f"Saved cleaned data to: {pretty_path(output_path)}")
     return final_df
 
 def main():    
@@ -5,6 +5,9 @@ This script cleans chronic disease data from NHANES.
 - Diabetes (DIQ)
 - Cardiovascular Conditions (MCQ)
 - saves the cleaned versions as CSV files.
+
+Code mappings and unknown-answer codes live in the DIQ_L and MCQ_L specs
+(scripts/dataset_specs.py).
 """
 import sys
 from pathlib import Path
@@ -15,94 +18,45 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 import pandas as pd
-import numpy as np
-from scripts.config import CLEAN_DATA_DIR
+from scripts.clean_spec import clean_with_spec
 from scripts.data_loading import load_dataset  
 from scripts.config import datasets 
+from scripts.pipeline_log import get_logger
 from typing import Optional, Dict
-from scripts.utils import pretty_path
-
-# Mapping codes to binary Yes/No
-YES_NO_MAP = {1: 1, 2: 0}  # 1 = Yes, 2 = No
-DIABETES_MAP = {1: 1, 2: 0}
 
-MCQ_CONDITIONS = {
-    'MCQ160B': 'congestive_heart_failure',
-    'MCQ160C': 'coronary_heart_disease',
-    'MCQ160D': 'angina',
-    'MCQ160E': 'heart_attack'
-}
+logger = get_logger(__name__)
 
-def clean_diq(df: pd.DataFrame, label: str = "DIQ_L") -> pd.DataFrame:
+def clean_diq(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Clean the Diabetes Questionnaire dataset.
+    Clean the Diabetes Questionnaire dataset with the DIQ_L spec.
+
+    Map codes to diagnosis and medication columns, with borderline, refused and
+    unknown answers set to missing.
 
-    Map codes to diagnosis and medication columns, handle missing/unknown values,
-  
     Args:
         df: Raw DIQ dataset as a DataFrame.
-        label: Optional label for logging and filenames.
 
     Returns:
-        Cleaned DataFrame with selected columns and saved CSV file.
+        Cleaned DataFrame with selected columns (also saved to the clean folder).
     """
-    if df.empty:
-        print(f"{label}: The dataset is empty.")
-        return df
-
-    df = df.rename(columns={"SEQN": "participant_id"})
-    df['participant_id'] = df['participant_id'].apply(
-    lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
-
-    df['diabetes_dx'] = df['DIQ010'].replace({3: np.nan, 7: np.nan, 9: np.nan}).map(DIABETES_MAP)
-    df['diabetes_meds'] = df['DIQ070'].replace({7: np.nan, 9: np.nan}).map(YES_NO_MAP)
+    return clean_with_spec(df, "DIQ_L")
 
-    columns_to_keep = ['participant_id', 'diabetes_dx', 'diabetes_meds']
-    df_clean = df[columns_to_keep].reset_index(drop=True)
 
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    out_path = CLEAN_DATA_DIR / f"{label.lower()}_clean.csv"
-    df_clean.to_csv(out_path, index=False)
-    print(f"{label}: Saved basic cleaned data to {pretty_path(out_path)}")
-    print(f"{label}: Final shape: {df_clean.shape}")
-    return df_clean
-
-def clean_mcq(df: pd.DataFrame, label: str = "MCQ_L") -> pd.DataFrame:
+def clean_mcq(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Clean Cardiovascular Conditions data.
+    Clean Cardiovascular Conditions data with the MCQ_L spec.
 
     Maps codes to binary indicators for various heart conditions
     and saves cleaned data.
 
     Args:
         df: Raw MCQ dataset as a DataFrame.
-        label: Optional label for logging and filenames.
 
     Returns:
-        Cleaned DataFrame with selected columns and saved CSV file.
+        Cleaned DataFrame with selected columns (also saved to the clean folder).
     """
-    if df.empty:
-        print(f"{label}: The dataset is empty. Skipping...")
-        return df
-
-    df = df.rename(columns={"SEQN": "participant_id"})
-    df['participant_id'] = df['participant_id'].apply(
-    lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
-
-    for col, new_col in MCQ_CONDITIONS.items():
-        df[new_col] = df[col].replace({7: np.nan, 9: np.nan}).map(YES_NO_MAP)
-
-    columns_to_keep = ['participant_id'] + list(MCQ_CONDITIONS.values())
-    df_clean = df[columns_to_keep].reset_index(drop=True)
+    return clean_with_spec(df, "MCQ_L")
 
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    out_path = CLEAN_DATA_DIR / f"{label.lower()}_clean.csv"
-    df_clean.to_csv(out_path, index=False)
-    print(f"{label}: Saved basic cleaned data to {pretty_path(out_path)}")
-    print(f"{label}: Final shape: {df_clean.shape}")
-    return df_clean
 
 def main(
     diq_df: Optional[pd.DataFrame] = None,
@@ -121,44 +75,44 @@ def main(
     Returns:
         Dictionary with keys 'diq', 'mcq' and cleaned DataFrames or None if skipped.
     """
-    print("=== Chronic Disease Basic Cleaning Started ===")
+    logger.info("=== Chronic Disease Basic Cleaning Started ===")
     cleaned = {}
 
     if diq_df is not None:
-        print("Cleaning DIQ_L dataset (provided)...")
+        logger.info("Cleaning DIQ_L dataset (provided)...")
         cleaned['diq'] = clean_diq(diq_df)
     else:
-        print("Loading DIQ_L dataset...")
+        logger.info("Loading DIQ_L dataset...")
         diq_info = datasets.get("DIQ_L")
         if diq_info is None:
-            print("DIQ_L dataset info missing in config. Skipping DIQ cleaning.")
+            logger.warning("DIQ_L dataset info missing in config. Skipping DIQ cleaning.")
             cleaned['diq'] = None
         else:
             diq_df_loaded = load_dataset(diq_info["file_path"], diq_info.get("columns"))
             if diq_df_loaded is None:
-                print("DIQ_L dataset not found or could not be loaded. Skipping DIQ cleaning.")
+                logger.warning("DIQ_L dataset not found or could not be loaded. Skipping DIQ cleaning.")
                 cleaned['diq'] = None
             else:
                 cleaned['diq'] = clean_diq(diq_df_loaded)
 
     if mcq_df is not None:
-        print("Cleaning MCQ_L dataset (provided)...")
+        logger.info("Cleaning MCQ_L dataset (provided)...")
         cleaned['mcq'] = clean_mcq(mcq_df)
     else:
-        print("Loading MCQ_L dataset...")
+        logger.info("Loading MCQ_L dataset...")
         mcq_info = datasets.get("MCQ_L")
         if mcq_info is None:
-            print("MCQ_L dataset info missing in config. Skipping MCQ cleaning.")
+            logger.warning("MCQ_L dataset info missing in config. Skipping MCQ cleaning.")
             cleaned['mcq'] = None
         else:
             mcq_df_loaded = load_dataset(mcq_info["file_path"], mcq_info.get("columns"))
             if mcq_df_loaded is None:
-                print("MCQ_L dataset not found or could not be loaded. Skipping MCQ cleaning.")
+                logger.warning("MCQ_L dataset not found or could not be loaded. Skipping MCQ cleaning.")
                 cleaned['mcq'] = None
             else:
                 cleaned['mcq'] = clean_mcq(mcq_df_loaded)
 
-    print("=== Finished basic cleaning ===")
+    logger.info("=== Finished basic cleaning ===")
     return cleaned
 
 if __name__ == "__main__":
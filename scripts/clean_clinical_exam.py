@@ -16,28 +16,35 @@ if str(project_root) not in sys.path:
 
 import pandas as pd
 import numpy as np
+from scripts.clean_spec import clean_with_spec, range_rules
 from scripts.config import CLEAN_DATA_DIR, datasets
 from scripts.data_loading import load_dataset
+from scripts.dataset_specs import DATASET_SPECS, rename_map
+from scripts.storage import partition_dir, save_dataframe
+from scripts.profiling import profiled
 from typing import Optional
 from scripts.utils import (
     show_missing,
     rename_columns,
     drop_missing,
-    remove_outliers, 
     replace_close_values_with_nan,
-    drop_invalid_weight,
+    normalize_participant_id,
+    apply_range_rules,
     pretty_path  
 )
+from scripts.pipeline_log import get_logger, log_diagnostic
+
+logger = get_logger(__name__)
 
 # 1. BMI
 def clean_bmi(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     """
-    Clean the BMI dataset.
+    Clean the BMI dataset with the BMX_L spec.
 
     - Renames relevant columns for clarity.
     - Converts BMI values to numeric and removes any unrealistic values.
     - Drops rows with missing BMI values.
-    - Saves the cleaned data to a CSV file.
+    - Saves the cleaned data.
 
     Args:
         df: Raw BMI data as a pandas DataFrame or None.
@@ -45,34 +52,14 @@ def clean_bmi(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     Returns:
         A cleaned pandas DataFrame with BMI data.
     """
-    if df is None or df.empty:
-        print("BMI dataframe is empty.")
-        return pd.DataFrame()
-    print("Cleaning BMI data.")
-    print("Dataframe rows and columns size before cleaning:", df.shape)    
-
-    df = rename_columns(df, {'SEQN': 'participant_id', 'BMXBMI': 'bmi'})
-    df['participant_id'] = df['participant_id'].apply(
-    lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
-
-    df['bmi'] = pd.to_numeric(df['bmi'], errors='coerce')
-    df = df[(df['bmi'] >= 11.1) & (df['bmi'] <= 74.8)]
+    return clean_with_spec(df, "BMX_L")
 
-    show_missing(df, "BMI - Before Cleaning")
-    df = drop_missing(df, ['bmi'])
-    show_missing(df, "BMI - After Cleaning")
-    df.reset_index(drop=True, inplace=True)
-    print("Dataframe rows and columns size after cleaning:", df.shape)
 
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_path = CLEAN_DATA_DIR / "bmx_l_clean.csv"
-    df.to_csv(output_path, index=False)
-    print(f"Saved cleaned BMI data to {pretty_path(output_path)}")
-
-    return df
+# Plausible ranges (mmHg) for the three oscillometric readings, from the BPXO_L spec
+BP_RANGE_RULES = range_rules(DATASET_SPECS["BPXO_L"])
 
 # 2. Blood Pressure
+@profiled("clean", "BPXO_L")
 def clean_bp(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     """
     Clean blood pressure data by:
@@ -88,33 +75,23 @@ def clean_bp(df: Optional[pd.DataFrame]) -> pd.DataFrame:
         A DataFrame with participant IDs, average systolic and diastolic BP, and categories.
     """
     if df is None or df.empty:
-        print("Blood Pressure dataframe is empty.")
+        logger.warning("Blood Pressure dataframe is empty.")
         return pd.DataFrame()
 
-    print("Cleaning Blood Pressure data")
-    print("Dataframe rows and columns size before cleaning:", df.shape)
-
-    df = rename_columns(df, {
-        'SEQN': 'participant_id',
-        'BPXOSY1': 'systolic_1',
-        'BPXOSY2': 'systolic_2',
-        'BPXOSY3': 'systolic_3',
-        'BPXODI1': 'diastolic_1',
-        'BPXODI2': 'diastolic_2',
-        'BPXODI3': 'diastolic_3',
-    })
-    df['participant_id'] = df['participant_id'].apply(
-    lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
+    logger.info("Cleaning Blood Pressure data")
+    logger.info(f"Dataframe rows and columns size before cleaning: {df.shape}")
+
+    df = rename_columns(df, rename_map("BPXO_L"))
+    df['participant_id'] = normalize_participant_id(df['participant_id'])
     show_missing(df, "BP - Before Cleaning")
 
     systolic_cols = ['systolic_1', 'systolic_2', 'systolic_3']
     diastolic_cols = ['diastolic_1', 'diastolic_2', 'diastolic_3']
 
-    for col in systolic_cols:
-        df[col] = df[col].apply(lambda x: x if 50 <= x <= 233 else np.nan)
-    for col in diastolic_cols:
-        df[col] = df[col].apply(lambda x: x if 24 <= x <= 142 else np.nan)
+    # Blank readings outside the plausible ranges
+    df, range_audit = apply_range_rules(df, BP_RANGE_RULES, inplace=True)
+    log_diagnostic(logger, "Readings outside plausible ranges:",
+                   lambda: range_audit[["rule", "rows_affected", "values_affected"]].to_string(index=False))
 
     df['systolic_avg'] = df[systolic_cols].mean(axis=1)
     df['diastolic_avg'] = df[diastolic_cols].mean(axis=1)
@@ -122,20 +99,19 @@ def clean_bp(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     df = drop_missing(df, ['systolic_avg', 'diastolic_avg'])
 
     show_missing(df, "BP - After Cleaning")
-    print("Dataframe rows and columns size after cleaning:", df.shape)
+    logger.info(f"Dataframe rows and columns size after cleaning: {df.shape}")
 
     
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_path = CLEAN_DATA_DIR / "bpxo_l_clean.csv"
+    output_path = partition_dir(CLEAN_DATA_DIR) / "bpxo_l_clean.csv"
     df_to_save = df[['participant_id', 'systolic_avg', 'diastolic_avg']]
-    df_to_save.to_csv(output_path, index=False)
-    print(f"Saved cleaned Blood Pressure data to {pretty_path(output_path)}")
+    output_path = save_dataframe(df_to_save, output_path)
+    logger.info(f"Saved cleaned Blood Pressure data to {pretty_path(output_path)}")
 
     return df_to_save
 def clean_total_cholesterol(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     """
-    Clean total cholesterol data by renaming columns, removing missing values,
-    replacing invalid weights, removing outliers, and saving cleaned data.
+    Clean total cholesterol data with the TCHOL_L spec: renames columns, removes
+    missing values and invalid weights, removes outliers and saves the cleaned data.
 
     Args:
         df: Raw cholesterol DataFrame or None.
@@ -143,64 +119,11 @@ def clean_total_cholesterol(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     Returns:
         Cleaned cholesterol DataFrame.
     """
-    if df is None or df.empty:
-        print("Total cholesterol dataframe is empty.")
-        return pd.DataFrame()
+    return clean_with_spec(df, "TCHOL_L")
 
-    required_cols = ['SEQN', 'LBXTC', 'WTPH2YR']
-    for col in required_cols:
-        if col not in df.columns:
-            raise ValueError(f"Missing required column: {col}")
-
-    print("Cleaning Total Cholesterol data")
-    print("Dataframe rows and columns size before cleaning:", df.shape)
-
-    # Rename columns for consistency
-    df = rename_columns(df, {
-        'SEQN': 'participant_id',
-        'LBXTC': 'total_cholesterol',
-        'WTPH2YR': 'blood_drawn_sample_weight'
-    })
-
-    # Ensure participant_id is string
-    df['participant_id'] = df['participant_id'].apply(
-        lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
-
-    # Show missing before cleaning
-    show_missing(df, "Cholesterol - Before Cleaning")
-
-    # Replace weird near-zero values in weights with NaN
-    df = replace_close_values_with_nan(
-        df,
-        target=5.39760534693402e-79,
-        tolerance=1e-78,
-        columns=['blood_drawn_sample_weight']
-    )
-
-    # Drop rows with missing or invalid weights
-    df = drop_invalid_weight(df, 'blood_drawn_sample_weight', min_valid=0.01)
-
-    # Drop rows with missing total cholesterol
-    df = drop_missing(df, ['total_cholesterol'])
-
-    # Remove outliers in cholesterol (typical clinical range: 62–438 mg/dL)
-    df = remove_outliers(df, 'total_cholesterol', 62, 438)
-
-    # Show missing after cleaning
-    show_missing(df, "Cholesterol - After Cleaning")
-
-    print("Dataframe rows and columns size after cleaning:", df.shape)
-
-    # Save cleaned data
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_path = CLEAN_DATA_DIR / "tchol_l_clean.csv"
-    df.to_csv(output_path, index=False)
-    print(f"Saved cleaned Total Cholesterol data to {pretty_path(output_path)}")
-
-    return df
 
 # 4. Glucose
+@profiled("clean", "GLU_L")
 def clean_glucose(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     """
     Clean glucose data by renaming columns, converting units as needed,
@@ -213,57 +136,50 @@ def clean_glucose(df: Optional[pd.DataFrame]) -> pd.DataFrame:
         Cleaned glucose DataFrame.
     """
     if df is None or df.empty:
-        print("Glucose dataframe is empty.")
+        logger.warning("Glucose dataframe is empty.")
         return pd.DataFrame()
 
-    print("Cleaning Glucose data")
-    print("Dataframe rows and columns size before cleaning:", df.shape)
+    logger.info("Cleaning Glucose data")
+    logger.info(f"Dataframe rows and columns size before cleaning: {df.shape}")
 
-    df = rename_columns(df, {
-        'SEQN': 'participant_id',
-        'WTSAF2YR': 'fasting_subsample_weight',
-        'LBXGLU': 'fasting_glucose_mg_dl',
-        'LBDGLUSI': 'fasting_glucose_mmol_l'
-    })
+    df = rename_columns(df, rename_map("GLU_L"))
     
-    df['participant_id'] = df['participant_id'].apply(
-    lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
+    df['participant_id'] = normalize_participant_id(df['participant_id'])
 
     df['fasting_subsample_weight'] = pd.to_numeric(df['fasting_subsample_weight'], errors='coerce')
 
     show_missing(df, "Glucose - Before Cleaning")
 
-    df = replace_close_values_with_nan(df, target=0, tolerance=1e-5, columns=['fasting_subsample_weight'])
-
-    df = df[~(df['fasting_glucose_mg_dl'].isna() & df['fasting_glucose_mmol_l'].isna())]
+    df = replace_close_values_with_nan(df, target=0, tolerance=1e-5, columns=['fasting_subsample_weight'], inplace=True)
 
+    # Fill each unit from the other before filtering (rows missing both are dropped below)
     df.loc[df['fasting_glucose_mmol_l'].isna() & df['fasting_glucose_mg_dl'].notna(),
            'fasting_glucose_mmol_l'] = df['fasting_glucose_mg_dl'] / 18
 
     df.loc[df['fasting_glucose_mg_dl'].isna() & df['fasting_glucose_mmol_l'].notna(),
            'fasting_glucose_mg_dl'] = df['fasting_glucose_mmol_l'] * 18
 
-    df = remove_outliers(df, 'fasting_glucose_mg_dl', 59, 561)
-    df = remove_outliers(df, 'fasting_glucose_mmol_l', 3.3, 31.1)
-
-    df = df[df['fasting_subsample_weight'].notna()]
-    df = df[df['fasting_subsample_weight'] > 0]
+    # Plausible range in both units and a positive weight, selected in one pass
+    keep = (
+        df['fasting_glucose_mg_dl'].between(59, 561) &
+        df['fasting_glucose_mmol_l'].between(3.3, 31.1) &
+        (df['fasting_subsample_weight'] > 0)
+    )
+    df = df[keep]
 
     show_missing(df, "Glucose - After Cleaning")
-    print("Dataframe rows and columns size after cleaning:", df.shape)
+    logger.info(f"Dataframe rows and columns size after cleaning: {df.shape}")
 
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_path = CLEAN_DATA_DIR / "glu_l_clean.csv"
-    df.to_csv(output_path, index=False)
-    print(f"Saved cleaned Glucose data to {pretty_path(output_path)}")
+    output_path = partition_dir(CLEAN_DATA_DIR) / "glu_l_clean.csv"
+    output_path = save_dataframe(df, output_path)
+    logger.info(f"Saved cleaned Glucose data to {pretty_path(output_path)}")
 
     return df
 
 
 # Main function
 def main():
-    print("Starting clinical exam datasets cleaning")
+    logger.info("Starting clinical exam datasets cleaning")
 
     datasets_and_cleaners = [
         ("BMX_L", clean_bmi),
@@ -275,23 +191,23 @@ def main():
     cleaned_dfs = {}
 
     for label, clean_func in datasets_and_cleaners:
-        print(f"\nLoading dataset {label}")
+        logger.info(f"\nLoading dataset {label}")
         info = datasets.get(label)
         if not info:
-            print(f"No config entry found for {label}")
+            logger.warning(f"No config entry found for {label}")
             continue
 
         df = load_dataset(info["file_path"], info.get("columns"))
         if df is None:
-            print(f"{label} dataset not loaded.")
+            logger.warning(f"{label} dataset not loaded.")
             continue
 
-        print(f"Cleaning {label} dataset...")
+        logger.info(f"Cleaning {label} dataset...")
         cleaned_df = clean_func(df)
-        print(f"Finished cleaning {label}, cleaned shape: {cleaned_df.shape}")
+        logger.info(f"Finished cleaning {label}, cleaned shape: {cleaned_df.shape}")
         cleaned_dfs[label] = cleaned_df    
 
-    print("\nAll cleaning complete.")
+    logger.info("\nAll cleaning complete.")
 
 if __name__ == "__main__":
     main()
@@ -23,14 +23,21 @@ import pandas as pd
 import numpy as np
 from scripts.config import CLEAN_DATA_DIR, datasets
 from scripts.data_loading import load_dataset
+from scripts.dataset_specs import rename_map
+from scripts.storage import partition_dir, save_dataframe
+from scripts.profiling import profiled
 from scripts.utils import (
     rename_columns,
     drop_missing,
     remove_outliers,
     drop_invalid_weight,
     replace_close_values_with_nan,
+    normalize_participant_id,
     pretty_path
 )
+from scripts.pipeline_log import get_logger
+
+logger = get_logger(__name__)
 
 # Mapping dictionaries for converting numeric codes to readable labels
 gender_map = {
@@ -56,6 +63,7 @@ edu_map = {
 }
 
 
+@profiled("clean", "DEMO_L")
 def clean_demo(df: pd.DataFrame) -> pd.DataFrame:
     """
     Cleans the DEMO_L dataset.
@@ -70,29 +78,15 @@ def clean_demo(df: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: Cleaned dataframe, ready for analysis or merging.
     """
     if df.empty:
-        print("The dataframe is empty.")
+        logger.warning("The dataframe is empty.")
         return df
 
-    print("Cleaning process begins") 
-    print("DEMO_L dataset rows and columns before cleaning:", df.shape)
+    logger.info("Cleaning process begins")
+    logger.info(f"DEMO_L dataset rows and columns before cleaning: {df.shape}")
 
     # Rename columns
-    new_names = {
-        "SEQN": "participant_id",
-        "RIDAGEYR": "age",
-        "RIAGENDR": "gender",
-        "RIDRETH3": "race_ethnicity",
-        "DMDEDUC2": "education_level",
-        "INDFMPIR": "poverty_income_ratio",
-        "WTMEC2YR": "exam_sample_weight",
-        "WTINT2YR": "interview_sample_weight",
-        "SDMVSTRA": "strata",
-        "SDMVPSU": "psu"
-    }
-    df = rename_columns(df, new_names) 
-    df['participant_id'] = df['participant_id'].apply(
-    lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
+    df = rename_columns(df, rename_map("DEMO_L"))
+    df['participant_id'] = normalize_participant_id(df['participant_id'])
 
     # Ensure key columns are numeric
     numeric_cols = ["age", "poverty_income_ratio", "exam_sample_weight", 
@@ -101,35 +95,35 @@ def clean_demo(df: pd.DataFrame) -> pd.DataFrame:
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
     # Drop rows with missing key values
-    print("Dropped rows with missing age...")
+    logger.info("Dropped rows with missing age...")
     df = drop_missing(df, ["age"])
 
     # Filter out participants under 20 years old
-    print("Removed people under 20 years old...")
+    logger.info("Removed people under 20 years old...")
     df = remove_outliers(df, "age", 20, np.inf)
 
-    print("Dropping rows missing gender, race, strata, or PSU...")
+    logger.info("Dropping rows missing gender, race, strata, or PSU...")
     df = drop_missing(df, ["gender", "race_ethnicity", "strata", "psu"])
 
     # Map numeric codes to text
-    print("Mapping gender, race, and education level to text...")
+    logger.info("Mapping gender, race, and education level to text...")
     df["gender"] = df["gender"].map(gender_map)
     df["race_ethnicity"] = df["race_ethnicity"].map(race_map)
     df["education_level"] = df["education_level"].map(edu_map).fillna("Missing")
 
     # Replace weird tiny float values
-    print("Replacing weird tiny float values (e.g., 5.39e-79) with NaN...")
+    logger.info("Replacing weird tiny float values (e.g., 5.39e-79) with NaN...")
     weird_val = 5.39760534693402e-79
     tolerance = 1e-80
     float_cols = ["age", "poverty_income_ratio", "exam_sample_weight", 
                   "interview_sample_weight", "strata", "psu"]
-    df = replace_close_values_with_nan(df, weird_val, tolerance, float_cols)
+    df = replace_close_values_with_nan(df, weird_val, tolerance, float_cols, inplace=True)
 
     # Convert age to integer after cleaning float artifacts
     df["age"] = df["age"].round().astype("Int64")
 
    # Impute missing PIR values safely
-    print("Imputing missing poverty_income_ratio (PIR) within education_level + race_ethnicity groups...")
+    logger.info("Imputing missing poverty_income_ratio (PIR) within education_level + race_ethnicity groups...")
     missing_before = df["poverty_income_ratio"].isna().sum()
 
     # Step 1: Groupwise median PIR
@@ -142,23 +136,22 @@ def clean_demo(df: pd.DataFrame) -> pd.DataFrame:
     df["poverty_income_ratio"] = df["poverty_income_ratio"].fillna(df["poverty_income_ratio"].median())
 
     missing_after = df["poverty_income_ratio"].isna().sum()
-    print(f"Imputed PIR: {missing_before - missing_after} filled, {missing_after} still missing")
+    logger.info(f"Imputed PIR: {missing_before - missing_after} filled, {missing_after} still missing")
     
     # Remove invalid weights
-    print("Removing missing and invalid sample weights")
+    logger.info("Removing missing and invalid sample weights")
     df = drop_invalid_weight(df, "exam_sample_weight")
 
     # Flag missing interview weights
-    print("Checking for missing interview sample weight...")
+    logger.info("Checking for missing interview sample weight...")
     df["interview_sample_weight_missing"] = df["interview_sample_weight"].isna()
 
-    print("DEMO_L dataset rows and columns after cleaning:", df.shape)
+    logger.info(f"DEMO_L dataset rows and columns after cleaning: {df.shape}")
 
     # Save cleaned data
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_path = CLEAN_DATA_DIR / "demo_l_clean.csv"
-    df.to_csv(output_path, index=False)
-    print("Saved cleaned data to:", pretty_path(output_path))
+    output_path = partition_dir(CLEAN_DATA_DIR) / "demo_l_clean.csv"
+    output_path = save_dataframe(df, output_path)
+    logger.info(f"Saved cleaned data to: {pretty_path(output_path)}")
     return df
 
 
@@ -166,11 +159,11 @@ def main() -> None:
     """
     Loads and cleans the DEMO_L dataset using the cleaning pipeline.
     """
-    print("Loading DEMO_L dataset...")
+    logger.info("Loading DEMO_L dataset...")
     label = "DEMO_L"
     demo_info = datasets.get(label)
     if demo_info is None:
-        print(f"{label} not found in datasets config.")
+        logger.warning(f"{label} not found in datasets config.")
         return
 
     file_path = demo_info["file_path"]
@@ -178,12 +171,12 @@ def main() -> None:
     df = load_dataset(file_path, columns)
 
     if df is None:
-        print(f"Dataset '{label}' not found or failed to load. Exiting.")
+        logger.warning(f"Dataset '{label}' not found or failed to load. Exiting.")
         return
 
-    print("Dataset loaded. Cleaning now...")
+    logger.info("Dataset loaded. Cleaning now...")
     cleaned_df = clean_demo(df)    
-    print("Cleaning complete.")
+    logger.info("Cleaning complete.")
 
 
 if __name__ == "__main__":
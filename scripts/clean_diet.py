@@ -3,10 +3,15 @@ script\\clean_diet
 This script handles cleaning and preprocessing of dietary datasets.
 
 It includes two main cleaning functions: one for the total diet dataset and one for
-the individual diet dataset. Each function renames columns for clarity, handles
+the individual diet dataset. Day-2 recall files (DR2TOT_L, DR2IFF_L) are cleaned with
+the same rules as day 1. Each function renames columns for clarity, handles
 corrupted or suspicious values, deals with missing or zero values appropriately,
 removes outliers, and saves the cleaned data to csv file.
+
+Individual foods files are the largest NHANES tables, so they can also be cleaned
+out of core, chunk by chunk, straight from the XPT file (clean_individual_diet_chunked).
 """
+import shutil
 import sys
 from pathlib import Path
 
@@ -17,28 +22,37 @@ if str(project_root) not in sys.path:
     
 import pandas as pd
 import numpy as np
+from typing import Any, Dict, Optional, Tuple, Union
 
+from scripts.clean_spec import clean_with_spec
 from scripts.config import CLEAN_DATA_DIR, datasets
-from scripts.data_loading import load_dataset
+from scripts.data_loading import apply_cycle_layout, load_dataset
+from scripts.dataset_specs import DATASET_SPECS, layout_columns, rename_map
+from scripts.storage import (
+    parts_dir, partition_dir, remove_stored, replace_with_parts, save_dataframe, save_part, staging_path
+)
+from scripts.profiling import profiled, record_rows
+from scripts.xpt_reader import DEFAULT_CHUNKSIZE, iter_xpt_chunks
 from scripts.utils import (
     rename_columns,
     show_missing,
     replace_zeros_with_nan,
-    drop_invalid_weight,
+    valid_weight_mask,
     replace_close_values_with_nan,
-    remove_outliers,
-    drop_missing,
+    normalize_participant_id,
     pretty_path
 )
+from scripts.pipeline_log import diagnostics_enabled, get_logger, log_diagnostic
+
+logger = get_logger(__name__)
 
 def clean_total_diet(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Clean and prepare the total diet dataset.
+    Clean and prepare the total diet dataset with the DR1TOT_L spec.
 
-    This function renames columns for clarity, handles corrupted values by replacing
-    near-zero corrupted floats with NaN, removes missing and invalid weight entries,
-    filters out outliers in key dietary metrics, and finally saves the cleaned data
-    to a CSV file.
+    Renames columns for clarity, replaces near-zero corrupted floats with NaN,
+    removes missing and invalid weight entries, filters out outliers in key dietary
+    metrics, and saves the cleaned data.
 
     Args:
         df (pd.DataFrame): Raw total diet data to be cleaned.
@@ -46,54 +60,97 @@ def clean_total_diet(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: The cleaned total diet dataset.
     """
-    if df.empty:
-        print("The dataframe is empty.")
-        return df
+    return clean_with_spec(df, "DR1TOT_L")
 
-    print("Starting total diet cleaning...")
-    print("Initial shape:", df.shape)
 
-    rename_map = {
-        'DR1TKCAL': 'energy_kcal',
-        'DR1TSODI': 'sodium_mg',
-        'DR1TSFAT': 'satfat_g',       
-        'WTDRD1': 'total_diet_weight',
-        'SEQN': 'participant_id'
-    }
-    df = rename_columns(df, rename_map)
+# Individual foods columns coerced to float, and the largest plausible energy of one food item
+INDIVIDUAL_FLOAT_COLS = ["energy_kcal", "grams_consumed", "food_item_weight"]
+MAX_FOOD_ENERGY_KCAL = 4575
 
-    df["participant_id"] = df["participant_id"].apply(
-        lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
 
-    corrupted_val = 5.397605e-79
-    tolerance = 1e-78
-    num_cols = ['energy_kcal', 'sodium_mg', 'satfat_g']
-    df = replace_close_values_with_nan(df, target=corrupted_val, tolerance=tolerance, columns=num_cols)
+def _clean_individual_rows(
+    df: pd.DataFrame,
+    name: str,
+    inplace: bool = False
+) -> Tuple[pd.DataFrame, Dict[str, pd.Series]]:
+    """
+    Applies the individual foods cleaning rules to a whole file or to one chunk of it.
 
-    # Step 2: Skip replacing zeros with NaN (zeros allowed)
+    Every rule looks at one row at a time, so cleaning a file chunk by chunk gives the
+    same rows as cleaning it at once. The counts that are reported are returned instead
+    of logged, so chunked runs can add them up; they are only computed when DIAGNOSTIC
+    messages are enabled (the dict is empty otherwise).
 
-    required_columns = ['energy_kcal', 'sodium_mg', 'satfat_g']
-    df = drop_missing(df, columns=required_columns)
+    The raw rows are copied at most once (by the rename, not at all if inplace or under
+    Copy-on-Write); every later step works in place and the row filters are applied
+    as one selection at the end.
 
-    df = drop_invalid_weight(df, weight_column='total_diet_weight')
+    Returns:
+        Tuple of (cleaned rows, counts before cleaning and missing values after it).
+    """
+    df = rename_columns(df, rename_map(name), inplace=inplace)
 
-    df = remove_outliers(df, column='energy_kcal', min_value=0, max_value=10446)
-    df = remove_outliers(df, column='sodium_mg', min_value=0, max_value=20006)
-    df = remove_outliers(df, column='satfat_g', min_value=0, max_value=208.842)
+    df["participant_id"] = normalize_participant_id(df["participant_id"])
 
-    show_missing(df, name="Final Cleaned Dataset (with Sodium)")
+    for col in INDIVIDUAL_FLOAT_COLS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_path = CLEAN_DATA_DIR / "dr1tot_l_clean.csv"
-    df.to_csv(output_path, index=False)
-    print("Saved cleaned file to:", pretty_path(output_path))
+    # The counts are diagnostics: they are skipped when that log level is disabled
+    diagnostics = diagnostics_enabled(logger)
+    counts = {}
+    if diagnostics:
+        counts["initial"] = pd.Series({
+            "Missing grams_consumed": df["grams_consumed"].isna().sum(),
+            "Zero grams_consumed": (df["grams_consumed"] == 0).sum(),
+            "Missing energy_kcal": df["energy_kcal"].isna().sum(),
+            "Zero energy_kcal": (df["energy_kcal"] == 0).sum(),
+        })
 
-    print("Final shape after cleaning:", df.shape)
-    return df
+    weird_val = 5.39760534693402e-79
+    tolerance = 1e-80    
+    df = replace_close_values_with_nan(df, weird_val, tolerance, INDIVIDUAL_FLOAT_COLS, inplace=True)
 
+    df = replace_zeros_with_nan(df, ["grams_consumed"], inplace=True)
+
+    df.loc[(df["energy_kcal"] <= 0) & (df["food_item_weight"] > 0), "energy_kcal"] = np.nan
+
+    # Missing values are reported for the rows with a plausible energy
+    plausible_energy = (df["energy_kcal"] <= MAX_FOOD_ENERGY_KCAL).to_numpy()
+    if diagnostics:
+        counts["missing"] = pd.Series(
+            df[INDIVIDUAL_FLOAT_COLS].isnull().to_numpy()[plausible_energy].sum(axis=0),
+            index=INDIVIDUAL_FLOAT_COLS
+        )
+
+    df["food_code"] = pd.to_numeric(df["food_code"], errors="coerce")
+
+    # Rows are selected once, before the flag columns are added. take returns a frame of
+    # its own (not a view of the raw chunk), so adding the flags never warns or copies again.
+    keep = plausible_energy & valid_weight_mask(df["food_item_weight"]) & df["food_code"].notna().to_numpy()
+    df = df.take(np.flatnonzero(keep))
+
+    df["energy_kcal_outlier_flag"] = (df["energy_kcal"] > MAX_FOOD_ENERGY_KCAL).astype(int)
+
+    df["grams_consumed_missing_flag"] = df["grams_consumed"].isna().astype(int)
+    df["energy_kcal_missing_flag"] = df["energy_kcal"].isna().astype(int)
+
+    df["dietary_recall_complete"] = np.where(df["food_item_weight"] > 0, 1, 0)
 
-def clean_individual_diet(df: pd.DataFrame) -> pd.DataFrame:
+    return df, counts
+
+
+def _log_individual_counts(counts: Dict[str, pd.Series], name: str) -> None:
+    if not counts:
+        return
+    log_diagnostic(logger, "Initial missing and zero value counts:")
+    for label, count in counts["initial"].items():
+        log_diagnostic(logger, f"{label}: {count}", dataset=name)
+    log_diagnostic(logger, "Missing data summary:")
+    log_diagnostic(logger, "Missing values in dataset: Dietary", lambda: counts["missing"], dataset=name)
+
+
+@profiled("clean", name_arg="name")
+def clean_individual_diet(df: pd.DataFrame, name: str = "DR1IFF_L") -> pd.DataFrame:
     """
     Clean and process the individual diet dataset.
 
@@ -104,111 +161,147 @@ def clean_individual_diet(df: pd.DataFrame) -> pd.DataFrame:
 
     Args:
         df (pd.DataFrame): Raw individual diet data.
+        name (str): Dataset spec of the file (individual foods of recall day 1 by default).
 
     Returns:
         pd.DataFrame: Cleaned and filtered individual diet dataset.
     """
     if df.empty:
-        print("The dataframe is empty.")
+        logger.warning("The dataframe is empty.")
         return df
 
-    print("Starting cleaning...")
-    print("Initial shape:", df.shape)
-  
-    rename_map = {
-        "SEQN": "participant_id",
-        "DR1IGRMS": "grams_consumed",
-        "DR1IKCAL": "energy_kcal",
-        "WTDRD1": "food_item_weight",
-        "DR1IFDCD": "food_code"
-    }
-    df = rename_columns(df, rename_map)
-
-    df["participant_id"] = df["participant_id"].apply(
-        lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
-
-    float_cols = ["energy_kcal", "grams_consumed", "food_item_weight"]
-    for col in float_cols:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    print("Initial missing and zero value counts:")
-    print("Missing grams_consumed:", df["grams_consumed"].isna().sum())
-    print("Zero grams_consumed:", (df["grams_consumed"] == 0).sum())
-    print("Missing energy_kcal:", df["energy_kcal"].isna().sum())
-    print("Zero energy_kcal:", (df["energy_kcal"] == 0).sum())
+    logger.info("Starting cleaning...")
+    logger.info(f"Initial shape: {df.shape}")
 
-    weird_val = 5.39760534693402e-79
-    tolerance = 1e-80    
-    df = replace_close_values_with_nan(df, weird_val, tolerance, float_cols)
+    df, counts = _clean_individual_rows(df, name)
+    _log_individual_counts(counts, name)
 
-    df = replace_zeros_with_nan(df, ["grams_consumed"])
+    logger.info(f"Final shape after cleaning: {df.shape}")
 
-    df.loc[(df["energy_kcal"] <= 0) & (df["food_item_weight"] > 0), "energy_kcal"] = np.nan
+    output_path = partition_dir(CLEAN_DATA_DIR) / DATASET_SPECS[name]["output"]
+    remove_stored(output_path)
+    output_path = save_dataframe(df, output_path)
+    logger.info(f"Saved cleaned file to: {pretty_path(output_path)}")
 
-    df["energy_kcal_outlier_flag"] = (df["energy_kcal"] > 4575).astype(int)
+    return df
 
-    df = df[df["energy_kcal"] <= 4575]
 
-    df["grams_consumed_missing_flag"] = df["grams_consumed"].isna().astype(int)
-    df["energy_kcal_missing_flag"] = df["energy_kcal"].isna().astype(int)
+def clean_individual_diet_day2(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Clean the individual diet dataset of recall day 2 (DR2IFF_L) with the day-1 rules.
 
-    df["dietary_recall_complete"] = np.where(df["food_item_weight"] > 0, 1, 0)
+    Args:
+        df (pd.DataFrame): Raw day-2 individual diet data.
 
-    print("Missing data summary:")
-    show_missing(df[["energy_kcal", "grams_consumed", "food_item_weight"]], name="Dietary")
+    Returns:
+        pd.DataFrame: Cleaned and filtered day-2 individual diet dataset.
+    """
+    return clean_individual_diet(df, "DR2IFF_L")
 
-    df = drop_invalid_weight(df, "food_item_weight")
 
-    df["food_code"] = pd.to_numeric(df["food_code"], errors="coerce")
-    df = df[df["food_code"].notna()]
+@profiled("clean", name_arg="name")
+def clean_individual_diet_chunked(
+    file_path: Union[str, Path],
+    name: str = "DR1IFF_L",
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    layout: Optional[Dict[str, Any]] = None
+) -> Optional[Path]:
+    """
+    Clean an individual diet XPT file out of core, one chunk of rows at a time.
 
-    print("Final shape after cleaning:", df.shape)
+    Each chunk is read with only the spec columns, cleaned with the same rules as
+    clean_individual_diet and written as one part file of the clean dataset
+    (e.g. data/clean/dr1iff_l_clean/part-00000.parquet). Only one chunk is held in
+    memory, and the parts read back (see storage.load_dataframe) equal the in-memory result.
 
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_path = CLEAN_DATA_DIR / "dr1iff_l_clean.csv"
-    df.to_csv(output_path, index=False)
-    print("Saved cleaned file to:", pretty_path(output_path))
+    Args:
+        file_path: Raw individual foods XPT file.
+        name: Dataset spec of the file (individual foods of recall day 1 by default,
+            'DR2IFF_L' for day 2).
+        chunksize: Rows read and cleaned per chunk.
+        layout: Layout of a file from another NHANES cycle (see dataset_specs.cycle_layout);
+            each chunk is conformed to the spec before cleaning.
 
-    return df
+    Returns:
+        Optional[Path]: Folder of part files, or None if the file could not be read.
+    """
+    spec = DATASET_SPECS[name]
+    logger.info(f"Starting chunked cleaning of {name} ({chunksize} rows per chunk)...")
+
+    # Parts are staged next to the output and only replace it once every chunk is written
+    output_path = partition_dir(CLEAN_DATA_DIR) / spec["output"]
+    staged_path = staging_path(output_path)
+    shutil.rmtree(parts_dir(staged_path), ignore_errors=True)
+
+    rows_in = rows_out = 0
+    totals: Dict[str, pd.Series] = {}
+    try:
+        columns = layout_columns(layout) if layout else list(spec["columns"])
+        for index, chunk in enumerate(iter_xpt_chunks(file_path, columns, chunksize=chunksize)):
+            if layout:
+                chunk = apply_cycle_layout(chunk, layout)
+            cleaned, counts = _clean_individual_rows(chunk, name, inplace=True)
+            for key, count in counts.items():
+                totals[key] = totals[key] + count if key in totals else count
+            save_part(cleaned, staged_path, index)
+            rows_in += len(chunk)
+            rows_out += len(cleaned)
+    except (OSError, KeyError, ValueError) as e:
+        logger.error(f"Error reading {pretty_path(file_path)}: {e}")
+        shutil.rmtree(parts_dir(staged_path), ignore_errors=True)
+        return None
+
+    if not rows_in:
+        logger.warning("The dataframe is empty.")
+        shutil.rmtree(parts_dir(staged_path), ignore_errors=True)
+        return None
+
+    output_dir = replace_with_parts(staged_path, output_path)
+
+    record_rows(rows_in, rows_out)
+    logger.info(f"Initial shape: {(rows_in, len(spec['columns']))}")
+    _log_individual_counts(totals, name)
+    logger.info(f"Final shape after cleaning: {(rows_out, len(cleaned.columns))}")
+    logger.info(f"Saved cleaned parts to: {pretty_path(output_dir)}")
+    return output_dir
 
 
 def main() -> None:
     # Example: run clean_total_diet
-    print("Loading DR1TOT_L dataset")
+    logger.info("Loading DR1TOT_L dataset")
     label_total = "DR1TOT_L"
     diet_info_total = datasets.get(label_total)
 
     if diet_info_total is None:
-        print(f"{label_total} not found in datasets config.")
+        logger.warning(f"{label_total} not found in datasets config.")
     else:
         file_path_total = diet_info_total["file_path"]
-        print("Loading data from:", pretty_path(file_path_total))
+        logger.info(f"Loading data from: {pretty_path(file_path_total)}")
         columns_total = diet_info_total.get("columns")
         df_total = load_dataset(file_path_total, columns_total)
 
         if df_total is not None and not df_total.empty:
             clean_total_diet(df_total)
         else:
-            print("Total diet dataset not loaded or empty.")
+            logger.warning("Total diet dataset not loaded or empty.")
 
     # Example: run clean_diet
-    print("\nLoading DR1IFF_L dataset")
+    logger.info("\nLoading DR1IFF_L dataset")
     label_individual = "DR1IFF_L"
     diet_info_individual = datasets.get(label_individual)
 
     if diet_info_individual is None:
-        print(f"{label_individual} not found in datasets config.")
+        logger.warning(f"{label_individual} not found in datasets config.")
     else:
         file_path_individual = diet_info_individual["file_path"]
-        print("Loading data from:", pretty_path(file_path_individual))
+        logger.info(f"Loading data from: {pretty_path(file_path_individual)}")
         columns_individual = diet_info_individual.get("columns")
         df_individual = load_dataset(file_path_individual, columns_individual)
 
         if df_individual is not None and not df_individual.empty:
             clean_individual_diet(df_individual)
         else:
-            print("Individual diet dataset not loaded or empty.")
+            logger.warning("Individual diet dataset not loaded or empty.")
 
 
 if __name__ == "__main__":
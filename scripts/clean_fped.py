@@ -22,11 +22,16 @@ import pandas as pd
 import numpy as np
 from scripts.config import CLEAN_DATA_DIR, datasets
 from scripts.data_loading import load_dataset
+from scripts.storage import partition_dir, save_dataframe
+from scripts.profiling import profiled
 from scripts.utils import (
     drop_missing,
     replace_close_values_with_nan,
     pretty_path
 )
+from scripts.pipeline_log import get_logger
+
+logger = get_logger(__name__)
 
 def rename_columns_remove_units(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -40,6 +45,7 @@ def rename_columns_remove_units(df: pd.DataFrame) -> pd.DataFrame:
         new_names[col] = new_col
     return df.rename(columns=new_names)
 
+@profiled("clean", "FPED_1720")
 def clean_fped(df: pd.DataFrame) -> pd.DataFrame:
     """
     Clean FPED_1720 dataset.
@@ -51,11 +57,11 @@ def clean_fped(df: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: Cleaned dataframe.
     """
     if df.empty:
-        print("The dataframe is empty.")
+        logger.warning("The dataframe is empty.")
         return df
 
-    print("Cleaning FPED dataset...")
-    print("Initial shape:", df.shape)
+    logger.info("Cleaning FPED dataset...")
+    logger.info(f"Initial shape: {df.shape}")
 
     # Rename columns to remove units
     df = rename_columns_remove_units(df)
@@ -70,32 +76,31 @@ def clean_fped(df: pd.DataFrame) -> pd.DataFrame:
     # Replace tiny float anomalies with NaN
     weird_val = 5.39760534693402e-79
     tolerance = 1e-80
-    df = replace_close_values_with_nan(df, weird_val, tolerance, numeric_cols)
+    df = replace_close_values_with_nan(df, weird_val, tolerance, numeric_cols, inplace=True)
 
     # Drop rows missing FOODCODE or DESCRIPTION
-    print("Dropping rows missing FOODCODE or DESCRIPTION...")
+    logger.info("Dropping rows missing FOODCODE or DESCRIPTION...")
     df = drop_missing(df, ['FOODCODE', 'DESCRIPTION'])
 
     # Drop rows where all numeric columns are missing
-    print("Dropping rows where all numeric columns are missing...")
+    logger.info("Dropping rows where all numeric columns are missing...")
     df = df.dropna(subset=numeric_cols, how='all')
 
-    print("Final shape after cleaning:", df.shape)
+    logger.info(f"Final shape after cleaning: {df.shape}")
 
     # Save cleaned data
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_path = CLEAN_DATA_DIR / "fped_1720_clean.csv"
-    df.to_csv(output_path, index=False)
-    print("Saved cleaned data to:", pretty_path(output_path))
+    output_path = partition_dir(CLEAN_DATA_DIR) / "fped_1720_clean.csv"
+    output_path = save_dataframe(df, output_path)
+    logger.info(f"Saved cleaned data to: {pretty_path(output_path)}")
 
     return df
 
 def main() -> None:
-    print("Loading FPED_1720 dataset...")
+    logger.info("Loading FPED_1720 dataset...")
     label = "FPED_1720"
     fped_info = datasets.get(label)
     if fped_info is None:
-        print(f"{label} not found in datasets config.")
+        logger.warning(f"{label} not found in datasets config.")
         return
 
     file_path = fped_info["file_path"]
@@ -103,12 +108,12 @@ def main() -> None:
     df = load_dataset(file_path, columns, sheet_name=fped_info.get("sheet_name"))
 
     if df is None:
-        print(f"Dataset '{label}' not found or failed to load. Exiting.")
+        logger.warning(f"Dataset '{label}' not found or failed to load. Exiting.")
         return
 
-    print("Dataset loaded. Cleaning now...")
+    logger.info("Dataset loaded. Cleaning now...")
     cleaned_df = clean_fped(df)
-    print("Cleaning complete.")
+    logger.info("Cleaning complete.")
 
 if __name__ == "__main__":
     main()
@@ -12,20 +12,23 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 import pandas as pd
-import numpy as np
-from scripts.config import CLEAN_DATA_DIR, datasets
+from scripts.clean_spec import clean_with_spec
+from scripts.config import datasets
 from scripts.data_loading import load_dataset
-from scripts.utils import rename_columns, show_missing, drop_missing, pretty_path
+from scripts.pipeline_log import get_logger
+
+logger = get_logger(__name__)
 
 def clean_insurance_coverage(df: pd.DataFrame) -> pd.DataFrame:
     """
     Cleans the HIQ_L dataset, which contains information about health insurance coverage.
 
+    Runs the HIQ_L spec (scripts/dataset_specs.py):
     - Renames columns for readability.
     - Replaces invalid responses (e.g., 'Refused', 'Don't know') with NaN.
     - Drops rows where the insurance status is missing.
     - Maps numeric codes to "Yes"/"No" strings.
-    - Saves the cleaned data to a CSV file.
+    - Saves the cleaned data.
 
     Args:
         df: Raw DataFrame loaded from the HIQ_L dataset.
@@ -33,36 +36,8 @@ def clean_insurance_coverage(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         A cleaned DataFrame with standardized health insurance data.
     """
-    label = "HIQ_L"
-    print(f"Cleaning {label} dataset")
-    print("Insurance dataset rows and columns size before cleaning:", df.shape)
-    
-    # Rename Columns
-    df = rename_columns(df, {"SEQN": "participant_id", "HIQ011": "has_health_insurance"})
-    df['participant_id'] = df['participant_id'].apply(
-    lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
-
-    df["has_health_insurance"] = df["has_health_insurance"].replace([7, 9, "."], pd.NA)
-
-    show_missing(df, label + " before dropping missing")
-
-    # drop missing values
-    df = drop_missing(df, ["has_health_insurance"])
-
-    # Mapping
-    df["has_health_insurance"] = df["has_health_insurance"].map({1: "Yes", 2: "No"})
-
-    print(f"Unique values in 'has_health_insurance':", df["has_health_insurance"].unique())
-    print("Health insurance dataset rows and columns size after cleaning:", df.shape)
-
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_file = CLEAN_DATA_DIR / f"{label.lower()}_clean.csv"
-    df.to_csv(output_file, index=False)
-    print(f"Saved cleaned data to: {pretty_path(output_file)}")
-
+    return clean_with_spec(df, "HIQ_L")
 
-    return df
 
 def main() -> None:
     """
@@ -78,7 +53,7 @@ def main() -> None:
         if not df_ins.empty:
             clean_insurance_coverage(df_ins)
 
-    print("Cleaning complete.")
+    logger.info("Cleaning complete.")
 
 
 if __name__ == "__main__":
@@ -8,6 +8,7 @@ on physical and sedentary behaviors.
 - Normalizes activity frequency units (e.g., per day, per week).
 - Replaces invalid or implausible values with NaN.
 - Caps frequency and duration based on plausible physical limits.
+- Converts frequency/unit pairs to weekly values with vectorized unit lookups.
 - Calculates weekly total and sedentary activity time.
 - Saves the cleaned dataframe as a CSV.
 """
@@ -24,17 +25,49 @@ import pandas as pd
 import numpy as np
 from scripts.config import CLEAN_DATA_DIR, datasets
 from scripts.data_loading import load_dataset
-from scripts.utils import rename_columns, show_missing, drop_missing, pretty_path
-
-# Max plausible frequencies per unit
-FREQ_LIMITS = {'D': 4, 'W': 28, 'M': 31, 'Y': 365}
-
-# Weekly conversion factors
-WEEKLY_CONVERSION = {'D': 7, 'W': 1, 'M': 1 / 4.345, 'Y': 1 / 52}
-
-VALID_UNITS = set(FREQ_LIMITS.keys())
-INVALID_VALUES = [7777, 9999]
-
+from scripts.dataset_specs import rename_map
+from scripts.storage import partition_dir, save_dataframe
+from scripts.profiling import profiled
+from scripts.utils import (
+    rename_columns,
+    show_missing,
+    drop_missing,
+    normalize_participant_id,
+    frequency_per_week,
+    pretty_path
+)
+from scripts.pipeline_log import get_logger
+
+logger = get_logger(__name__)
+
+# Sedentary minutes per day: Refused/Don't know codes, and a whole day or more, are invalid
+SEDENTARY_SENTINELS = [7777, 9999]
+MINUTES_PER_DAY = 1440
+
+# Frequency/unit question pairs converted to weekly minutes, one entry per activity domain,
+# each with its own cleaning rules:
+# - 'sentinels': Refused/Don't know codes of the frequency and duration answers,
+# - 'freq_limits': max plausible frequency per unit (other units are invalid),
+# - 'weekly_conversion': factor converting each unit to times per week,
+# - 'max_duration': max plausible minutes per session.
+# Only the leisure-time pair read by the PAQ_L spec (PAD790Q/PAD790U/PAD800, filled from
+# PAQ670/PAD675 in GPAQ cycles) is defined. Another pair needs its columns in the dataset
+# spec first, then becomes a new entry here.
+ACTIVITY_DOMAINS = {
+    "leisure": {
+        "freq": "freq",
+        "unit": "freq_unit",
+        "duration": "duration_min",
+        "freq_per_week": "freq_per_week",
+        "weekly_min": "total_weekly_min",
+        "sentinels": [7777, 9999],
+        "freq_limits": {'D': 4, 'W': 28, 'M': 31, 'Y': 365},
+        "weekly_conversion": {'D': 7, 'W': 1, 'M': 1 / 4.345, 'Y': 1 / 52},
+        "max_duration": 120,
+    },
+}
+
+@profiled("clean", "PAQ_L")
 def clean_physical_activity(df: pd.DataFrame) -> pd.DataFrame:
     """
     Cleans the PAQ_L physical activity dataset.
@@ -49,79 +82,58 @@ def clean_physical_activity(df: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: Cleaned dataframe ready for analysis.
     """
     if df.empty:
-        print("[PAQ_L] The dataframe is empty. Nothing to clean.")
+        logger.warning("[PAQ_L] The dataframe is empty. Nothing to clean.")
         return df
 
-    print("cleaning process begins")
-    print("Dataframe rows and columns size before cleaning:", df.shape)
+    logger.info("cleaning process begins")
+    logger.info(f"Dataframe rows and columns size before cleaning: {df.shape}")
 
     # Rename columns
-    rename_map = {
-        'SEQN': 'participant_id',
-        'PAD790Q': 'freq',
-        'PAD790U': 'freq_unit',
-        'PAD800': 'duration_min',
-        'PAD680': 'sedentary_min_per_day'
-    }
-    df = rename_columns(df, rename_map)
-    df['participant_id'] = df['participant_id'].apply(
-    lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
-
-    # Convert columns to numeric, coercing errors to NaN
-    for col in ['freq', 'duration_min', 'sedentary_min_per_day']:
-        df[col] = pd.to_numeric(df.get(col), errors='coerce')
-
-    # Clean frequency unit column
-    df['freq_unit'] = df['freq_unit'].astype(str).str.strip().str.upper()
-
-    # Replace invalid values with NaN
-    for col in ['freq', 'duration_min', 'sedentary_min_per_day']:
-        df.loc[df[col].isin(INVALID_VALUES), col] = np.nan
-
-    # Remove invalid frequency units
-    df.loc[~df['freq_unit'].isin(VALID_UNITS), 'freq_unit'] = np.nan
-
-    # Apply plausible limits
-    df.loc[df['sedentary_min_per_day'] >= 1440, 'sedentary_min_per_day'] = np.nan
-    df.loc[df['duration_min'] > 120, 'duration_min'] = np.nan
-    df.loc[df['freq'] == 0, 'freq'] = np.nan
-
-    # Cap frequency at max plausible per unit
-    def cap_frequency(row):
-        freq, unit = row['freq'], row['freq_unit']
-        if pd.isna(freq) or pd.isna(unit):
-            return np.nan
-        return freq if freq <= FREQ_LIMITS.get(unit, np.inf) else np.nan
-
-    df['freq'] = df.apply(cap_frequency, axis=1)
-
-    # Calculate weekly frequency
-    def to_weekly(row):
-        freq, unit = row['freq'], row['freq_unit']
-        if pd.isna(freq) or pd.isna(unit):
-            return np.nan
-        return freq * WEEKLY_CONVERSION.get(unit, np.nan)
-
-    df['freq_per_week'] = df.apply(to_weekly, axis=1)
-
-    # Calculate total weekly minutes and sedentary minutes per week
-    df['total_weekly_min'] = df['freq_per_week'] * df['duration_min']
+    df = rename_columns(df, rename_map("PAQ_L"))
+    df['participant_id'] = normalize_participant_id(df['participant_id'])
+
+    # Clean sedentary minutes: numeric, without invalid codes or implausible values
+    sedentary = pd.to_numeric(df.get('sedentary_min_per_day'), errors='coerce')
+    df['sedentary_min_per_day'] = sedentary.mask(sedentary.isin(SEDENTARY_SENTINELS) | (sedentary >= MINUTES_PER_DAY))
+
+    needed_cols = []
+    for domain in ACTIVITY_DOMAINS.values():
+        freq_col, unit_col, duration_col = domain['freq'], domain['unit'], domain['duration']
+
+        # Convert columns to numeric, coercing errors to NaN, and replace invalid codes with NaN
+        for col in [freq_col, duration_col]:
+            df[col] = pd.to_numeric(df.get(col), errors='coerce')
+            df.loc[df[col].isin(domain['sentinels']), col] = np.nan
+
+        # Clean frequency unit column and remove invalid units
+        df[unit_col] = df[unit_col].astype(str).str.strip().str.upper()
+        df.loc[~df[unit_col].isin(domain['freq_limits']), unit_col] = np.nan
+
+        # Apply plausible limits
+        df.loc[df[duration_col] > domain['max_duration'], duration_col] = np.nan
+        df.loc[df[freq_col] == 0, freq_col] = np.nan
+
+        # Cap frequency at max plausible per unit, then convert to weekly frequency and minutes
+        df[freq_col], df[domain['freq_per_week']] = frequency_per_week(
+            df[freq_col], df[unit_col], domain['freq_limits'], domain['weekly_conversion']
+        )
+        df[domain['weekly_min']] = df[domain['freq_per_week']] * df[duration_col]
+        needed_cols += [freq_col, duration_col, domain['freq_per_week'], domain['weekly_min']]
+
+    # Calculate sedentary minutes per week
     df['sedentary_min_per_week'] = df['sedentary_min_per_day'] * 7
 
     # Drop rows missing any of the critical columns
-    needed_cols = ['freq', 'duration_min', 'freq_per_week', 'total_weekly_min', 'sedentary_min_per_day']
-    df = drop_missing(df, needed_cols)  
+    df = drop_missing(df, needed_cols + ['sedentary_min_per_day'])
 
     # Show missing data summary
     show_missing(df, "PAQ_L")
 
     # Save cleaned data
-    CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-    output_file = CLEAN_DATA_DIR / "paq_l_clean.csv"
-    df.to_csv(output_file, index=False)
-    print("Dataframe rows and columns size after cleaning:", df.shape)
-    print(f"[PAQ_L] Cleaned data saved to: {pretty_path(output_file)}")
+    output_file = partition_dir(CLEAN_DATA_DIR) / "paq_l_clean.csv"
+    output_file = save_dataframe(df, output_file)
+    logger.info(f"Dataframe rows and columns size after cleaning: {df.shape}")
+    logger.info(f"[PAQ_L] Cleaned data saved to: {pretty_path(output_file)}")
 
     return df
 
@@ -130,22 +142,22 @@ def main():
     label = "PAQ_L"
     paq_info = datasets.get(label)
     if paq_info is None:
-        print(f"[{label}] Dataset info not found in datasets config.")
+        logger.warning(f"[{label}] Dataset info not found in datasets config.")
         return
 
     file_path = paq_info.get("file_path")
     columns = paq_info.get("columns")
 
-    print(f"[{label}] Loading dataset from {file_path}")
+    logger.info(f"[{label}] Loading dataset from {file_path}")
     df = load_dataset(file_path, columns)
 
     if df is None or df.empty:
-        print(f"[{label}] Failed to load or empty dataset.")
+        logger.warning(f"[{label}] Failed to load or empty dataset.")
         return
 
-    print(f"[{label}] Dataset loaded. Starting cleaning...")
+    logger.info(f"[{label}] Dataset loaded. Starting cleaning...")
     cleaned_df = clean_physical_activity(df)
-    print(f"[{label}] Cleaning complete.")
+    logger.info(f"[{label}] Cleaning complete.")
 
 
 if __name__ == "__main__":
@@ -23,30 +23,28 @@ import numpy as np
 from pathlib import Path
 from scripts.config import CLEAN_DATA_DIR, datasets
 from scripts.data_loading import load_dataset
+from scripts.dataset_specs import rename_map
+from scripts.storage import partition_dir, save_dataframe
+from scripts.profiling import profiled
 from scripts.utils import (
     rename_columns,
     show_missing,
     replace_close_values_with_nan,
+    normalize_participant_id,
+    apply_range_rules,
     pretty_path
 )
+from scripts.pipeline_log import get_logger, log_diagnostic
 
-def clean_sleep_hours(x: float | None) -> float | None:
-    """
-    Checks if a sleep value is reasonable.
-    
-    Args:
-        x: Number of hours someone reports sleeping per night.
-        
-    Returns:
-        The original value if it's between 3 and 14 hours.
-        Otherwise, returns NaN to mark it as invalid.
-    """
-    if pd.isna(x):
-        return np.nan
-    if x < 3 or x >= 14:
-        return np.nan
-    return x
+logger = get_logger(__name__)
+
+# Plausible sleep duration: at least 3 and under 14 hours per night
+SLEEP_RANGE_RULES = [
+    {"name": "sleep_hours", "columns": ["sleep_weekday_hr", "sleep_weekend_hr"],
+     "min": 3, "max": 14, "closed": "left", "action": "null"},
+]
 
+@profiled("clean", "SLQ_L")
 def clean_sleep(df: pd.DataFrame) -> pd.DataFrame:
     """
     Cleans and processes the SLQ_L sleep dataset.
@@ -67,22 +65,15 @@ def clean_sleep(df: pd.DataFrame) -> pd.DataFrame:
         Cleaned DataFrame with a new column for average weekly sleep hours.
     """
     if df.empty:
-        print("Warning: The dataframe is empty.")
+        logger.warning("Warning: The dataframe is empty.")
         return df
 
-    print("Cleaning SLQ_L dataset begins")
-    print(f"Dataframe shape before cleaning: {df.shape}")
+    logger.info("Cleaning SLQ_L dataset begins")
+    logger.info(f"Dataframe shape before cleaning: {df.shape}")
 
     # Rename confusing column names
-    new_names = {
-        "SEQN": "participant_id",
-        "SLD012": "sleep_weekday_hr",
-        "SLD013": "sleep_weekend_hr"
-    }
-    df = rename_columns(df, new_names)
-    df['participant_id'] = df['participant_id'].apply(
-    lambda x: str(int(x)) if pd.notnull(x) else np.nan
-    )
+    df = rename_columns(df, rename_map("SLQ_L"))
+    df['participant_id'] = normalize_participant_id(df['participant_id'])
     # Convert sleep hour columns to numeric (in case they’re stored as strings)
     sleep_cols = ["sleep_weekday_hr", "sleep_weekend_hr"]
     for col in sleep_cols:
@@ -91,21 +82,22 @@ def clean_sleep(df: pd.DataFrame) -> pd.DataFrame:
     # Replace weird tiny float values that shouldn’t be there
     weird_val = 5.39760534693402e-79
     tolerance = 1e-80
-    df = replace_close_values_with_nan(df, weird_val, tolerance, sleep_cols)
+    df = replace_close_values_with_nan(df, weird_val, tolerance, sleep_cols, inplace=True)
 
-    print("Missing values before cleaning:")
+    log_diagnostic(logger, "Missing values before cleaning:")
     show_missing(df, "SLQ_L")
 
     # Filter out unrealistic sleep values
-    print("Validating sleep hour values...")
-    for col in sleep_cols:
-        df[col] = df[col].apply(clean_sleep_hours)
+    logger.info("Validating sleep hour values...")
+    df, range_audit = apply_range_rules(df, SLEEP_RANGE_RULES, inplace=True)
+    log_diagnostic(logger, "", lambda: range_audit[["rule", "rows_affected", "values_affected"]].to_string(index=False),
+                   dataset="SLQ_L")
 
     # Drop rows where both sleep columns are missing
     df = df.dropna(subset=sleep_cols, how="all")
 
     # Calculate average sleep per week (5 weekday nights + 2 weekend nights)
-    print("Calculating weighted average sleep hours...")
+    logger.info("Calculating weighted average sleep hours...")
     valid_days = 7 - df[sleep_cols].isna().sum(axis=1)
     weighted_sum = (
         df["sleep_weekday_hr"].fillna(0) * 5 +
@@ -113,18 +105,17 @@ def clean_sleep(df: pd.DataFrame) -> pd.DataFrame:
     )
     df["sleep_avg_hr"] = weighted_sum / valid_days
 
-    print("Summary of cleaned values:")
-    print(df[["sleep_weekday_hr", "sleep_weekend_hr", "sleep_avg_hr"]].describe())
-    print(f"Dataframe shape after cleaning: {df.shape}")
+    log_diagnostic(logger, "Summary of cleaned values:",
+                   lambda: df[["sleep_weekday_hr", "sleep_weekend_hr", "sleep_avg_hr"]].describe(), dataset="SLQ_L")
+    logger.info(f"Dataframe shape after cleaning: {df.shape}")
 
     # Save the cleaned data
     try:
-        CLEAN_DATA_DIR.mkdir(parents=True, exist_ok=True)
-        output_path = CLEAN_DATA_DIR / "slq_l_clean.csv"
-        df.to_csv(output_path, index=False)
-        print(f"Saved cleaned data to: {pretty_path(output_path)}")
+        output_path = partition_dir(CLEAN_DATA_DIR) / "slq_l_clean.csv"
+        output_path = save_dataframe(df, output_path)
+        logger.info(f"Saved cleaned data to: {pretty_path(output_path)}")
     except Exception as e:
-        print(f"Error: Failed to save cleaned data: {e}")
+        logger.error(f"Error: Failed to save cleaned data: {e}")
 
     return df
 
@@ -134,11 +125,11 @@ def main() -> None:
     runs the cleaning process,
     and saves the result to a CSV file.
     """
-    print("Loading SLQ_L dataset")
+    logger.info("Loading SLQ_L dataset")
     label = "SLQ_L"
     sleep_info = datasets.get(label)
     if sleep_info is None:
-        print(f"{label} not found in datasets config.")
+        logger.warning(f"{label} not found in datasets config.")
         return
 
     file_path = sleep_info["file_path"]
@@ -146,12 +137,12 @@ def main() -> None:
     df = load_dataset(file_path, columns)
 
     if df is None:
-        print(f"Dataset '{label}' not found or failed to load. Exiting.")
+        logger.warning(f"Dataset '{label}' not found or failed to load. Exiting.")
         return
 
     # Clean and save the dataset
     cleaned_df = clean_sleep(df)
-    print("Cleaning complete.")
+    logger.info("Cleaning complete.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,176 @@
+"""
+scripts\\clean_spec.py
+
+Executor for the declarative dataset specs in scripts/dataset_specs.py.
+
+compile_spec turns a spec into a cleaning function once (lookup arrays for artifacts,
+sentinel codes, ranges and weights), and the function then cleans a raw dataset with
+vectorized operations:
+- Projects and renames the source columns and normalizes participant ids.
+- Sets XPT artifacts and sentinel codes to NaN on one numeric matrix.
+- Applies range rules (see utils.apply_range_rules) and reports what they changed.
+- Combines range, weight and required-value checks into one row mask.
+- Maps codes to labels on the kept rows and saves the cleaned dataset.
+"""
+import sys
+from os.path import commonprefix
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, List, Optional
+
+from scripts.config import CLEAN_DATA_DIR
+from scripts.dataset_specs import DATASET_SPECS
+from scripts.storage import partition_dir, save_dataframe
+from scripts.profiling import profiled
+from scripts.utils import apply_range_rules, normalize_participant_id, pretty_path
+from scripts.pipeline_log import get_logger, log_diagnostic
+
+logger = get_logger(__name__)
+
+# Column spec keys that make a column numeric
+NUMERIC_OPERATIONS = ("artifact", "sentinels", "range", "weight")
+
+
+def range_rules(spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Builds apply_range_rules rules from the column ranges of a dataset spec.
+
+    Columns sharing the same range and action are grouped into one rule, named after
+    the common prefix of their target names (e.g. 'systolic' for systolic_1..3).
+    """
+    groups: Dict[tuple, List[str]] = {}
+    for column in spec["columns"].values():
+        if "range" in column:
+            key = (tuple(column["range"]), column.get("on_invalid", "null"))
+            groups.setdefault(key, []).append(column["target"])
+
+    rules = []
+    for ((low, high), action), targets in groups.items():
+        name = commonprefix(targets).rstrip("_") if len(targets) > 1 else targets[0]
+        rules.append({
+            "name": name or ", ".join(targets), "columns": targets,
+            "min": low, "max": high, "closed": "both", "action": action,
+        })
+    return rules
+
+
+def compile_spec(name: str, spec: Optional[Dict[str, Any]] = None) -> Callable[[pd.DataFrame], pd.DataFrame]:
+    """
+    Compiles a dataset spec into a cleaning function.
+
+    Args:
+        name: Dataset name (e.g. 'BMX_L'), used for messages and spec lookup.
+        spec: Dataset spec. Defaults to DATASET_SPECS[name].
+
+    Returns:
+        Callable[[pd.DataFrame], pd.DataFrame]: Function that cleans a raw dataset,
+        saves it to CLEAN_DATA_DIR and returns it.
+    """
+    spec = spec or DATASET_SPECS[name]
+    columns = spec["columns"]
+    sources = list(columns)
+
+    id_sources = [src for src in sources if columns[src].get("dtype") == "id"]
+    numeric_sources = [
+        src for src in sources
+        if src not in id_sources and (
+            columns[src].get("dtype") == "float" or any(op in columns[src] for op in NUMERIC_OPERATIONS)
+        )
+    ]
+
+    # Lookup arrays over the numeric matrix columns (a negative tolerance never matches)
+    artifact_targets = np.array([columns[src].get("artifact", (0.0, -1.0))[0] for src in numeric_sources])
+    artifact_tolerances = np.array([columns[src].get("artifact", (0.0, -1.0))[1] for src in numeric_sources])
+    sentinels = {j: columns[src]["sentinels"] for j, src in enumerate(numeric_sources) if "sentinels" in columns[src]}
+    weights = {columns[src]["target"]: columns[src]["weight"] for src in sources if "weight" in columns[src]}
+    required = [columns[src]["target"] for src in sources if columns[src].get("required")]
+    maps = {columns[src]["target"]: columns[src]["map"] for src in sources if "map" in columns[src]}
+    rules = range_rules(spec)
+
+    def clean(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+        if df is None or df.empty:
+            logger.warning(f"{name}: The dataset is empty.")
+            return pd.DataFrame() if df is None else df
+
+        missing_cols = [src for src in sources if src not in df.columns]
+        if missing_cols:
+            raise ValueError(f"Missing required column(s): {missing_cols}")
+
+        logger.info(f"Cleaning {name} from its dataset spec")
+        logger.info(f"Dataframe rows and columns size before cleaning: {df.shape}")
+
+        # Artifacts and sentinel codes are set to NaN on one numeric matrix
+        values = np.column_stack([
+            pd.to_numeric(df[src], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            for src in numeric_sources
+        ]) if numeric_sources else np.empty((len(df), 0))
+        invalid = np.abs(values - artifact_targets) <= artifact_tolerances
+        for j, codes in sentinels.items():
+            invalid[:, j] |= np.isin(values[:, j], codes)
+        values[invalid] = np.nan
+
+        data = {}
+        for src in sources:
+            target = columns[src]["target"]
+            if src in id_sources:
+                data[target] = normalize_participant_id(df[src])
+            elif src in numeric_sources:
+                data[target] = values[:, numeric_sources.index(src)]
+            else:
+                data[target] = df[src]
+        cleaned = pd.DataFrame(data, index=df.index)
+
+        if rules:
+            cleaned, audit = apply_range_rules(cleaned, rules, inplace=True)
+            log_diagnostic(logger, "Values outside plausible ranges:",
+                           lambda: audit[["rule", "action", "rows_affected", "values_affected"]].to_string(index=False),
+                           dataset=name)
+
+        # Weight and required-value checks are combined into a single row filter
+        keep = np.ones(len(cleaned), dtype=bool)
+        for target, (low, high) in weights.items():
+            weight = cleaned[target].to_numpy(dtype=np.float64, na_value=np.nan)
+            # A weight the cycle does not have (see dataset_specs 'fill') filters nothing
+            if np.isnan(weight).all():
+                continue
+            keep &= (weight >= low) & (weight <= high)
+        if required:
+            keep &= cleaned[required].notna().all(axis=1).to_numpy()
+        if not keep.all():
+            cleaned = cleaned[keep]
+
+        for target, mapping in maps.items():
+            cleaned[target] = cleaned[target].map(mapping)
+
+        if spec.get("reset_index"):
+            cleaned = cleaned.reset_index(drop=True)
+
+        logger.info(f"Dataframe rows and columns size after cleaning: {cleaned.shape}")
+
+        output_path = save_dataframe(cleaned, partition_dir(CLEAN_DATA_DIR) / spec["output"])
+        logger.info(f"{name}: Saved cleaned data to {pretty_path(output_path)}")
+        return cleaned
+
+    clean.__name__ = f"clean_{name.lower()}"
+    return profiled("clean", name)(clean)
+
+
+def clean_with_spec(df: Optional[pd.DataFrame], name: str) -> pd.DataFrame:
+    """
+    Cleans a raw dataset with its spec from DATASET_SPECS.
+
+    Args:
+        df: Raw dataset.
+        name: Dataset name (e.g. 'HIQ_L').
+
+    Returns:
+        pd.DataFrame: The cleaned dataset (also saved to CLEAN_DATA_DIR).
+    """
+    return compile_spec(name)(df)
@@ -9,6 +9,8 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from scripts.dataset_specs import DATASET_SPECS
+
 # Load environment variables from .env file in project root
 load_dotenv()
 
@@ -22,11 +24,73 @@ INTERIM_DATA_DIR = BASE_PATH / 'data' / 'interim'
 CLEAN_DATA_DIR = BASE_PATH / 'data' / 'clean'
 PROCESSED_DATA_DIR = BASE_PATH / 'data' / 'processed'
 FINAL_DATA_DIR =  BASE_PATH / 'data' / 'final'
+CACHE_DIR = BASE_PATH / 'data' / 'cache'
+PROFILE_DIR = BASE_PATH / 'data' / 'profiles'
 # Path to SQLite database
 DATABASE_PATH = BASE_PATH / "database" / "nhanes_2021_2023.db"
+# Columnar copy of the database tables: one Parquet file per table (see db_utils.ColumnarBackend)
+COLUMNAR_DB_DIR = BASE_PATH / "database" / "columnar"
 
 INSIGHT_DIR = BASE_PATH / 'dashboard' / 'insights'
 
+# File format for the interim, clean, processed and final data stages ('parquet' or 'csv')
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "parquet")
+
+# dtype of participant_id (SEQN) in every cleaned dataset:
+# 'Int64' (compact nullable integer), 'str', 'category' or 'string[pyarrow]'
+PARTICIPANT_ID_DTYPE = os.getenv("PARTICIPANT_ID_DTYPE", "Int64")
+
+# SQL type of participant_id in the SQLite tables: 'INTEGER' (joins compare integers; in the
+# per-dataset tables the primary key is then an alias of the rowid, while participant_wide
+# keeps its own rowid and a NOT NULL UNIQUE participant_id) or 'TEXT'.
+# Defaults to INTEGER when PARTICIPANT_ID_DTYPE is 'Int64'
+SQLITE_ID_TYPE = os.getenv("SQLITE_ID_TYPE", "INTEGER" if PARTICIPANT_ID_DTYPE == "Int64" else "TEXT").upper()
+
+# NHANES cycles (file suffixes, see dataset_specs.CYCLES) cleaned and pooled by scripts/cycles.py,
+# e.g. NHANES_CYCLES=L,J,I
+NHANES_CYCLES = [cycle.strip() for cycle in os.getenv("NHANES_CYCLES", "L").split(",") if cycle.strip()]
+
+# Rows per chunk for datasets cleaned out of core (individual foods files); 0 cleans them in memory
+CLEAN_CHUNKSIZE = int(os.getenv("CLEAN_CHUNKSIZE", 0))
+
+# pandas Copy-on-Write mode (COPY_ON_WRITE=1): selections and renames share data until one
+# side is modified, so cleaners make no defensive copies of the raw data
+COPY_ON_WRITE = os.getenv("COPY_ON_WRITE", "0").lower() in ("1", "true", "yes")
+
+# Level of the pipeline messages (see scripts/pipeline_log.py): DIAGNOSTIC (default) also logs
+# missing value tables and data summaries, INFO only progress messages, and QUIET (production)
+# only warnings and errors, without computing any diagnostics
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DIAGNOSTIC").upper()
+
+# Format of the pipeline messages: 'text' (plain lines) or 'json' (one JSON object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+
+# Statistics of explore_data (see scripts/data_profile.py): 'exact', 'approx' (bounded-memory
+# sketches) or 'auto' (approx for frames with more than EXPLORE_EXACT_MAX_ROWS rows)
+EXPLORE_MODE = os.getenv("EXPLORE_MODE", "auto").lower()
+EXPLORE_EXACT_MAX_ROWS = int(os.getenv("EXPLORE_EXACT_MAX_ROWS", 1_000_000))
+
+# Read-only query service (db_utils.query): connections pooled per database file, prepared
+# statements cached per connection, and results cached for QUERY_CACHE_TTL seconds (0 turns
+# the result cache off), keeping at most QUERY_CACHE_MAX_ENTRIES results
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", 4))
+SQLITE_CACHED_STATEMENTS = int(os.getenv("SQLITE_CACHED_STATEMENTS", 256))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", 300))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 512))
+
+# Storage backend of db_utils.get_backend: 'sqlite' (DATABASE_PATH) or 'columnar' (Parquet
+# files in COLUMNAR_DB_DIR, aggregated with Arrow compute). SQL on the columnar tables runs on
+# COLUMNAR_SQL_ENGINE: 'duckdb', 'polars' or 'auto' (the first one installed)
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite").lower()
+COLUMNAR_SQL_ENGINE = os.getenv("COLUMNAR_SQL_ENGINE", "auto").lower()
+
+# Size limit of the pipeline stage cache, in bytes (least recently used entries are evicted)
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Profile records kept per run; beyond it the oldest are dropped, so long-lived processes
+# (notebooks, pool workers) do not grow without bound (see profiling.reset_profile)
+PROFILE_MAX_RECORDS = int(os.getenv("PROFILE_MAX_RECORDS", 100_000))
+
 
 OUTPUTS_DIR = BASE_PATH / 'outputs'
 PLOTS_DIR = OUTPUTS_DIR / 'plots'
@@ -35,73 +99,16 @@ SUMMARY_DIR = OUTPUTS_DIR / 'summary'
 """
 Dictionary mapping dataset keys to file paths and selected columns.
 Keys correspond to NHANES file prefixes.
-To add a new dataset, include its key with file_path and columns.
+Built from the dataset specs: to add a new dataset, add its spec to scripts/dataset_specs.py.
 """
 
 datasets = {
-    "DEMO_L": {
-        "file_path": RAW_DATA_DIR / "DEMO_L.xpt",
-        "columns": [
-            "SEQN", "RIAGENDR", "RIDAGEYR", "RIDRETH3", "DMDEDUC2",
-            "INDFMPIR", "WTINT2YR", "WTMEC2YR", "SDMVSTRA", "SDMVPSU"
-        ],
-    },
-    "PAQ_L": {
-        "file_path": RAW_DATA_DIR / "PAQ_L.xpt",
-        "columns": ["SEQN", "PAD680", "PAD790Q", "PAD790U", "PAD800"],
-    },
-    "SLQ_L": {
-        "file_path": RAW_DATA_DIR / "SLQ_L.xpt",
-        "columns": ["SEQN", "SLD012", "SLD013"],
-    },  
-    
-    "DR1TOT_L": {
-        "file_path": RAW_DATA_DIR / "DR1TOT_L.xpt",
-        "columns": ["SEQN", "DR1TKCAL", "DR1TSFAT", "DR1TSODI","WTDRD1"],
-    },
-
-    "DR1IFF_L": {
-        "file_path": RAW_DATA_DIR / "DR1IFF_L.xpt",
-        "columns": ["SEQN", "DR1IGRMS", "DR1IKCAL", "WTDRD1", "DR1IFDCD"] ,   
-    },
-
-    "HIQ_L": {
-        "file_path": RAW_DATA_DIR / "HIQ_L.xpt",
-        "columns": ["SEQN", "HIQ011"],
-    },
-    "BMX_L": {
-        "file_path": RAW_DATA_DIR / "BMX_L.xpt",
-        "columns": ["SEQN", "BMXBMI"],
-    },
-    "BPXO_L": {
-        "file_path": RAW_DATA_DIR / "BPXO_L.xpt",
-        "columns": ["SEQN", "BPXOSY1", "BPXOSY2", "BPXOSY3", "BPXODI1", "BPXODI2", "BPXODI3"],
-    },
-    "TCHOL_L": {
-        "file_path": RAW_DATA_DIR / "TCHOL_L.xpt",
-        "columns": ["SEQN", "LBXTC","WTPH2YR"],
-    },  
-    "GLU_L": {
-        "file_path": RAW_DATA_DIR / "GLU_L.xpt",
-        "columns": ["SEQN", "LBXGLU", "LBDGLUSI", "WTSAF2YR"],
-    },
-    "DIQ_L": {
-        "file_path": RAW_DATA_DIR / "DIQ_L.xpt",
-        "columns": ["SEQN", "DIQ010","DIQ070"],
-    },
-    "MCQ_L": {
-        "file_path": RAW_DATA_DIR / "MCQ_L.xpt",
-        "columns": ["SEQN", "MCQ160B", "MCQ160C", "MCQ160D", "MCQ160E"],
-    }, 
-    "FPED_1720": {
-        "file_path": RAW_DATA_DIR / "FPED_1720.xls",
-        "columns": ['FOODCODE', 'DESCRIPTION', 'F_TOTAL (cup eq)', 'F_JUICE (cup eq)', 'F_CITMLB (cup eq)', 
-        'F_OTHER (cup eq)', 'V_TOTAL (cup eq)', 'V_DRKGR (cup eq)', 'V_LEGUMES (cup eq)',
-        'G_WHOLE (oz eq)', 'G_REFINED (oz eq)', 'D_TOTAL (cup eq)', 'D_MILK (cup eq)', 
-        'D_YOGURT (cup eq)', 'D_CHEESE (cup eq)', 'PF_TOTAL (oz eq)', 'PF_MPS_TOTAL (oz eq)',
-        'PF_SEAFD_HI (oz eq)', 'PF_SEAFD_LOW (oz eq)', 'SOLID_FATS (grams)', 'ADD_SUGARS (tsp eq)', 'OILS (grams)'],
-        "sheet_name": "FPED_1720_"  
-    },   
+    name: {
+        "file_path": RAW_DATA_DIR / spec["file"],
+        "columns": list(spec["columns"]),
+        **({"sheet_name": spec["sheet_name"]} if "sheet_name" in spec else {}),
+    }
+    for name, spec in DATASET_SPECS.items()
 }
 
 # function to ensure directory exists
@@ -116,7 +123,7 @@ def ensure_directories() -> None:
     """
     for directory in [
         RAW_DATA_DIR, INTERIM_DATA_DIR, CLEAN_DATA_DIR,
-        PROCESSED_DATA_DIR, FINAL_DATA_DIR,
+        PROCESSED_DATA_DIR, FINAL_DATA_DIR, CACHE_DIR,
         DATABASE_PATH.parent,
         OUTPUTS_DIR, PLOTS_DIR, SUMMARY_DIR, INSIGHT_DIR
     ]:
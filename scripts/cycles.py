@@ -0,0 +1,468 @@
+"""
+scripts\\cycles.py
+
+Runs the loading and cleaning pipeline over several NHANES cycles and pools them.
+
+- cycle_datasets builds the config.datasets entries of a cycle from the dataset specs
+  (DEMO_L.xpt -> DEMO_J.xpt for the 2017-2018 cycle, see dataset_specs.CYCLES). Files
+  laid out differently in a cycle (BPX_I.xpt, P_DEMO.xpt, ...) are read with the cycle's
+  column names and conformed to the spec (see dataset_specs.cycle_layout).
+- clean_cycles loads and cleans each cycle in its own worker process. Interim and clean
+  files go to the cycle's partition of their stage folder (data/clean/cycle=J/...).
+  With a chunk size, individual foods files are cleaned out of core into part files.
+- pool_cycles stacks the cleaned cycles of each dataset into data/clean/pooled, with a
+  'cycle' column and the NHANES combined-cycle survey weights. Cycles are streamed in
+  record batches, so memory stays bounded by one batch however many cycles are pooled.
+  SEQN numbers never repeat across cycles, so participant_id stays unique.
+- write_synthetic_cycle writes small random XPT files for a cycle, with the cycle's own
+  file names and columns, so the multi-cycle pipeline can be tried without downloading
+  NHANES files.
+
+Run `python scripts/cycles.py L J I` to clean and pool cycles (defaults to config.NHANES_CYCLES).
+"""
+import io
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyreadstat
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from scripts.config import CLEAN_CHUNKSIZE, CLEAN_DATA_DIR, NHANES_CYCLES, RAW_DATA_DIR
+from scripts.data_cleaning import CHUNKED_CLEANERS, clean_datasets, clean_files_chunked
+from scripts.data_loading import process_datasets
+from scripts.dataset_specs import (
+    CYCLES,
+    DATASET_SPECS,
+    cycle_layout,
+    is_spec_layout,
+    layout_columns,
+    survey_weight_columns
+)
+from scripts.profiling import (
+    add_records,
+    print_profile_summary,
+    profile_mark,
+    profile_stage,
+    profiled,
+    records_since,
+    save_profile_report
+)
+from scripts.storage import (
+    cycle_partition,
+    iter_batches,
+    read_schema,
+    resolve_path,
+    use_cycle,
+    write_batches
+)
+from scripts.utils import pretty_path
+from scripts.pipeline_log import get_logger
+
+logger = get_logger(__name__)
+
+POOLED_DIR_NAME = "pooled"
+
+# Codes and value ranges used for synthetic raw files, by source column
+SYNTHETIC_CODES = {
+    "RIAGENDR": [1, 2],
+    "RIDRETH3": [1, 2, 3, 4, 6, 7],
+    "RIDRETH1": [1, 2, 3, 4, 5],
+    "DMDEDUC2": [1, 2, 3, 4, 5, 7, 9],
+    "PAD790U": ["D", "W", "M", "Y"],
+}
+SYNTHETIC_RANGES = {
+    "RIDAGEYR": (0, 80),
+    "INDFMPIR": (0, 5),
+    "SDMVSTRA": (173, 200),
+    "SDMVPSU": (1, 2),
+    "PAD680": (0, 1200),
+    "PAD790Q": (1, 10),
+    "PAD800": (10, 120),
+    "PAQ670": (1, 7),
+    "PAD675": (10, 120),
+    "SLD012": (2, 15),
+    "SLD013": (2, 15),
+    "SLD010H": (2, 15),
+    "DR1IGRMS": (0, 500),
+    "DR1IKCAL": (0, 800),
+    "DR2IGRMS": (0, 500),
+    "DR2IKCAL": (0, 800),
+    "LBXGLU": (60, 300),
+    "LBDGLUSI": (3.3, 16.7),
+}
+SURVEY_WEIGHT_RANGE = (1_000, 100_000)
+FOODS_PER_PARTICIPANT = 10
+INDIVIDUAL_FOODS_DATASETS = ("DR1IFF_L", "DR2IFF_L")
+
+
+# 1. Cycle configuration
+def check_cycles(cycles: Sequence[str]) -> List[str]:
+    """
+    Validates cycle suffixes against dataset_specs.CYCLES and removes duplicates.
+
+    Raises:
+        ValueError: If a cycle is unknown or no cycle is given.
+    """
+    unknown = [cycle for cycle in cycles if cycle not in CYCLES]
+    if unknown:
+        raise ValueError(f"Unknown NHANES cycle(s) {unknown}. Known cycles: {list(CYCLES)}")
+    if not cycles:
+        raise ValueError("At least one NHANES cycle is required.")
+    return list(dict.fromkeys(cycles))
+
+
+def cycle_datasets(cycle: str, raw_dir: Union[str, Path] = RAW_DATA_DIR) -> Dict[str, dict]:
+    """
+    Builds the dataset config (like config.datasets) of an NHANES cycle.
+
+    Dataset keys stay the spec names (e.g. 'DEMO_L') so the same cleaners apply. The
+    columns are those of the cycle's file; when they differ from the spec's, a 'layout'
+    entry lets data_loading.process_datasets conform the loaded data to the spec.
+
+    Args:
+        cycle: Cycle suffix (e.g. 'J').
+        raw_dir: Folder holding the raw files of every cycle.
+
+    Returns:
+        Dict[str, dict]: Dataset name -> file_path, columns (and sheet_name, layout).
+    """
+    config = {}
+    for name, spec in DATASET_SPECS.items():
+        layout = cycle_layout(name, cycle)
+        config[name] = {"file_path": Path(raw_dir) / layout["file"], "columns": layout_columns(layout)}
+        if "sheet_name" in spec:
+            config[name]["sheet_name"] = spec["sheet_name"]
+        if not is_spec_layout(layout):
+            config[name]["layout"] = layout
+    return config
+
+
+def check_disjoint_cycles(cycles: Sequence[str]) -> None:
+    """
+    Checks that no pooled cycle contains the participants of another (see CYCLES 'contains').
+
+    Raises:
+        ValueError: If two cycles overlap, e.g. 'P' (2017-2020) and 'J' (2017-2018).
+    """
+    for cycle in cycles:
+        overlap = [other for other in CYCLES[cycle].get("contains", []) if other in cycles]
+        if overlap:
+            raise ValueError(
+                f"Cycle '{cycle}' ({CYCLES[cycle]['years']}) already contains the participants of "
+                f"{overlap}; pool one or the other."
+            )
+
+
+def pooled_weight_factors(cycles: Sequence[str]) -> Dict[str, float]:
+    """
+    Returns the factor applied to each cycle's survey weights when the cycles are pooled.
+
+    Following the NHANES analytic guidelines, each cycle gets its share of the total
+    length of the pooled cycles (1/k for k two-year cycles).
+
+    Raises:
+        ValueError: If the cycles overlap (see check_disjoint_cycles).
+    """
+    check_disjoint_cycles(cycles)
+    total = sum(CYCLES[cycle]["length"] for cycle in cycles)
+    return {cycle: CYCLES[cycle]["length"] / total for cycle in cycles}
+
+
+# 2. Per-cycle cleaning
+def _clean_cycle(
+    cycle: str,
+    raw_dir: Union[str, Path],
+    chunksize: int = 0
+) -> Tuple[Dict[str, int], str, List[Dict[str, Any]]]:
+    """
+    Loads and cleans one cycle into its partitions while capturing everything it prints.
+
+    Used as the worker function of the process pool. Only row counts are returned, so the
+    cleaned DataFrames never have to be sent back to (and held by) the parent process.
+
+    Returns:
+        Tuple of (rows per cleaned dataset, captured output, profile records of the cycle).
+    """
+    log = io.StringIO()
+    rows: Dict[str, int] = {}
+    mark = profile_mark()
+    with redirect_stdout(log), use_cycle(cycle), profile_stage("cycle", cycle):
+        try:
+            dataset_config = cycle_datasets(cycle, raw_dir)
+            chunked = {}
+            if chunksize:
+                chunked = {name: dataset_config.pop(name) for name in CHUNKED_CLEANERS if name in dataset_config}
+            raw_dfs = process_datasets(dataset_config)
+            cleaned = clean_datasets(raw_dfs)
+            rows = {name: len(df) for name, df in cleaned.items()}
+            if chunked:
+                rows.update(clean_files_chunked(chunked, chunksize))
+        except Exception as e:
+            logger.error(f"cleaning cycle '{cycle}': {e}")
+    return rows, log.getvalue(), records_since(mark)
+
+
+def clean_cycles(
+    cycles: Sequence[str],
+    parallel: bool = True,
+    max_workers: Optional[int] = None,
+    raw_dir: Union[str, Path] = RAW_DATA_DIR,
+    chunksize: int = CLEAN_CHUNKSIZE
+) -> pd.DataFrame:
+    """
+    Loads and cleans each cycle into data/interim/cycle=<cycle> and data/clean/cycle=<cycle>.
+
+    Args:
+        cycles: Cycle suffixes (e.g. ['L', 'J', 'I']).
+        parallel: If True, cycles are cleaned in a process pool, one cycle per task.
+            Each cycle's output is printed in the order of `cycles`.
+        max_workers: Pool size. Defaults to the number of available cores, capped at the
+            number of cycles. Each worker holds one cycle at a time.
+        raw_dir: Folder holding the raw files of every cycle.
+        chunksize: If set, datasets in data_cleaning.CHUNKED_CLEANERS are cleaned out of
+            core with this many rows per chunk (default config.CLEAN_CHUNKSIZE).
+
+    Returns:
+        pd.DataFrame: Rows of each cleaned dataset (index) per cycle (columns).
+    """
+    cycles = check_cycles(cycles)
+    raw_dir = Path(raw_dir)
+
+    if parallel and len(cycles) > 1:
+        workers = max_workers or min(len(cycles), os.cpu_count() or 1)
+        logger.info(f"Cleaning {len(cycles)} cycles with {workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {cycle: executor.submit(_clean_cycle, cycle, raw_dir, chunksize) for cycle in cycles}
+            results = {}
+            for cycle, future in futures.items():
+                try:
+                    results[cycle] = future.result()
+                except Exception as e:
+                    results[cycle] = ({}, f"cleaning cycle '{cycle}': {e}\n", [])
+        for _, _, records in results.values():
+            add_records(records)
+    else:
+        results = {cycle: _clean_cycle(cycle, raw_dir, chunksize) for cycle in cycles}
+
+    for cycle in cycles:
+        rows, log, _ = results[cycle]
+        logger.info(f"\n=== Cycle {cycle} ({CYCLES[cycle]['years']}) ===")
+        print(log, end="")
+
+    summary = pd.DataFrame({cycle: pd.Series(results[cycle][0], dtype="Int64") for cycle in cycles})
+    logger.info("\nCleaned rows per cycle:", extra={"data": summary})
+    return summary
+
+
+# 3. Pooling
+def _conform_batch(batch: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """
+    Casts a record batch to the pooled schema, adding missing columns as nulls.
+    """
+    arrays = []
+    for field in schema:
+        index = batch.schema.get_field_index(field.name)
+        if index < 0:
+            arrays.append(pa.nulls(batch.num_rows, field.type))
+        else:
+            arrays.append(batch.column(index).cast(field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _pooled_batches(
+    files: Dict[str, Path],
+    schema: pa.Schema,
+    weight_columns: List[str],
+    factors: Dict[str, float],
+    batch_size: int
+) -> Iterator[pa.RecordBatch]:
+    """
+    Streams the batches of every cycle file with the cycle column and pooled weights.
+    """
+    for cycle, path in files.items():
+        for batch in iter_batches(path, batch_size):
+            columns = {name: batch.column(name) for name in batch.schema.names}
+            for column in weight_columns:
+                if column in columns:
+                    columns[column] = pc.multiply(columns[column].cast(pa.float64()), factors[cycle])
+            columns["cycle"] = pa.array([cycle] * batch.num_rows, pa.string())
+            yield _conform_batch(pa.RecordBatch.from_pydict(columns), schema)
+
+
+@profiled("pool")
+def pool_cycles(
+    cycles: Sequence[str],
+    names: Optional[Sequence[str]] = None,
+    batch_size: int = 65_536,
+    storage_format: Optional[str] = None
+) -> Dict[str, Path]:
+    """
+    Stacks the cleaned cycles of each dataset into data/clean/pooled.
+
+    Survey weight columns (see dataset_specs.survey_weight_columns) are rescaled to
+    combined-cycle weights over the cycles the dataset was cleaned for, and a 'cycle'
+    column records where each row came from. Column types are unified across cycles.
+
+    Args:
+        cycles: Cycle suffixes to pool, cleaned beforehand with clean_cycles.
+        names: Datasets to pool. Defaults to every dataset whose file differs by cycle.
+        batch_size: Rows per streamed record batch.
+        storage_format: 'parquet' or 'csv'. Defaults to config.STORAGE_FORMAT.
+
+    Returns:
+        Dict[str, Path]: Pooled file of each dataset.
+
+    Raises:
+        ValueError: If a cycle is unknown or the cycles overlap (see check_disjoint_cycles).
+    """
+    cycles = check_cycles(cycles)
+    check_disjoint_cycles(cycles)
+    names = names or [name for name, spec in DATASET_SPECS.items() if spec.get("per_cycle", True)]
+    pooled_dir = CLEAN_DATA_DIR / POOLED_DIR_NAME
+    pooled: Dict[str, Path] = {}
+
+    for name in names:
+        output = DATASET_SPECS[name]["output"]
+        files = {}
+        for cycle in cycles:
+            path = resolve_path(cycle_partition(CLEAN_DATA_DIR, cycle) / output)
+            if path is not None:
+                files[cycle] = path
+        if not files:
+            logger.warning(f"{name}: no cleaned cycles to pool.")
+            continue
+
+        factors = pooled_weight_factors(list(files))
+        weight_columns = survey_weight_columns(name)
+        # Metadata is dropped because the pandas metadata of one cycle does not describe the others
+        schema = pa.unify_schemas(
+            [read_schema(path).remove_metadata() for path in files.values()],
+            promote_options="permissive"
+        )
+        for column in weight_columns:
+            index = schema.get_field_index(column)
+            if index >= 0:
+                schema = schema.set(index, pa.field(column, pa.float64()))
+        schema = schema.append(pa.field("cycle", pa.string()))
+
+        batches = _pooled_batches(files, schema, weight_columns, factors, batch_size)
+        pooled[name] = write_batches(batches, pooled_dir / output, schema, storage_format)
+        logger.info(f"{name}: pooled cycles {list(files)} into {pretty_path(pooled[name])}")
+
+    return pooled
+
+
+# 4. Synthetic raw files
+def _synthetic_column(source: str, column: dict, n: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draws random raw values for one source column from its spec.
+    """
+    if source in SYNTHETIC_CODES:
+        values = rng.choice(SYNTHETIC_CODES[source], n)
+        return values if values.dtype.kind in "US" else values.astype(float)
+    if "map" in column or "sentinels" in column:
+        codes = list(column.get("map", {1: None, 2: None})) + list(column.get("sentinels", []))
+        values = rng.choice(codes, n).astype(float)
+    elif "weight" in column or column.get("survey_weight"):
+        values = rng.uniform(*SURVEY_WEIGHT_RANGE, n)
+    elif "range" in column:
+        low, high = column["range"]
+        # Widen the range so some values fall outside it
+        values = rng.uniform(low - 0.1 * (high - low), high + 0.1 * (high - low), n)
+    else:
+        values = rng.uniform(*SYNTHETIC_RANGES.get(source, (0, 100)), n)
+    values[rng.random(n) < 0.05] = np.nan
+    return values
+
+
+def write_synthetic_cycle(
+    cycle: str,
+    raw_dir: Union[str, Path],
+    n_participants: int = 500,
+    seed: int = 0,
+    food_codes: Optional[Sequence[int]] = None
+) -> List[Path]:
+    """
+    Writes random XPT files for every per-cycle dataset of a cycle.
+
+    Files and columns are named as in the cycle (see dataset_specs.cycle_layout), and
+    values follow each column's spec (codes, sentinels, plausible ranges and weights),
+    so every cleaning step has something to do. SEQN numbers are offset by cycle so
+    they do not repeat across cycles, like in NHANES.
+
+    Args:
+        cycle: Cycle suffix (e.g. 'J').
+        raw_dir: Folder to write the files to.
+        n_participants: Participants per cycle.
+        seed: Random seed (combined with the cycle, so cycles differ).
+        food_codes: Food codes for the individual foods file, e.g. the FPED codes so the
+            HEI can be scored. Random 8-digit codes if None.
+
+    Returns:
+        List[Path]: The files written.
+    """
+    check_cycles([cycle])
+    raw_dir = Path(raw_dir)
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng([seed, list(CYCLES).index(cycle)])
+    first_seqn = 1_000_000 * (list(CYCLES).index(cycle) + 1)
+    seqn = np.arange(first_seqn, first_seqn + n_participants, dtype=float)
+
+    written = []
+    for name, spec in DATASET_SPECS.items():
+        if not spec.get("per_cycle", True):
+            continue
+        # Individual foods files have several rows per participant
+        ids = np.repeat(seqn, FOODS_PER_PARTICIPANT) if name in INDIVIDUAL_FOODS_DATASETS else seqn
+        layout = cycle_layout(name, cycle)
+        data = {}
+        for source, column in spec["columns"].items():
+            raw = layout["sources"][source]
+            if raw is None or raw in data:
+                continue
+            if column.get("dtype") == "id":
+                data[raw] = ids
+            elif name in INDIVIDUAL_FOODS_DATASETS and source.endswith("FDCD"):
+                codes = food_codes if food_codes is not None else rng.integers(11_000_000, 99_999_999, 50)
+                data[raw] = rng.choice(np.asarray(codes, dtype=float), len(ids))
+            else:
+                data[raw] = _synthetic_column(raw, column, len(ids), rng)
+
+        path = raw_dir / layout["file"]
+        table_name = path.stem[:8]
+        pyreadstat.write_xport(pd.DataFrame(data), str(path), table_name=table_name, file_format_version=5)
+        written.append(path)
+
+    logger.info(f"Wrote {len(written)} synthetic files for cycle {cycle} to {pretty_path(raw_dir)}")
+    return written
+
+
+def main(cycles: Optional[List[str]] = None) -> Dict[str, Path]:
+    """
+    Cleans the given cycles (default config.NHANES_CYCLES) in parallel and pools them.
+    """
+    cycles = cycles or NHANES_CYCLES
+    logger.info(f"=== Cleaning NHANES cycles {cycles} ===")
+    clean_cycles(cycles)
+    logger.info(f"\n=== Pooling cycles {cycles} ===")
+    pooled = pool_cycles(cycles)
+    print()
+    print_profile_summary()
+    print("Saved profile report to:", pretty_path(save_profile_report()["json"]))
+    return pooled
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -2,15 +2,23 @@
 scripts\\cleaning.py
 
 Cleans raw NHANES datasets using specific functions tailored for each dataset type.
-1. Applies the appropriate cleaning function to each raw dataset.
+1. Applies the appropriate cleaning function to each raw dataset (its compiled dataset
+   spec, or the custom cleaner named by the spec).
 2. Returns a dictionary of all cleaned datasets.
 3. Explores the cleaned datasets using the shared explore_data utility.
+
+Datasets are independent until they are merged, so they can also be cleaned in a
+process pool (clean_datasets(..., parallel=True)).
 """
 
+import io
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
 from pathlib import Path
 import pandas as pd
-from typing import Dict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 # Add project root to sys.path 
 project_root = Path(__file__).parent.parent.resolve()
@@ -18,57 +26,267 @@ if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
 from scripts.clean_demo import clean_demo
-from scripts.clean_clinical_exam import clean_bmi, clean_bp, clean_total_cholesterol, clean_glucose
+from scripts.clean_clinical_exam import clean_bp, clean_glucose
 from scripts.clean_sleep import clean_sleep
 from scripts.clean_physical import clean_physical_activity
-from scripts.clean_diet import clean_individual_diet,clean_total_diet
-from scripts.clean_healthcare_access import clean_insurance_coverage
-from scripts.clean_chronic_disease import clean_diq, clean_mcq
+from scripts.clean_diet import (
+    clean_individual_diet, clean_individual_diet_chunked, clean_individual_diet_day2
+)
 from scripts.clean_fped import clean_fped
-from scripts.utils import explore_data
+from scripts.clean_spec import compile_spec
+from scripts import clean_spec, utils
+from scripts.config import CLEAN_DATA_DIR, CLEAN_CHUNKSIZE, PARTICIPANT_ID_DTYPE
+from scripts.dataset_specs import DATASET_SPECS
+from scripts.pipeline_cache import PipelineCache, hash_dataframe, hash_source, make_key
+from scripts.profiling import add_records, print_profile_summary, profile_mark, records_since, save_profile_report
+from scripts.storage import count_rows, partition_dir, resolve_path, save_dataframe
+from scripts.utils import explore_data, pretty_path
+from scripts.pipeline_log import get_logger
+
+logger = get_logger(__name__)
+
+
+# Custom cleaning functions, referenced by name from the dataset specs
+CUSTOM_CLEANERS: Dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    "clean_demo": clean_demo,
+    "clean_sleep": clean_sleep,
+    "clean_physical_activity": clean_physical_activity,
+    "clean_individual_diet": clean_individual_diet,
+    "clean_individual_diet_day2": clean_individual_diet_day2,
+    "clean_bp": clean_bp,
+    "clean_glucose": clean_glucose,
+    "clean_fped": clean_fped,
+}
 
+# Cleaning function for each raw dataset, in the order datasets are cleaned and reported.
+# Datasets whose spec cleaner is 'spec' are cleaned by their compiled spec.
+CLEANING_FUNCTIONS: Dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    name: compile_spec(name) if spec["cleaner"] == "spec" else CUSTOM_CLEANERS[spec["cleaner"]]
+    for name, spec in DATASET_SPECS.items()
+}
 
-def clean_datasets(raw_dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+# Config values that change cleaned output, part of every cleaning cache key
+CLEANING_CONFIG = {"PARTICIPANT_ID_DTYPE": PARTICIPANT_ID_DTYPE}
+
+# Datasets that can be cleaned out of core, straight from their raw file, chunk by chunk
+CHUNKED_CLEANERS: Dict[str, Callable[..., Optional[Path]]] = {
+    "DR1IFF_L": clean_individual_diet_chunked,
+    "DR2IFF_L": clean_individual_diet_chunked,
+}
+
+
+def clean_datasets(
+    raw_dfs: Dict[str, pd.DataFrame],
+    cache: Optional[PipelineCache] = None,
+    parallel: bool = False,
+    max_workers: Optional[int] = None
+) -> Dict[str, pd.DataFrame]:
     """
     Cleans each dataset using the appropriate cleaning function.
 
     Args:
         raw_dfs (Dict[str, pd.DataFrame]): Raw datasets keyed by dataset name.
+        cache (Optional[PipelineCache]): If given, a dataset whose raw data, dataset spec
+            and cleaner source are unchanged is loaded from the cache instead of re-cleaned.
+        parallel (bool): If True, datasets are cleaned in a process pool. Each dataset's
+            output is captured and printed in the same order as a serial run, and the
+            clean files are byte-identical to the serial ones.
+        max_workers (Optional[int]): Pool size for parallel cleaning. Defaults to the
+            number of available cores, capped at the number of datasets to clean.
 
     Returns:
         Dict[str, pd.DataFrame]: Cleaned datasets keyed by dataset name.
     """
-    cleaning_functions = {
-        "DEMO_L": clean_demo,
-        "SLQ_L": clean_sleep,
-        "PAQ_L": clean_physical_activity,
-        "DR1TOT_L": clean_total_diet,
-        "DR1IFF_L": clean_individual_diet,
-        "HIQ_L": clean_insurance_coverage,
-        "BMX_L": clean_bmi,
-        "BPXO_L": clean_bp,
-        "TCHOL_L": clean_total_cholesterol,
-        "GLU_L": clean_glucose,
-        "DIQ_L": clean_diq,
-        "MCQ_L": clean_mcq,
-        "FPED_1720": clean_fped,
-    }
+    if parallel:
+        return clean_datasets_parallel(raw_dfs, cache=cache, max_workers=max_workers)
 
     cleaned_data: Dict[str, pd.DataFrame] = {}
 
-    for name, func in cleaning_functions.items():
+    for name, func in CLEANING_FUNCTIONS.items():
         if name in raw_dfs:
-            print(f"Cleaning dataset: {name}")
+            logger.info(f"Cleaning dataset: {name}")
             try:
-                cleaned_data[name] = func(raw_dfs[name])
+                if cache is None:
+                    cleaned_data[name] = func(raw_dfs[name])
+                else:
+                    cleaned_data[name] = clean_dataset_cached(name, func, raw_dfs[name], cache)
             except Exception as e:
-                print(f"cleaning dataset '{name}': {e}")
+                logger.error(f"cleaning dataset '{name}': {e}")
         else:
-            print(f"Dataset '{name}' missing from input raw datasets.")
+            logger.warning(f"Dataset '{name}' missing from input raw datasets.")
 
     return cleaned_data
 
 
+def clean_files_chunked(
+    dataset_config: Dict[str, Dict[str, Any]],
+    chunksize: int = CLEAN_CHUNKSIZE
+) -> Dict[str, int]:
+    """
+    Cleans the datasets of a config that have a chunked cleaner straight from their raw
+    files, so they are never loaded whole. Their clean data is written as part files.
+
+    Args:
+        dataset_config: Dataset config (like config.datasets); only names in
+            CHUNKED_CLEANERS are cleaned.
+        chunksize: Rows per chunk.
+
+    Returns:
+        Dict[str, int]: Rows of each dataset cleaned.
+    """
+    rows: Dict[str, int] = {}
+    for name, cleaner in CHUNKED_CLEANERS.items():
+        if name not in dataset_config:
+            continue
+        logger.info(f"Cleaning dataset: {name} (out of core)")
+        try:
+            info = dataset_config[name]
+            parts = cleaner(info["file_path"], name, chunksize=chunksize, layout=info.get("layout"))
+            if parts is not None:
+                rows[name] = count_rows(parts)
+        except Exception as e:
+            logger.error(f"cleaning dataset '{name}': {e}")
+    return rows
+
+
+def _run_cleaner(name: str, raw_df: pd.DataFrame) -> Tuple[Optional[pd.DataFrame], str, List[Dict[str, Any]]]:
+    """
+    Runs the cleaner for one dataset while capturing everything it prints.
+
+    Used as the worker function of the process pool, so failures are reported in the
+    captured log exactly like the serial loop reports them.
+
+    Returns:
+        Tuple of (cleaned DataFrame or None on failure, captured output, profile records).
+    """
+    log = io.StringIO()
+    cleaned = None
+    # Workers are reused across datasets, so only this dataset's records are returned
+    mark = profile_mark()
+    with redirect_stdout(log):
+        try:
+            cleaned = CLEANING_FUNCTIONS[name](raw_df)
+        except Exception as e:
+            logger.error(f"cleaning dataset '{name}': {e}")
+    return cleaned, log.getvalue(), records_since(mark)
+
+
+def clean_datasets_parallel(
+    raw_dfs: Dict[str, pd.DataFrame],
+    cache: Optional[PipelineCache] = None,
+    max_workers: Optional[int] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Cleans the datasets in a process pool.
+
+    Cache lookups and writes happen in the calling process; only datasets that miss
+    the cache are sent to the pool. Logs are re-emitted per dataset in the order of
+    CLEANING_FUNCTIONS once all workers have finished.
+
+    Args:
+        raw_dfs (Dict[str, pd.DataFrame]): Raw datasets keyed by dataset name.
+        cache (Optional[PipelineCache]): Optional stage cache (see clean_datasets).
+        max_workers (Optional[int]): Pool size. Defaults to the number of available cores.
+
+    Returns:
+        Dict[str, pd.DataFrame]: Cleaned datasets keyed by dataset name.
+    """
+    names = [name for name in CLEANING_FUNCTIONS if name in raw_dfs]
+    results: Dict[str, Tuple[Optional[pd.DataFrame], str, List[Dict[str, Any]]]] = {}
+    cache_keys: Dict[str, str] = {}
+
+    if cache is not None:
+        for name in names:
+            cache_keys[name] = cleaning_cache_key(name, CLEANING_FUNCTIONS[name], raw_dfs[name])
+            log = io.StringIO()
+            with redirect_stdout(log):
+                cleaned = reuse_cleaned_dataset(name, cache_keys[name], cache)
+            if cleaned is not None:
+                results[name] = (cleaned, log.getvalue(), [])
+
+    to_run = [name for name in names if name not in results]
+    if to_run:
+        workers = max_workers or min(len(to_run), os.cpu_count() or 1)
+        logger.info(f"Cleaning {len(to_run)} datasets with {workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(_run_cleaner, name, raw_dfs[name]) for name in to_run}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    # The worker itself failed (e.g. it crashed or its input could not be sent)
+                    results[name] = (None, f"cleaning dataset '{name}': {e}\n", [])
+
+    cleaned_data: Dict[str, pd.DataFrame] = {}
+    for name in CLEANING_FUNCTIONS:
+        if name not in raw_dfs:
+            logger.warning(f"Dataset '{name}' missing from input raw datasets.")
+            continue
+        cleaned, log, records = results[name]
+        add_records(records)
+        logger.info(f"Cleaning dataset: {name}")
+        print(log, end="")
+        if cleaned is None:
+            continue
+        if cache is not None and name in to_run and not cleaned.empty:
+            cache.put("clean", name, cache_keys[name], cleaned)
+        cleaned_data[name] = cleaned
+
+    return cleaned_data
+
+
+def cleaning_cache_key(name: str, func: Callable[[pd.DataFrame], pd.DataFrame], raw_df: pd.DataFrame) -> str:
+    """
+    Builds the cache key of a cleaned dataset from its raw data, its dataset spec, the
+    source of its cleaning function and of the shared helpers (utils, clean_spec), and
+    the config values that change cleaned output (CLEANING_CONFIG).
+    """
+    return make_key(
+        "clean", name, hash_dataframe(raw_df), DATASET_SPECS.get(name),
+        hash_source(func, utils, clean_spec), CLEANING_CONFIG
+    )
+
+
+def reuse_cleaned_dataset(name: str, key: str, cache: PipelineCache) -> Optional[pd.DataFrame]:
+    """
+    Returns a cleaned dataset from the cache, or None on a miss.
+
+    The cleaner is skipped on a cache hit, so its clean file is re-saved if it is no
+    longer on disk.
+    """
+    cleaned = cache.get("clean", name, key)
+    if cleaned is None:
+        return None
+
+    logger.info(f"[cache] Reusing cleaned {name}")
+    clean_file = partition_dir(CLEAN_DATA_DIR) / DATASET_SPECS[name]["output"]
+    if resolve_path(clean_file) is None:
+        save_dataframe(cleaned, clean_file)
+    return cleaned
+
+
+def clean_dataset_cached(name: str, func, raw_df: pd.DataFrame, cache: PipelineCache) -> pd.DataFrame:
+    """
+    Cleans one dataset through the stage cache.
+
+    Args:
+        name: Dataset name (e.g. 'DEMO_L').
+        func: Cleaning function for the dataset.
+        raw_df: Raw dataset.
+        cache: Stage cache to read from and write to.
+
+    Returns:
+        pd.DataFrame: Cleaned dataset.
+    """
+    key = cleaning_cache_key(name, func, raw_df)
+    cleaned = reuse_cleaned_dataset(name, key, cache)
+    if cleaned is None:
+        cleaned = func(raw_df)
+        if not cleaned.empty:
+            cache.put("clean", name, key, cleaned)
+    return cleaned
+
+
 def main(raw_dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
     """
     Run the cleaning process and explore cleaned datasets.
@@ -79,9 +297,9 @@ def main(raw_dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
     Returns:
         Dict[str, pd.DataFrame]: Cleaned datasets.
     """
-    print("Starting cleaning process...\n")
+    logger.info("Starting cleaning process...\n")
     cleaned = clean_datasets(raw_dfs)
-    print("\nCleaning complete. Exploring cleaned datasets:\n")
+    logger.info("\nCleaning complete. Exploring cleaned datasets:\n")
     explore_data(cleaned) 
     return cleaned
 
@@ -91,3 +309,5 @@ if __name__ == "__main__":
 
     raw_data = load_raw_datasets()
     cleaned_data = main(raw_data)
+    print_profile_summary()
+    print("Saved profile report to:", pretty_path(save_profile_report()["json"]))
@@ -7,7 +7,8 @@ and then runs some quick exploration using helper functions.
 """
 
 from pathlib import Path
-from typing import Optional, List, Union, Dict
+from typing import Any, Optional, List, Union, Dict, Tuple
+import numpy as np
 import pandas as pd
 import pyreadstat
 import sys
@@ -17,14 +18,29 @@ project_root = Path(__file__).parent.parent.resolve()
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from scripts.config import datasets, INTERIM_DATA_DIR
-from scripts.utils import validate_xpt_and_excel_files, explore_data, pretty_path
+from scripts.config import datasets, INTERIM_DATA_DIR, STORAGE_FORMAT
+from scripts.utils import (
+    validate_xpt_and_excel_files,
+    validate_dataset_headers,
+    explore_data,
+    pretty_path
+)
+from scripts.xpt_reader import read_xpt_columns
+from scripts.storage import save_dataframe, load_dataframe, partition_dir
+from scripts.profiling import profiled
+from scripts.pipeline_log import get_logger
+
+logger = get_logger(__name__)
+
+VALIDATION_MODES = ("full", "load", "header")
+XPT_ENGINES = ("projected", "pandas")
 
 # 1. function for load_file_as_dataframe 
 def load_dataset(
     file_path: Union[str, Path], 
     columns: Optional[List[str]] = None, 
-    sheet_name: Optional[str] = None
+    sheet_name: Optional[str] = None,
+    xpt_engine: str = "projected"
 ) -> Optional[pd.DataFrame]:
     """
     Loads a dataset from a file into a pandas DataFrame.
@@ -32,22 +48,58 @@ def load_dataset(
     Args:
         file_path: Where the file is located (CSV, Excel, XPT, etc.).
         columns: A list of columns you want to keep (optional).
+        xpt_engine: 'projected' decodes only the requested XPT columns,
+            'pandas' uses pd.read_sas on the whole file.
 
     Returns:
         A DataFrame if it loads correctly, otherwise None.
     """
+    df, error = load_validated_dataset(file_path, columns, sheet_name=sheet_name, xpt_engine=xpt_engine)
+    if error:
+        logger.error(error)
+    return df
+
+# 1a. function for loading and validating a file in a single parse
+@profiled("load", name_arg="file_path")
+def load_validated_dataset(
+    file_path: Union[str, Path],
+    columns: Optional[List[str]] = None,
+    sheet_name: Optional[str] = None,
+    xpt_engine: str = "projected"
+) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """
+    Loads a dataset and validates it from the same parse, so each file is read only once.
+
+    Args:
+        file_path: Where the file is located (CSV, Excel, XPT, etc.).
+        columns: A list of columns you want to keep (optional).
+        sheet_name: Excel sheet to read (optional).
+        xpt_engine: 'projected' decodes only the requested XPT columns,
+            'pandas' uses pd.read_sas on the whole file.
+
+    Returns:
+        A tuple of (DataFrame, None) if the file loads and has all requested columns,
+        otherwise (None, error message).
+    """
     path = Path(file_path)
     if not path.exists():
-        print(f"File not found: {pretty_path(path)}")
-        return None
+        return None, f"File not found: {pretty_path(path)}"
 
     ext = path.suffix.lower()
+    if xpt_engine not in XPT_ENGINES:
+        raise ValueError(f"xpt_engine must be one of {XPT_ENGINES}, got '{xpt_engine}'")
 
     try:
-        if ext == ".csv":
-            df = pd.read_csv(path)
+        if path.is_dir():
+            # Folder of part files written by a chunked cleaner
+            df = load_dataframe(path)
+        elif ext == ".csv":
+            df = load_dataframe(path)
         elif ext in [".xls", ".xlsx"]:
             df = pd.read_excel(path, sheet_name=sheet_name)
+        elif ext == ".xpt" and xpt_engine == "projected":
+            # The projected reader checks the requested columns against the header itself
+            df = read_xpt_columns(path, columns)
         elif ext == ".xpt":
             df = pd.read_sas(path, format="xport")
         elif ext == ".sas7bdat":
@@ -55,62 +107,101 @@ def load_dataset(
         elif ext == ".json":
             df = pd.read_json(path)
         elif ext == ".parquet":
-            df = pd.read_parquet(path)
+            df = load_dataframe(path)
         else:
-            print(f"Unsupported file type: {ext}")
-            return None
+            return None, f"Unsupported file type: {ext}"
+    except KeyError as e:
+        return None, f"{e.args[0]} in {pretty_path(path)}"
     except Exception as e:
-        print(f"Error loading {pretty_path(path)}: {e}")
-        return None
+        return None, f"Error loading {pretty_path(path)}: {e}"
 
     # If you only want certain columns, check that they exist first
     if columns:
         missing_cols = [col for col in columns if col not in df.columns]
         if missing_cols:
-            print(f"Missing columns {missing_cols} in {pretty_path(path)}")
-            return None
+            return None, f"Missing columns {missing_cols} in {pretty_path(path)}"
         df = df[columns]
 
-    return df
+    return df, None
+
+# 1b. function for conforming a file of another NHANES cycle to its dataset spec
+def apply_cycle_layout(df: pd.DataFrame, layout: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Conforms a dataset loaded from another NHANES cycle to the source columns of its spec.
+
+    Columns are renamed (or copied) from the cycle's names, the columns the cycle does
+    not have are filled in and codes are recoded, so the spec cleaners apply unchanged.
+
+    Args:
+        df: Dataset loaded with the columns of dataset_specs.layout_columns(layout).
+        layout: Layout of the cycle's file (see dataset_specs.cycle_layout).
+
+    Returns:
+        pd.DataFrame: The dataset with the spec's source columns, in spec order.
+    """
+    data = {}
+    for source, column in layout["sources"].items():
+        if column is None:
+            value = layout["fill"].get(source)
+            values = pd.Series(np.nan if value is None else value, index=df.index)
+        else:
+            values = df[column]
+        if source in layout["recode"]:
+            values = values.replace(layout["recode"][source])
+        data[source] = values
+    return pd.DataFrame(data, index=df.index)
 
 # 2. function for saving file in interim data folder
-def save_interim_file(df: Optional[pd.DataFrame], name: str, original_ext: str) -> None:
+def save_interim_file(
+    df: Optional[pd.DataFrame],
+    name: str,
+    original_ext: str,
+    storage_format: Optional[str] = None
+) -> None:
     """
-    Saves a DataFrame as a CSV or Excel file in the interim data folder,
-    depending on the original file extension.
+    Saves a DataFrame in the interim data folder.
+
+    With the Parquet storage format every dataset is saved as Parquet. With the CSV
+    format, the file is saved as CSV or Excel depending on the original file extension.
 
     Args:
         df: The data you want to save.
         name: A short name for the dataset (used for the filename).
         original_ext: The original file extension (like '.xls', '.xlsx', '.xpt', etc.).
+        storage_format: 'parquet' or 'csv'. Defaults to config.STORAGE_FORMAT.
     """
     if df is None or df.empty:
-        print(f"No data to save for {name}")
+        logger.warning(f"No data to save for {name}")
         return
 
-    INTERIM_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    interim_dir = partition_dir(INTERIM_DATA_DIR)
+    interim_dir.mkdir(parents=True, exist_ok=True)
 
     ext = original_ext.lower()
+    storage_format = storage_format or STORAGE_FORMAT
 
-    if ext in ['.xls', '.xlsx']:
-        out_file = INTERIM_DATA_DIR / f"{name.lower()}_interim.xlsx"
+    if storage_format == "csv" and ext in ['.xls', '.xlsx']:
+        out_file = interim_dir / f"{name.lower()}_interim.xlsx"
         try:
             df.to_excel(out_file, index=False)
-            print(f"Saved interim Excel file for {name} to {pretty_path(out_file)}")
+            logger.info(f"Saved interim Excel file for {name} to {pretty_path(out_file)}")
         except Exception as e:
-            print(f"Failed to save Excel file for {name}: {e}")
+            logger.error(f"Failed to save Excel file for {name}: {e}")
     else:
-        # Default to CSV for other types
-        out_file = INTERIM_DATA_DIR / f"{name.lower()}_interim.csv"
+        out_file = interim_dir / f"{name.lower()}_interim"
         try:
-            df.to_csv(out_file, index=False)
-            print(f"Saved interim CSV for {name} to {pretty_path(out_file)}")
+            out_file = save_dataframe(df, out_file, storage_format)
+            logger.info(f"Saved interim {storage_format} file for {name} to {pretty_path(out_file)}")
         except Exception as e:
-            print(f"Failed to save CSV for {name}: {e}")
+            logger.error(f"Failed to save {storage_format} file for {name}: {e}")
             
 
 # 3. function for loading data from config file
-def process_datasets(dataset_config: Dict[str, dict] = datasets) -> Dict[str, pd.DataFrame]:
+@profiled("load")
+def process_datasets(
+    dataset_config: Dict[str, dict] = datasets,
+    validation_mode: str = "load"
+) -> Dict[str, pd.DataFrame]:
     """
     Goes through all datasets in the config:
     - validates them,
@@ -120,32 +211,55 @@ def process_datasets(dataset_config: Dict[str, dict] = datasets) -> Dict[str, pd
 
     Args:
         dataset_config: Info about all the datasets — paths, columns to keep, etc.
+            A 'layout' entry (see cycles.cycle_datasets) conforms a file of another
+            NHANES cycle to its spec after loading.
+        validation_mode: How files are validated before use:
+            - 'load': validate from the same parse that loads the data (each file is read once),
+            - 'header': check XPT member headers and configured columns without decoding rows,
+              then load,
+            - 'full': fully parse every file once to validate it, then again to load it.
 
     Returns:
         A dictionary of the loaded DataFrames, keyed by their names.
     """
-    print("Starting dataset validation...")
-    failed = validate_xpt_and_excel_files(dataset_config)
-    
-    if failed:
-        print("\nValidation failed for these datasets:")
-        for name, reason in failed.items():
-            print(f" - {name}: {reason}")
-    else:
-        print("All dataset files validated successfully.")
+    if validation_mode not in VALIDATION_MODES:
+        raise ValueError(f"validation_mode must be one of {VALIDATION_MODES}, got '{validation_mode}'")
+
+    failed = {}
+    if validation_mode == "full":
+        logger.info("Starting dataset validation...")
+        failed = validate_xpt_and_excel_files(dataset_config)
+    elif validation_mode == "header":
+        logger.info("Starting header-only dataset validation...")
+        failed = validate_dataset_headers(dataset_config)
 
     loaded_dfs = {}
 
     for name, info in dataset_config.items():
-        print(f"\nLoading dataset: {name}")
-        sheet_name = info.get("sheet_name")  # <-- NEW
-        df = load_dataset(info["file_path"], info.get("columns"), sheet_name=sheet_name)
+        if validation_mode == "header" and name in failed:
+            logger.warning(f"\nSkipping {name}: header validation failed.")
+            continue
+
+        logger.info(f"\nLoading dataset: {name}")
+        sheet_name = info.get("sheet_name")
+        df, error = load_validated_dataset(info["file_path"], info.get("columns"), sheet_name=sheet_name)
+        if df is not None and "layout" in info:
+            df = apply_cycle_layout(df, info["layout"])
         if df is not None:
             file_ext = Path(info["file_path"]).suffix.lower()
             save_interim_file(df, name, file_ext)
             loaded_dfs[name] = df
         else:
-            print(f"Skipping {name} due to loading failure or missing columns.")
+            logger.error(error)
+            logger.warning(f"Skipping {name} due to loading failure or missing columns.")
+            failed.setdefault(name, error)
+
+    if failed:
+        logger.warning("\nValidation failed for these datasets:")
+        for name, reason in failed.items():
+            logger.warning(f" - {name}: {reason}")
+    else:
+        logger.info("\nAll dataset files validated successfully.")
 
     return loaded_dfs
 
@@ -169,11 +283,11 @@ def main() -> Dict[str, pd.DataFrame]:
     Returns:
         A dictionary of all the loaded DataFrames.
     """
-    print("=== NHANES Data Loading ===")
+    logger.info("=== NHANES Data Loading ===")
     all_data = process_datasets()
-    print("\nData loading complete.")
+    logger.info("\nData loading complete.")
 
-    print("\n=== Exploring Loaded Datasets ===")
+    logger.info("\n=== Exploring Loaded Datasets ===")
     for name, df in all_data.items():
         explore_data(df, name)
 
@@ -0,0 +1,418 @@
+"""
+scripts\\data_profile.py
+
+Column statistics for explore_data, computed once per content hash and cached.
+
+A profile has one row per column: dtype, count, missing, distinct, mean, std, min,
+quartiles, max and the most frequent value (top/freq), plus the number of rows and
+duplicated rows of the dataset (profile.attrs). Two modes:
+
+- 'exact': the values describe(include='all'), nunique() and duplicated() give.
+- 'approx': one pass over row chunks in bounded memory, for multi-million-row files:
+  - distinct values per column from a HyperLogLog sketch (2**HLL_PRECISION registers,
+    about 1% relative error),
+  - quartiles and top value from a uniform sample of SAMPLE_SIZE values per column
+    (bottom-k reservoir sampling),
+  - duplicated rows from 64-bit row hashes (8 bytes per distinct row, not the row),
+  - count, missing, mean, std, min and max are still exact.
+
+When a pipeline cache is passed, profiles are stored in it (stage 'profile'), keyed on
+the content hash of the data (row hashes for a DataFrame, file bytes for a stored
+dataset), the mode and this module's source, so exploring unchanged data again only
+costs the hash.
+
+Run `python scripts/data_profile.py <stored dataset path> [exact|approx]` to print a profile.
+"""
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import hashlib
+import json
+import numpy as np
+import pandas as pd
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+from scripts.config import EXPLORE_EXACT_MAX_ROWS, EXPLORE_MODE
+from scripts.pipeline_cache import PipelineCache, hash_file, hash_source, make_key
+from scripts.storage import iter_batches, list_parts, resolve_path
+
+PROFILE_MODES = ("exact", "approx", "auto")
+
+# Columns of a profile, in order
+PROFILE_STATS = ["dtype", "count", "missing", "distinct", "mean", "std", "min",
+                 "25%", "50%", "75%", "max", "top", "freq"]
+
+# Dataset-level values kept in profile.attrs (and as columns of the cached artifact)
+DATASET_STATS = ("rows", "duplicated_rows")
+
+# Sketch sizes of the approximate mode
+HLL_PRECISION = 14
+SAMPLE_SIZE = 10_000
+CHUNK_ROWS = 100_000
+RANDOM_SEED = 0
+
+
+# 1. Sketches
+def _row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """
+    64-bit hash of every row's values (the index is ignored).
+    """
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    """
+    Distinct values of a numeric array, sorted (a sort is faster than np.unique's hash table
+    on 64-bit hashes).
+    """
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+def _numeric(series: pd.Series) -> bool:
+    # describe() summarizes booleans like categories
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+
+def hll_update(registers: np.ndarray, hashes: np.ndarray, precision: int = HLL_PRECISION) -> None:
+    """
+    Adds 64-bit hashes to a HyperLogLog sketch (registers of 2**precision uint8, updated in place).
+
+    The first `precision` bits of a hash choose the register, which keeps the largest
+    position of the first 1 bit among the remaining bits.
+    """
+    if not len(hashes):
+        return
+    hashes = hashes.astype(np.uint64, copy=False)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    # A sentinel bit keeps the rank finite when all remaining bits are 0
+    rest = (hashes << np.uint64(precision)) | np.uint64(1 << (precision - 1))
+    rank = (64 - np.floor(np.log2(rest.astype(np.float64)))).astype(np.uint8)
+    np.maximum.at(registers, index, rank)
+
+
+def hll_estimate(registers: np.ndarray) -> int:
+    """
+    Returns the distinct count estimated from HyperLogLog registers.
+    """
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    empty = int(np.count_nonzero(registers == 0))
+    # Linear counting is more accurate while many registers are still empty
+    if estimate <= 2.5 * m and empty:
+        estimate = m * np.log(m / empty)
+    return int(round(estimate))
+
+
+class ApproxProfiler:
+    """
+    Streaming approximate profile: feed it row chunks with update(), then call result().
+
+    Memory is bounded by the sketches (one HyperLogLog and one SAMPLE_SIZE sample per
+    column) and 8 bytes per distinct row hash, whatever the number of chunks.
+
+    Args:
+        sample_size: Values sampled per column for the quartiles and top value.
+        precision: HyperLogLog precision (2**precision registers per column).
+        seed: Seed of the sampling, so a profile is reproducible.
+    """
+
+    def __init__(self, sample_size: int = SAMPLE_SIZE, precision: int = HLL_PRECISION, seed: int = RANDOM_SEED) -> None:
+        self.sample_size = sample_size
+        self.precision = precision
+        self.rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.row_hashes = np.empty(0, dtype=np.uint64)
+        self.pending_hashes: List[np.ndarray] = []
+        self.pending_rows = 0
+        self.columns: Dict[str, Dict[str, Any]] = {}
+
+    def _column(self, name: str, series: pd.Series) -> Dict[str, Any]:
+        if name not in self.columns:
+            self.columns[name] = {
+                "dtype": str(series.dtype), "numeric": _numeric(series), "count": 0,
+                "registers": np.zeros(1 << self.precision, dtype=np.uint8),
+                "sample_keys": np.empty(0), "sample": series.iloc[:0].to_numpy(),
+                "mean": 0.0, "m2": 0.0, "min": np.nan, "max": np.nan,
+            }
+        return self.columns[name]
+
+    def _compact_hashes(self) -> None:
+        """
+        Folds the pending row hashes into the sorted distinct hashes.
+        """
+        if self.pending_hashes:
+            self.row_hashes = _sorted_unique(np.concatenate([self.row_hashes, *self.pending_hashes]))
+            self.pending_hashes, self.pending_rows = [], 0
+
+    def update(self, df: pd.DataFrame, row_hashes: Optional[np.ndarray] = None) -> None:
+        """
+        Adds a chunk of rows to the profile.
+
+        Args:
+            df: Rows to add.
+            row_hashes: Row hashes of df, if already computed (see _row_hashes).
+        """
+        self.rows += len(df)
+        # Hashes are deduplicated in batches, once the pending ones outnumber the distinct ones
+        self.pending_hashes.append(_row_hashes(df) if row_hashes is None else row_hashes)
+        self.pending_rows += len(df)
+        if self.pending_rows > max(len(self.row_hashes), CHUNK_ROWS):
+            self._compact_hashes()
+
+        for name in df.columns:
+            series = df[name]
+            state = self._column(name, series)
+            values = series.dropna()
+            n = len(values)
+            if not n:
+                continue
+
+            hll_update(state["registers"], pd.util.hash_pandas_object(values, index=False).to_numpy(), self.precision)
+
+            # Bottom-k sampling: the values with the k smallest random keys are a uniform sample
+            keys = np.concatenate([state["sample_keys"], self.rng.random(n)])
+            sample = np.concatenate([state["sample"], values.to_numpy()])
+            if len(keys) > self.sample_size:
+                keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+                keys, sample = keys[keep], sample[keep]
+            state["sample_keys"], state["sample"] = keys, sample
+
+            if state["numeric"]:
+                x = values.to_numpy(dtype=np.float64)
+                # Chan et al. merge of the running mean and sum of squared deviations
+                mean_b = x.mean()
+                m2_b = float(((x - mean_b) ** 2).sum())
+                total = state["count"] + n
+                delta = mean_b - state["mean"]
+                state["m2"] += m2_b + delta * delta * state["count"] * n / total
+                state["mean"] += delta * n / total
+                state["min"] = np.fmin(state["min"], x.min())
+                state["max"] = np.fmax(state["max"], x.max())
+            state["count"] += n
+
+    def result(self) -> pd.DataFrame:
+        """
+        Returns the profile of the rows seen so far.
+        """
+        self._compact_hashes()
+        rows = {}
+        for name, state in self.columns.items():
+            count = state["count"]
+            stats = {"dtype": state["dtype"], "count": count, "missing": self.rows - count,
+                     "distinct": min(hll_estimate(state["registers"]), count) if count else 0}
+            sample = state["sample"]
+            if state["numeric"] and count:
+                q25, q50, q75 = np.quantile(sample.astype(np.float64), [0.25, 0.5, 0.75])
+                stats.update({
+                    "mean": state["mean"],
+                    "std": np.sqrt(state["m2"] / (count - 1)) if count > 1 else np.nan,
+                    "min": state["min"], "25%": q25, "50%": q50, "75%": q75, "max": state["max"],
+                })
+            elif count:
+                top = pd.Series(sample).value_counts()
+                stats.update({"top": top.index[0], "freq": round(top.iloc[0] * count / len(sample))})
+            rows[name] = stats
+
+        profile = _finish(pd.DataFrame.from_dict(rows, orient="index"))
+        profile.attrs.update(rows=self.rows, duplicated_rows=self.rows - len(self.row_hashes), mode="approx")
+        return profile
+
+
+# 2. Profiles
+def _finish(profile: pd.DataFrame) -> pd.DataFrame:
+    """
+    Orders the profile columns and gives them dtypes that can be stored in Parquet.
+    """
+    profile = profile.reindex(columns=PROFILE_STATS)
+    profile.index.name = "column"
+    for col in ["count", "missing", "distinct", "freq"]:
+        profile[col] = pd.to_numeric(profile[col]).astype("Int64")
+    for col in ["mean", "std", "min", "25%", "50%", "75%", "max"]:
+        profile[col] = pd.to_numeric(profile[col], errors="coerce").astype(np.float64)
+    profile["dtype"] = profile["dtype"].astype(str)
+    profile["top"] = profile["top"].map(lambda value: None if pd.isna(value) else str(value)).astype(object)
+    return profile
+
+
+def exact_profile(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Profiles a DataFrame exactly, with describe(include='all'), nunique() and duplicated().
+    """
+    summary = df.describe(include="all").T if len(df.columns) else pd.DataFrame()
+    numeric = [col for col in df.columns if _numeric(df[col])]
+    profile = pd.DataFrame({
+        "dtype": df.dtypes.astype(str),
+        "count": df.count(),
+        "missing": df.isnull().sum(),
+        "distinct": df.nunique(),
+    })
+    for col in ["mean", "std", "min", "25%", "50%", "75%", "max"]:
+        if col in summary:
+            profile[col] = summary[col].where(summary.index.isin(numeric))
+    for col in ["top", "freq"]:
+        if col in summary:
+            profile[col] = summary[col]
+
+    profile = _finish(profile)
+    profile.attrs.update(rows=len(df), duplicated_rows=int(df.duplicated().sum()), mode="exact")
+    return profile
+
+
+def approx_profile(
+    chunks: Iterable[pd.DataFrame],
+    sample_size: int = SAMPLE_SIZE,
+    precision: int = HLL_PRECISION
+) -> pd.DataFrame:
+    """
+    Profiles a stream of row chunks approximately (see ApproxProfiler).
+    """
+    profiler = ApproxProfiler(sample_size, precision)
+    for chunk in chunks:
+        profiler.update(chunk)
+    return profiler.result()
+
+
+def _chunks(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterable[pd.DataFrame]:
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def resolve_mode(mode: str, rows: int) -> str:
+    """
+    Returns 'exact' or 'approx' for a profile mode ('auto' is approx above EXPLORE_EXACT_MAX_ROWS rows).
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"mode must be one of {PROFILE_MODES}, got {mode!r}")
+    if mode == "auto":
+        return "approx" if rows > EXPLORE_EXACT_MAX_ROWS else "exact"
+    return mode
+
+
+def _to_artifact(profile: pd.DataFrame) -> pd.DataFrame:
+    return profile.assign(**{stat: profile.attrs[stat] for stat in DATASET_STATS})
+
+
+def _from_artifact(artifact: pd.DataFrame, mode: str) -> pd.DataFrame:
+    profile = artifact.drop(columns=list(DATASET_STATS))
+    profile.attrs.update({stat: int(artifact[stat].iloc[0]) for stat in DATASET_STATS}, mode=mode)
+    return profile
+
+
+def _cached_profile(
+    name: str,
+    content_hash: str,
+    mode: str,
+    compute: Callable[[], pd.DataFrame],
+    cache: Optional[PipelineCache]
+) -> pd.DataFrame:
+    if cache is None:
+        return compute()
+    params = {"mode": mode} if mode == "exact" else {"mode": mode, "sample_size": SAMPLE_SIZE,
+                                                     "precision": HLL_PRECISION, "seed": RANDOM_SEED}
+    key = make_key("profile", content_hash, params, hash_source(ApproxProfiler))
+    artifact = cache.get("profile", name, key)
+    if artifact is not None:
+        return _from_artifact(artifact, mode)
+    profile = compute()
+    if not profile.empty:
+        cache.put("profile", name, key, _to_artifact(profile))
+    return profile
+
+
+def profile_dataframe(
+    df: pd.DataFrame,
+    name: str = "Dataset",
+    mode: str = EXPLORE_MODE,
+    cache: Optional[PipelineCache] = None
+) -> pd.DataFrame:
+    """
+    Returns the profile of a DataFrame, from the cache if the same data was profiled before.
+
+    The content hash is computed from the row hashes, which the approximate mode also
+    uses for the duplicated rows, so the data is hashed once.
+
+    Args:
+        df: Data to profile.
+        name: Dataset name shown in the cache report.
+        mode: 'exact', 'approx' or 'auto' (see resolve_mode). Defaults to EXPLORE_MODE.
+        cache: Pipeline cache to read from and write to. Defaults to no caching.
+
+    Returns:
+        pd.DataFrame: One row per column of df, with rows and duplicated_rows in .attrs.
+    """
+    mode = resolve_mode(mode, len(df))
+    row_hashes = _row_hashes(df)
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(row_hashes.tobytes())
+
+    def compute() -> pd.DataFrame:
+        if mode == "exact":
+            return exact_profile(df)
+        profiler = ApproxProfiler()
+        for start, chunk in zip(range(0, len(df), CHUNK_ROWS), _chunks(df)):
+            profiler.update(chunk, row_hashes[start:start + CHUNK_ROWS])
+        return profiler.result()
+
+    return _cached_profile(name, digest.hexdigest(), mode, compute, cache)
+
+
+def profile_file(
+    path: Union[str, Path],
+    name: Optional[str] = None,
+    mode: str = "approx",
+    cache: Optional[PipelineCache] = None
+) -> pd.DataFrame:
+    """
+    Profiles a stored dataset (a file or a folder of part files) by streaming its batches.
+
+    The approximate mode never loads the whole dataset; the exact mode loads it first.
+    The cache key is the hash of the stored bytes, so the data is not read on a hit.
+
+    Args:
+        path: Stored dataset path (any supported extension; see storage.resolve_path).
+        name: Dataset name shown in the cache report. Defaults to the file name.
+        mode: 'exact' or 'approx' ('auto' is treated as approx).
+        cache: Pipeline cache to read from and write to. Defaults to no caching.
+
+    Raises:
+        FileNotFoundError: If no stored version of the dataset exists.
+    """
+    resolved = resolve_path(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No stored file found for {path}")
+    files = list_parts(resolved) if resolved.is_dir() else [resolved]
+    content_hash = make_key([hash_file(file) for file in files])
+    mode = "approx" if mode == "auto" else resolve_mode(mode, 0)
+
+    def compute() -> pd.DataFrame:
+        batches = (batch.to_pandas() for batch in iter_batches(resolved, batch_size=CHUNK_ROWS))
+        if mode == "exact":
+            return exact_profile(pd.concat(list(batches), ignore_index=True))
+        return approx_profile(batches)
+
+    return _cached_profile(name or resolved.name, content_hash, mode, compute, cache)
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """
+    Prints the profile of a stored dataset.
+    """
+    args = args or []
+    if not args:
+        print("Usage: python scripts/data_profile.py <stored dataset path> [exact|approx]")
+        return
+    profile = profile_file(args[0], mode=args[1] if len(args) > 1 else "approx", cache=PipelineCache())
+    print(f"{profile.attrs['rows']} rows, {profile.attrs['duplicated_rows']} duplicated ({profile.attrs['mode']})")
+    print(profile.to_string())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
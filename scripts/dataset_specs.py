@@ -0,0 +1,472 @@
+"""
+scripts\\dataset_specs.py
+
+One declarative spec per NHANES dataset. Each spec describes:
+
+- 'file': raw file name inside RAW_DATA_DIR (and 'sheet_name' for Excel files),
+- 'columns': source column -> column spec, in output order, with
+    - 'target': cleaned column name,
+    - 'dtype': 'id' (participant id, see normalize_participant_id), 'float'
+      (coerced to numeric) or None (kept as loaded),
+    - 'artifact': (target, tolerance) of the XPT float artifact to set to NaN,
+    - 'sentinels': codes such as 7/9 (Refused/Don't know) or 7777/9999 to set to NaN,
+    - 'range': (min, max) plausible range (inclusive); 'on_invalid' is 'null'
+      (default) or 'drop',
+    - 'weight': (min, max) valid range of a sample weight; other rows are dropped,
+    - 'survey_weight': the column is a survey weight, rescaled when cycles are pooled,
+    - 'required': drop rows where the cleaned value is missing,
+    - 'map': code -> label mapping applied to the kept rows,
+- 'cleaner': 'spec' if the dataset is cleaned entirely by the spec executor
+  (scripts/clean_spec.py), otherwise the name of its custom cleaning function
+  (custom cleaners take their column names, and BP its ranges, from the spec),
+- 'output': clean file name inside CLEAN_DATA_DIR,
+- 'reset_index': renumber the rows of the cleaned dataset,
+- 'per_cycle': False for files shared by every NHANES cycle (default True: the file
+  name carries the cycle suffix, e.g. DEMO_L.xpt -> DEMO_J.xpt; see cycle_file), or
+  cycle -> overrides for cycles whose file differs from the spec's (see cycle_layout):
+    - 'file': raw file name in that cycle (e.g. BPX_I.xpt),
+    - 'sources': spec source column -> column of that cycle's file,
+    - 'fill': spec source column -> value, for columns the cycle does not have
+      (None for missing values),
+    - 'recode': spec source column -> {cycle code: spec code},
+- 'table': SQLite table fed by the dataset (name and column -> SQL type, besides
+  participant_id, including engineered feature columns, and 'indexes': the column
+  lists of its secondary indexes, built after a bulk load; see db_utils.bulk_load).
+
+config.datasets, db_utils.NHANES_TABLE_SCHEMAS and data_cleaning.CLEANING_FUNCTIONS
+are all built from these specs, so a new table (or cycle, see CYCLES) is added here only.
+This module only holds data so that config.py can import it.
+"""
+from typing import Any, Dict, List
+
+# Float that zeros decode into when read from XPT files
+XPT_ARTIFACT = 5.39760534693402e-79
+
+# "Refused" and "Don't know" codes of single-digit NHANES questions
+REFUSED_DONT_KNOW = [7, 9]
+
+YES_NO_MAP = {1: 1, 2: 0}  # 1 = Yes, 2 = No
+
+# FPED food pattern columns, as named in the USDA workbook (the unit is dropped when cleaning)
+FPED_SOURCE_COLUMNS = [
+    'FOODCODE', 'DESCRIPTION', 'F_TOTAL (cup eq)', 'F_JUICE (cup eq)', 'F_CITMLB (cup eq)',
+    'F_OTHER (cup eq)', 'V_TOTAL (cup eq)', 'V_DRKGR (cup eq)', 'V_LEGUMES (cup eq)',
+    'G_WHOLE (oz eq)', 'G_REFINED (oz eq)', 'D_TOTAL (cup eq)', 'D_MILK (cup eq)',
+    'D_YOGURT (cup eq)', 'D_CHEESE (cup eq)', 'PF_TOTAL (oz eq)', 'PF_MPS_TOTAL (oz eq)',
+    'PF_SEAFD_HI (oz eq)', 'PF_SEAFD_LOW (oz eq)', 'SOLID_FATS (grams)', 'ADD_SUGARS (tsp eq)', 'OILS (grams)'
+]
+
+SEQN = {"target": "participant_id", "dtype": "id"}
+
+# NHANES cycles by file suffix, with their survey years and length in years.
+# Pooled survey weights are the cycle weights scaled by length / total length of the
+# pooled cycles (i.e. divided by the number of cycles when every cycle lasts 2 years).
+# 'file_prefix' cycles name their files <prefix><stem> (P_DEMO.xpt) instead of <stem>_<cycle>.
+# 'contains' lists the cycles whose participants are also in the cycle, which therefore
+# cannot be pooled with it.
+CYCLES: Dict[str, Dict[str, Any]] = {
+    "L": {"years": "2021-2023", "length": 2.0},
+    # 2017-March 2020 pre-pandemic, which includes the 2017-2018 participants
+    "P": {"years": "2017-2020", "length": 3.2, "file_prefix": "P_", "contains": ["J"]},
+    "J": {"years": "2017-2018", "length": 2.0},
+    "I": {"years": "2015-2016", "length": 2.0},
+    "H": {"years": "2013-2014", "length": 2.0},
+    "G": {"years": "2011-2012", "length": 2.0},
+    "F": {"years": "2009-2010", "length": 2.0},
+    "E": {"years": "2007-2008", "length": 2.0},
+    "D": {"years": "2005-2006", "length": 2.0},
+}
+
+# Cycle the file names in the specs are written for
+DEFAULT_CYCLE = "L"
+
+# Cycles before 2017, whose blood pressure was read by auscultation (BPX, not BPXO files)
+BPX_CYCLES = ("I", "H", "G", "F", "E", "D")
+
+# Cycles asking the GPAQ recreational activity items (PAQ650-PAD675) instead of PAD790Q/PAD800
+GPAQ_CYCLES = ("P", "J", "I", "H", "G", "F", "E")
+
+DATASET_SPECS: Dict[str, Dict[str, Any]] = {
+    "DEMO_L": {
+        "file": "DEMO_L.xpt",
+        "cleaner": "clean_demo",
+        "output": "demo_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "RIAGENDR": {"target": "gender"},
+            "RIDAGEYR": {"target": "age", "dtype": "float"},
+            "RIDRETH3": {"target": "race_ethnicity"},
+            "DMDEDUC2": {"target": "education_level"},
+            "INDFMPIR": {"target": "poverty_income_ratio", "dtype": "float"},
+            "WTINT2YR": {"target": "interview_sample_weight", "dtype": "float", "survey_weight": True},
+            "WTMEC2YR": {"target": "exam_sample_weight", "dtype": "float", "survey_weight": True},
+            "SDMVSTRA": {"target": "strata", "dtype": "float"},
+            "SDMVPSU": {"target": "psu", "dtype": "float"},
+        },
+        "per_cycle": {
+            "P": {"sources": {"WTINT2YR": "WTINTPRP", "WTMEC2YR": "WTMECPRP"}},
+            # RIDRETH3 starts in 2011-2012; before it RIDRETH1 has no Non-Hispanic Asian
+            # group (5 = Other race, including multi-racial)
+            **{cycle: {"sources": {"RIDRETH3": "RIDRETH1"}, "recode": {"RIDRETH3": {5: 7}}}
+               for cycle in ("F", "E", "D")},
+        },
+        "table": {
+            "name": "demographics",
+            "columns": {
+                "gender": "TEXT", "age": "INTEGER", "race_ethnicity": "TEXT", "education_level": "TEXT",
+                "poverty_income_ratio": "REAL", "interview_sample_weight": "REAL",
+                "exam_sample_weight": "REAL", "strata": "REAL", "psu": "REAL", "pir_category": "TEXT",
+            },
+            # Covering indexes: weighted counts by these columns never read the table
+            "indexes": [
+                ["gender", "race_ethnicity", "pir_category", "interview_sample_weight"],
+                ["race_ethnicity", "pir_category", "interview_sample_weight"],
+                ["pir_category", "interview_sample_weight"],
+            ],
+        },
+    },
+    "PAQ_L": {
+        "file": "PAQ_L.xpt",
+        "cleaner": "clean_physical_activity",
+        "output": "paq_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "PAD680": {"target": "sedentary_min_per_day", "dtype": "float"},
+            "PAD790Q": {"target": "freq", "dtype": "float"},
+            "PAD790U": {"target": "freq_unit"},
+            "PAD800": {"target": "duration_min", "dtype": "float"},
+        },
+        # Moderate recreational activity: days per week (PAQ670) and minutes per day (PAD675).
+        # PAQ_D predates these items and fails validation.
+        "per_cycle": {
+            cycle: {"sources": {"PAD790Q": "PAQ670", "PAD800": "PAD675"}, "fill": {"PAD790U": "W"}}
+            for cycle in GPAQ_CYCLES
+        },
+        "table": {
+            "name": "physical_activity",
+            "columns": {"activity_level": "TEXT", "sedentary_min_per_week": "REAL", "total_weekly_min": "REAL"},
+            "indexes": [["activity_level"]],
+        },
+    },
+    "SLQ_L": {
+        "file": "SLQ_L.xpt",
+        "cleaner": "clean_sleep",
+        "output": "slq_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "SLD012": {"target": "sleep_weekday_hr", "dtype": "float"},
+            "SLD013": {"target": "sleep_weekend_hr", "dtype": "float"},
+        },
+        # Before 2017 a single question (usual sleep on workdays) stands for every night
+        "per_cycle": {
+            "I": {"sources": {"SLD013": "SLD012"}},
+            **{cycle: {"sources": {"SLD012": "SLD010H", "SLD013": "SLD010H"}} for cycle in ("H", "G", "F", "E", "D")},
+        },
+        "table": {
+            "name": "sleep",
+            "columns": {"sleep_avg_hr": "REAL", "sleep_category": "TEXT"},
+            "indexes": [["sleep_category"]],
+        },
+    },
+    "DR1TOT_L": {
+        "file": "DR1TOT_L.xpt",
+        "cleaner": "spec",
+        "output": "dr1tot_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "DR1TKCAL": {"target": "energy_kcal", "artifact": (5.397605e-79, 1e-78),
+                         "required": True, "range": (0, 10446), "on_invalid": "drop"},
+            "DR1TSFAT": {"target": "satfat_g", "artifact": (5.397605e-79, 1e-78),
+                         "required": True, "range": (0, 208.842), "on_invalid": "drop"},
+            "DR1TSODI": {"target": "sodium_mg", "artifact": (5.397605e-79, 1e-78),
+                         "required": True, "range": (0, 20006), "on_invalid": "drop"},
+            "WTDRD1": {"target": "total_diet_weight", "weight": (100, 1_000_000), "survey_weight": True},
+        },
+        "per_cycle": {"P": {"sources": {"WTDRD1": "WTDRD1PP"}}},
+        # Participant-level HEI-2015 scores computed from the dietary recall
+        "table": {
+            "name": "diet",
+            "columns": {
+                "total_diet_weight": "REAL", "food_item_weight": "REAL",
+                "hei_score": "REAL", "diet_score_category": "TEXT",
+            },
+            "indexes": [["diet_score_category"]],
+        },
+    },
+    "DR1IFF_L": {
+        "file": "DR1IFF_L.xpt",
+        "cleaner": "clean_individual_diet",
+        "output": "dr1iff_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "DR1IGRMS": {"target": "grams_consumed", "dtype": "float"},
+            "DR1IKCAL": {"target": "energy_kcal", "dtype": "float"},
+            "WTDRD1": {"target": "food_item_weight", "dtype": "float", "survey_weight": True},
+            "DR1IFDCD": {"target": "food_code", "dtype": "float"},
+        },
+        "per_cycle": {"P": {"sources": {"WTDRD1": "WTDRD1PP"}}},
+    },
+    # Day-2 recall (second interview, 3 to 10 days later). WTDR2D is the two-day dietary
+    # weight, used for estimates from both recall days; it is 0 without a day-2 recall.
+    "DR2TOT_L": {
+        "file": "DR2TOT_L.xpt",
+        "cleaner": "spec",
+        "output": "dr2tot_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "DR2TKCAL": {"target": "energy_kcal", "artifact": (5.397605e-79, 1e-78),
+                         "required": True, "range": (0, 10446), "on_invalid": "drop"},
+            "DR2TSFAT": {"target": "satfat_g", "artifact": (5.397605e-79, 1e-78),
+                         "required": True, "range": (0, 208.842), "on_invalid": "drop"},
+            "DR2TSODI": {"target": "sodium_mg", "artifact": (5.397605e-79, 1e-78),
+                         "required": True, "range": (0, 20006), "on_invalid": "drop"},
+            "WTDR2D": {"target": "total_diet_weight", "weight": (100, 1_000_000), "survey_weight": True},
+        },
+        "per_cycle": {"P": {"sources": {"WTDR2D": "WTDR2DPP"}}},
+    },
+    "DR2IFF_L": {
+        "file": "DR2IFF_L.xpt",
+        "cleaner": "clean_individual_diet_day2",
+        "output": "dr2iff_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "DR2IGRMS": {"target": "grams_consumed", "dtype": "float"},
+            "DR2IKCAL": {"target": "energy_kcal", "dtype": "float"},
+            "WTDR2D": {"target": "food_item_weight", "dtype": "float", "survey_weight": True},
+            "DR2IFDCD": {"target": "food_code", "dtype": "float"},
+        },
+        "per_cycle": {"P": {"sources": {"WTDR2D": "WTDR2DPP"}}},
+    },
+    "HIQ_L": {
+        "file": "HIQ_L.xpt",
+        "cleaner": "spec",
+        "output": "hiq_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "HIQ011": {"target": "has_health_insurance", "sentinels": REFUSED_DONT_KNOW,
+                       "required": True, "map": {1: "Yes", 2: "No"}},
+        },
+        "table": {
+            "name": "health_insurance",
+            "columns": {"has_health_insurance": "TEXT"},
+        },
+    },
+    "BMX_L": {
+        "file": "BMX_L.xpt",
+        "cleaner": "spec",
+        "output": "bmx_l_clean.csv",
+        "reset_index": True,
+        "columns": {
+            "SEQN": SEQN,
+            "BMXBMI": {"target": "bmi", "dtype": "float", "required": True,
+                       "range": (11.1, 74.8), "on_invalid": "drop"},
+        },
+        "table": {
+            "name": "bmi",
+            "columns": {"bmi": "REAL", "obese": "INTEGER"},
+        },
+    },
+    "BPXO_L": {
+        "file": "BPXO_L.xpt",
+        "cleaner": "clean_bp",
+        "output": "bpxo_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "BPXOSY1": {"target": "systolic_1", "range": (50, 233)},
+            "BPXOSY2": {"target": "systolic_2", "range": (50, 233)},
+            "BPXOSY3": {"target": "systolic_3", "range": (50, 233)},
+            "BPXODI1": {"target": "diastolic_1", "range": (24, 142)},
+            "BPXODI2": {"target": "diastolic_2", "range": (24, 142)},
+            "BPXODI3": {"target": "diastolic_3", "range": (24, 142)},
+        },
+        "per_cycle": {
+            cycle: {
+                "file": f"BPX_{cycle}.xpt",
+                "sources": {f"BPXO{reading}{i}": f"BPX{reading}{i}" for reading in ("SY", "DI") for i in (1, 2, 3)},
+            }
+            for cycle in BPX_CYCLES
+        },
+        "table": {
+            "name": "bp",
+            "columns": {"systolic_avg": "REAL", "diastolic_avg": "REAL", "bp_category": "TEXT"},
+            "indexes": [["bp_category", "systolic_avg", "diastolic_avg"]],
+        },
+    },
+    "TCHOL_L": {
+        "file": "TCHOL_L.xpt",
+        "cleaner": "spec",
+        "output": "tchol_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "LBXTC": {"target": "total_cholesterol", "required": True,
+                      "range": (62, 438), "on_invalid": "drop"},
+            "WTPH2YR": {"target": "blood_drawn_sample_weight", "artifact": (XPT_ARTIFACT, 1e-78),
+                        "weight": (0.01, 1_000_000), "survey_weight": True},
+        },
+        # Earlier cycles measured cholesterol on the whole exam sample (weighted by WTMEC2YR)
+        "per_cycle": {cycle: {"fill": {"WTPH2YR": None}} for cycle in CYCLES if cycle != DEFAULT_CYCLE},
+        "table": {
+            "name": "total_cholestrol",
+            "columns": {"total_cholesterol": "REAL", "blood_drawn_sample_weight": "REAL", "cholesterol_category": "TEXT"},
+            "indexes": [["cholesterol_category"]],
+        },
+    },
+    "GLU_L": {
+        "file": "GLU_L.xpt",
+        "cleaner": "clean_glucose",
+        "output": "glu_l_clean.csv",
+        "columns": {
+            "SEQN": SEQN,
+            "LBXGLU": {"target": "fasting_glucose_mg_dl"},
+            "LBDGLUSI": {"target": "fasting_glucose_mmol_l"},
+            "WTSAF2YR": {"target": "fasting_subsample_weight", "dtype": "float", "survey_weight": True},
+        },
+        "per_cycle": {"P": {"sources": {"WTSAF2YR": "WTSAFPRP"}}},
+        "table": {
+            "name": "glucose",
+            "columns": {
+                "fasting_glucose_mg_dl": "REAL", "fasting_subsample_weight": "REAL",
+                "glucose_category": "TEXT", "hypoglycemia_flag": "INTEGER",
+                "hyperglycemia_flag": "INTEGER", "log_fasting_glucose_mg_dl": "REAL",
+            },
+            "indexes": [["glucose_category"]],
+        },
+    },
+    "DIQ_L": {
+        "file": "DIQ_L.xpt",
+        "cleaner": "spec",
+        "output": "diq_l_clean.csv",
+        "reset_index": True,
+        "columns": {
+            "SEQN": SEQN,
+            # 3 = Borderline is treated as unknown
+            "DIQ010": {"target": "diabetes_dx", "sentinels": [3] + REFUSED_DONT_KNOW, "map": YES_NO_MAP},
+            "DIQ070": {"target": "diabetes_meds", "sentinels": REFUSED_DONT_KNOW, "map": YES_NO_MAP},
+        },
+        "table": {
+            "name": "diabetes",
+            "columns": {
+                "diabetes_dx": "INTEGER", "diabetes_meds": "INTEGER",
+                "diabetes_meds_cat": "TEXT", "diabetes_status": "TEXT",
+            },
+            "indexes": [["diabetes_status"]],
+        },
+    },
+    "MCQ_L": {
+        "file": "MCQ_L.xpt",
+        "cleaner": "spec",
+        "output": "mcq_l_clean.csv",
+        "reset_index": True,
+        "columns": {
+            "SEQN": SEQN,
+            "MCQ160B": {"target": "congestive_heart_failure", "sentinels": REFUSED_DONT_KNOW, "map": YES_NO_MAP},
+            "MCQ160C": {"target": "coronary_heart_disease", "sentinels": REFUSED_DONT_KNOW, "map": YES_NO_MAP},
+            "MCQ160D": {"target": "angina", "sentinels": REFUSED_DONT_KNOW, "map": YES_NO_MAP},
+            "MCQ160E": {"target": "heart_attack", "sentinels": REFUSED_DONT_KNOW, "map": YES_NO_MAP},
+        },
+        "table": {
+            "name": "cardio_vascular",
+            "columns": {
+                "congestive_heart_failure": "INTEGER", "coronary_heart_disease": "INTEGER",
+                "angina": "INTEGER", "heart_attack": "INTEGER", "any_cvd": "INTEGER",
+            },
+        },
+    },
+    "FPED_1720": {
+        "file": "FPED_1720.xls",
+        "sheet_name": "FPED_1720_",
+        "per_cycle": False,
+        "cleaner": "clean_fped",
+        "output": "fped_1720_clean.csv",
+        "columns": {
+            col: {"target": col.split('(')[0].strip(),
+                  "dtype": None if col in ('FOODCODE', 'DESCRIPTION') else "float"}
+            for col in FPED_SOURCE_COLUMNS
+        },
+    },
+}
+
+
+def rename_map(name: str) -> Dict[str, str]:
+    """
+    Returns the source -> target column names of a dataset spec.
+    """
+    return {source: column["target"] for source, column in DATASET_SPECS[name]["columns"].items()}
+
+
+def cycle_overrides(name: str, cycle: str) -> Dict[str, Any]:
+    """
+    Returns the 'per_cycle' overrides of a dataset spec for an NHANES cycle (empty if none).
+    """
+    per_cycle = DATASET_SPECS[name].get("per_cycle", True)
+    return per_cycle.get(cycle, {}) if isinstance(per_cycle, dict) else {}
+
+
+def cycle_file(name: str, cycle: str = DEFAULT_CYCLE) -> str:
+    """
+    Returns the raw file name of a dataset in an NHANES cycle (e.g. DEMO_L.xpt -> DEMO_J.xpt,
+    P_DEMO.xpt for the 2017-2020 cycle, or the cycle's 'file' override).
+
+    Raises:
+        ValueError: If the cycle is not in CYCLES.
+    """
+    if cycle not in CYCLES:
+        raise ValueError(f"Unknown NHANES cycle '{cycle}'. Known cycles: {list(CYCLES)}")
+    spec = DATASET_SPECS[name]
+    if cycle == DEFAULT_CYCLE or not spec.get("per_cycle", True):
+        return spec["file"]
+    override = cycle_overrides(name, cycle)
+    if "file" in override:
+        return override["file"]
+    stem, ext = spec["file"].rsplit(".", 1)
+    stem = stem[:-len(DEFAULT_CYCLE) - 1]
+    prefix = CYCLES[cycle].get("file_prefix")
+    return f"{prefix}{stem}.{ext}" if prefix else f"{stem}_{cycle}.{ext}"
+
+
+def cycle_layout(name: str, cycle: str = DEFAULT_CYCLE) -> Dict[str, Any]:
+    """
+    Returns how the raw file of a dataset is laid out in an NHANES cycle.
+
+    Returns:
+        Dict with 'file' (see cycle_file), 'sources' (spec source column -> column of the
+        cycle's file, None if the cycle does not have it), 'fill' (spec source column ->
+        value of the columns the cycle does not have) and 'recode' (spec source column ->
+        {cycle code: spec code}).
+    """
+    override = cycle_overrides(name, cycle)
+    fill = override.get("fill", {})
+    sources = override.get("sources", {})
+    return {
+        "file": cycle_file(name, cycle),
+        "sources": {
+            source: None if source in fill else sources.get(source, source)
+            for source in DATASET_SPECS[name]["columns"]
+        },
+        "fill": dict(fill),
+        "recode": dict(override.get("recode", {})),
+    }
+
+
+def layout_columns(layout: Dict[str, Any]) -> List[str]:
+    """
+    Returns the columns to read from a raw file laid out as described by cycle_layout.
+    """
+    return list(dict.fromkeys(column for column in layout["sources"].values() if column is not None))
+
+
+def is_spec_layout(layout: Dict[str, Any]) -> bool:
+    """
+    Returns True if a cycle_layout matches the spec's own columns (nothing to conform).
+    """
+    return (
+        not layout["fill"] and not layout["recode"]
+        and all(source == column for source, column in layout["sources"].items())
+    )
+
+
+def survey_weight_columns(name: str) -> List[str]:
+    """
+    Returns the cleaned names of the survey weight columns of a dataset spec.
+    """
+    return [column["target"] for column in DATASET_SPECS[name]["columns"].values() if column.get("survey_weight")]
@@ -5,23 +5,62 @@ This script provides utility functions to manage SQLite database operations
 for the NHANES data analysis pipeline. It includes functions for:
 
 - Creating database connections
-- Defining and creating NHANES-specific tables
-- Saving pandas DataFrames into tables
-- Running SQL queries
+- Defining and creating NHANES-specific tables and their secondary indexes
+- Saving pandas DataFrames into tables (bulk loads: one transaction, executemany,
+  tuned PRAGMAs, indexes built after the rows, upserts on participant_id)
+- Materializing participant_wide, every table joined on participant_id, for
+  dashboard queries (rebuilt or refreshed per table when a source table is loaded)
+- Running SQL queries, with parameters, whole or streamed in chunks (DataFrames or Arrow
+  record batches), and streaming a query's results into a Parquet or CSV file
+- A read-only query service for the dashboard and batch jobs: a thread-safe pool of
+  read-only connections per database, prepared statements cached per connection, and
+  an LRU result cache with a TTL, keyed on the SQL, its parameters and the database's
+  file stamps (so any write makes older results stale)
+- A pluggable analytical backend: the same tables in SQLite or in a columnar store
+  (Parquet files aggregated with Arrow compute), behind one save / run_query / aggregate API
 - Managing database connections safely
 """
 
+import itertools
+import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import queue
 import sqlite3
 import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 # Add project root to sys.path 
 project_root = Path(__file__).parent.parent.resolve()
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from scripts.utils import pretty_path
+from scripts.config import (
+    COLUMNAR_DB_DIR,
+    COLUMNAR_SQL_ENGINE,
+    DATABASE_PATH,
+    DB_BACKEND,
+    FINAL_DATA_DIR,
+    QUERY_CACHE_MAX_ENTRIES,
+    QUERY_CACHE_TTL,
+    SQLITE_CACHED_STATEMENTS,
+    SQLITE_ID_TYPE,
+    SQLITE_POOL_SIZE
+)
+from scripts.dataset_specs import DATASET_SPECS
+from scripts.pipeline_log import get_logger
+from scripts.profiling import profiled, record_write
+from scripts.storage import write_batches
+from scripts.utils import normalize_participant_id, pretty_path
+
+logger = get_logger(__name__)
 
 # Database Connection Utilities
 def create_connection_from_script(relative_path_to_db: str) -> sqlite3.Connection | None:
@@ -38,10 +77,10 @@ def create_connection_from_script(relative_path_to_db: str) -> sqlite3.Connectio
         script_dir = Path(__file__).parent
         db_path = (script_dir / relative_path_to_db).resolve()
         conn = sqlite3.connect(db_path)
-        print(f"Connected to database at: {pretty_path(db_path)}")
+        logger.info(f"Connected to database at: {pretty_path(db_path)}")
         return conn
     except sqlite3.Error as e:
-        print(f"Failed to connect to database: {e}")
+        logger.error(f"Failed to connect to database: {e}")
         return None
 
 def create_connection(db_file: str) -> sqlite3.Connection:
@@ -66,129 +105,485 @@ def close_connection(conn: sqlite3.Connection) -> None:
     if conn:
         conn.commit()
         conn.close()
-        print("Database connection closed.")
-
-
-# NHANES Table Schemas 
-NHANES_TABLE_SCHEMAS = {
-    "demographics": """
-        CREATE TABLE IF NOT EXISTS demographics (
-            participant_id TEXT PRIMARY KEY,
-            gender TEXT,
-            age INTEGER,
-            race_ethnicity TEXT,
-            education_level TEXT,
-            poverty_income_ratio REAL,
-            interview_sample_weight REAL,
-            exam_sample_weight REAL,
-            strata REAL,
-            psu REAL,
-            pir_category TEXT
-        );
-    """,
-    "health_insurance": """
-        CREATE TABLE IF NOT EXISTS health_insurance (
-            participant_id TEXT PRIMARY KEY,
-            has_health_insurance TEXT
-        );
-    """,
-    "sleep": """
-        CREATE TABLE IF NOT EXISTS sleep (
-            participant_id TEXT PRIMARY KEY,
-            sleep_avg_hr REAL,
-            sleep_category TEXT
-        );
-    """,
-    "physical_activity": """
-        CREATE TABLE IF NOT EXISTS physical_activity (
-            participant_id TEXT PRIMARY KEY,
-            activity_level TEXT,
-            sedentary_min_per_week REAL,
-            total_weekly_min REAL
-        );
-    """,
-    "diet": """
-        CREATE TABLE IF NOT EXISTS diet (
-            participant_id TEXT PRIMARY KEY,
-            total_diet_weight REAL,
-            food_item_weight REAL,
-            hei_score REAL,
-            diet_score_category TEXT
-        );
-    """,
-    "bmi": """
-        CREATE TABLE IF NOT EXISTS bmi (
-            participant_id TEXT PRIMARY KEY,
-            bmi REAL,
-            obese INTEGER
-        );
-    """,
-    "bp": """
-        CREATE TABLE IF NOT EXISTS bp (
-            participant_id TEXT PRIMARY KEY,
-            systolic_avg REAL,
-            diastolic_avg REAL,
-            bp_category TEXT
-        );
-    """,
-    "total_cholestrol": """
-        CREATE TABLE IF NOT EXISTS total_cholestrol (
-            participant_id TEXT PRIMARY KEY,
-            total_cholesterol REAL,
-            blood_drawn_sample_weight REAL,
-            cholesterol_category TEXT
-           
-        );
-    """,
-    "glucose": """
-        CREATE TABLE IF NOT EXISTS glucose (
-            participant_id TEXT PRIMARY KEY,
-            fasting_glucose_mg_dl REAL,
-            fasting_subsample_weight REAL,
-            glucose_category TEXT,
-            hypoglycemia_flag INTEGER,
-            hyperglycemia_flag INTEGER,
-            log_fasting_glucose_mg_dl REAL
-        );
-    """,
-    "diabetes": """
-        CREATE TABLE IF NOT EXISTS diabetes (
-            participant_id TEXT PRIMARY KEY,
-            diabetes_dx INTEGER,
-            diabetes_meds INTEGER,
-            diabetes_meds_cat TEXT,
-            diabetes_status TEXT
-        );
-    """,
-    "cardio_vascular": """
-        CREATE TABLE IF NOT EXISTS cardio_vascular (
-            participant_id TEXT PRIMARY KEY,
-            congestive_heart_failure INTEGER,
-            coronary_heart_disease INTEGER,
-            angina INTEGER,
-            heart_attack INTEGER,
-            any_cvd INTEGER
+        logger.info("Database connection closed.")
+
+
+# NHANES Table Schemas (built from the 'table' entries of the dataset specs)
+# Integer participant ids are stored as INTEGER PRIMARY KEY (an alias of the rowid),
+# so joins between tables compare integers instead of strings (see config.SQLITE_ID_TYPE)
+PARTICIPANT_ID_SQL_TYPES = ("INTEGER", "TEXT")
+PARTICIPANT_ID_SQL_TYPE = SQLITE_ID_TYPE
+if PARTICIPANT_ID_SQL_TYPE not in PARTICIPANT_ID_SQL_TYPES:
+    raise ValueError(f"SQLITE_ID_TYPE must be one of {PARTICIPANT_ID_SQL_TYPES}, got '{SQLITE_ID_TYPE}'")
+
+def table_schema(table: Dict[str, Any], id_type: str = PARTICIPANT_ID_SQL_TYPE) -> str:
+    """
+    Builds the CREATE TABLE statement of a table described in a dataset spec.
+
+    Parameters:
+        table (dict): The spec's 'table' entry (name and column -> SQL type).
+        id_type (str): SQL type of participant_id, 'INTEGER' or 'TEXT'.
+
+    Returns:
+        str: The CREATE TABLE IF NOT EXISTS statement.
+    """
+    columns = [f"participant_id {id_type} PRIMARY KEY"]
+    columns += [f"{column} {sql_type}" for column, sql_type in table["columns"].items()]
+    column_sql = ",\n            ".join(columns)
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table['name']} (
+            {column_sql}
         );
     """
+
+
+def index_schemas(table: Dict[str, Any]) -> List[str]:
+    """
+    Builds the CREATE INDEX statements of the secondary indexes of a table in a dataset spec.
+
+    Parameters:
+        table (dict): The spec's 'table' entry ('indexes' lists the columns of each index).
+
+    Returns:
+        list: One CREATE INDEX IF NOT EXISTS statement per index.
+    """
+    return [
+        f"CREATE INDEX IF NOT EXISTS idx_{table['name']}_{'_'.join(columns)} "
+        f"ON {table['name']} ({', '.join(columns)});"
+        for columns in table.get("indexes", [])
+    ]
+
+
+NHANES_TABLES = {
+    spec["table"]["name"]: spec["table"]
+    for spec in DATASET_SPECS.values() if "table" in spec
 }
 
-def create_nhanes_tables(conn: sqlite3.Connection) -> None:
+NHANES_TABLE_SCHEMAS = {name: table_schema(table) for name, table in NHANES_TABLES.items()}
+
+NHANES_TABLE_INDEXES = {name: index_schemas(table) for name, table in NHANES_TABLES.items()}
+
+def create_nhanes_tables(conn: sqlite3.Connection, id_type: str = PARTICIPANT_ID_SQL_TYPE) -> None:
     """
     Creates all necessary NHANES tables in the database if they don’t already exist.
 
     Parameters:
         conn (sqlite3.Connection): The active database connection.
+        id_type (str): SQL type of participant_id, 'INTEGER' (default with Int64 ids) or 'TEXT'.
     """
+    if id_type not in PARTICIPANT_ID_SQL_TYPES:
+        raise ValueError(f"id_type must be one of {PARTICIPANT_ID_SQL_TYPES}, got '{id_type}'")
     cursor = conn.cursor()
-    for table, schema in NHANES_TABLE_SCHEMAS.items():
-        cursor.execute(schema)
-        print(f"Created table '{table}'")
+    for table, definition in NHANES_TABLES.items():
+        cursor.execute(table_schema(definition, id_type))
+        logger.info(f"Created table '{table}'")
     conn.commit()
-    print("All required NHANES tables created successfully.")
+    logger.info("All required NHANES tables created successfully.")
+
+
+def create_table_indexes(conn: sqlite3.Connection, table_name: str) -> None:
+    """
+    Creates the secondary indexes of an NHANES table (see NHANES_TABLE_INDEXES).
+
+    Parameters:
+        conn (sqlite3.Connection): The active database connection.
+        table_name (str): The table to index.
+    """
+    statements = WIDE_TABLE_INDEXES if table_name == WIDE_TABLE else NHANES_TABLE_INDEXES.get(table_name, [])
+    for statement in statements:
+        conn.execute(statement)
+
+
+def drop_table_indexes(conn: sqlite3.Connection, table_name: str) -> None:
+    """
+    Drops the secondary indexes of a table, so a bulk load does not update them row by row.
+    The primary key index is kept: upserts need it.
+
+    Parameters:
+        conn (sqlite3.Connection): The active database connection.
+        table_name (str): The table whose indexes are dropped.
+    """
+    indexes = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL;",
+        (table_name,)
+    ).fetchall()
+    for (index,) in indexes:
+        conn.execute(f"DROP INDEX IF EXISTS {index};")
+
+
+# Bulk loading
+# During a load, WAL lets readers keep querying the previous data, and synchronous=OFF
+# skips the wait for the disk after each write (a crash mid-load can lose the load,
+# which is simply run again). journal_mode stays WAL afterwards; the others are restored.
+BULK_LOAD_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": -65_536,  # KiB, i.e. 64 MiB of page cache
+}
+
+# Rows converted and inserted per executemany call
+BULK_INSERT_CHUNK_ROWS = 50_000
+
+
+@contextmanager
+def bulk_load_settings(conn: sqlite3.Connection) -> Iterator[None]:
+    """
+    Applies BULK_LOAD_PRAGMAS for the duration of the block, then restores the previous
+    synchronous, temp_store and cache_size settings.
+
+    Parameters:
+        conn (sqlite3.Connection): The active database connection (not inside a transaction).
+    """
+    if conn.in_transaction:
+        conn.commit()
+    restore = ["synchronous", "temp_store", "cache_size"]
+    previous = {pragma: conn.execute(f"PRAGMA {pragma};").fetchone()[0] for pragma in restore}
+    for pragma, value in BULK_LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value};")
+    try:
+        yield
+    finally:
+        for pragma, value in previous.items():
+            conn.execute(f"PRAGMA {pragma} = {value};")
+
+
+def _sql_values(series: pd.Series) -> List[Any]:
+    """
+    Converts a column to Python values sqlite3 can bind. NaN is bound as NULL by SQLite,
+    so only nullable extension dtypes (e.g. Int64 ids, pd.NA) need their missing values
+    replaced with None.
+    """
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+        return series.to_numpy(dtype=object, na_value=None).tolist()
+    return series.to_numpy().tolist()
+
+
+def _sql_rows(df: pd.DataFrame) -> Iterator[List[tuple]]:
+    """
+    Yields the rows of a DataFrame as tuples of bindable values, BULK_INSERT_CHUNK_ROWS at a time.
+    """
+    for start in range(0, len(df), BULK_INSERT_CHUNK_ROWS):
+        chunk = df.iloc[start:start + BULK_INSERT_CHUNK_ROWS]
+        yield list(zip(*(_sql_values(chunk[col]) for col in chunk.columns)))
+
+
+def upsert_statement(table_name: str, columns: List[str]) -> str:
+    """
+    Builds an INSERT that updates the existing row of a participant instead of failing.
+
+    Parameters:
+        table_name (str): Target table.
+        columns (list): Inserted columns, including participant_id.
+
+    Returns:
+        str: The INSERT ... ON CONFLICT(participant_id) statement.
+    """
+    placeholders = ", ".join("?" for _ in columns)
+    updates = [f"{col} = excluded.{col}" for col in columns if col != "participant_id"]
+    on_conflict = f"DO UPDATE SET {', '.join(updates)}" if updates else "DO NOTHING"
+    return (f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT(participant_id) {on_conflict};")
+
+
+def _table_columns(conn: sqlite3.Connection, table_name: str) -> Dict[str, str]:
+    """
+    Returns column name -> declared SQL type of a table, in table order.
+    """
+    table_info = conn.execute(f"PRAGMA table_info({table_name});").fetchall()
+    if not table_info:
+        raise ValueError(f"Table '{table_name}' does not exist in the database.")
+    return {col[1]: col[2].upper() for col in table_info}
+
+
+def _table_exists(conn: sqlite3.Connection, table_name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;", (table_name,)
+    ).fetchone() is not None
+
+
+def _sql_participant_ids(ids: pd.Series, sql_type: str) -> pd.Series:
+    """
+    Converts participant ids to the table's key type: integers for an INTEGER key
+    (whatever PARTICIPANT_ID_DTYPE the data was cleaned with), and integer strings
+    such as '130378' (never '130378.0') for a TEXT key.
+    """
+    if sql_type == "INTEGER":
+        return ids if pd.api.types.is_integer_dtype(ids.dtype) else normalize_participant_id(ids, "Int64")
+    if pd.api.types.is_numeric_dtype(ids.dtype):
+        return normalize_participant_id(ids, "str")
+    return ids
+
+
+def bulk_load(
+    conn: sqlite3.Connection,
+    tables: Dict[str, pd.DataFrame],
+    recreate: bool = False,
+    if_exists: str = "append"
+) -> Dict[str, int]:
+    """
+    Loads DataFrames into their NHANES tables in a single transaction.
+
+    The load runs under BULK_LOAD_PRAGMAS. Secondary indexes are dropped first and built
+    again once all rows are in. Rows are inserted with executemany, and the row of a
+    participant already in a table is updated (upsert on participant_id). Participant ids
+    are converted to the table's key type (INTEGER or TEXT). If the database has a
+    participant_wide table, it is brought up to date in the same transaction (see
+    refresh_participant_wide). If anything fails, the transaction is rolled back and
+    no table is changed.
+
+    Parameters:
+        conn (sqlite3.Connection): The active database connection.
+        tables (dict): Table name -> DataFrame. Columns not in the table are left out.
+        recreate (bool): If True, drops and recreates each table before loading it.
+        if_exists (str): 'append' (upsert into the table) or 'fail' (raise if the table
+            already has rows).
+
+    Returns:
+        dict: Table name -> number of rows loaded.
+
+    Raises:
+        ValueError: For an unknown table, no matching columns, or a non-empty table
+            with if_exists='fail'.
+        sqlite3.Error: If SQLite rejects the load (after rolling it back).
+    """
+    if if_exists not in ("append", "fail"):
+        raise ValueError(f"if_exists must be 'append' or 'fail', got '{if_exists}'")
+
+    loaded = {}
+    changed_ids: Dict[str, Optional[List[Any]]] = {}
+    with bulk_load_settings(conn):
+        conn.execute("BEGIN;")
+        try:
+            for table_name, df in tables.items():
+                if recreate:
+                    if table_name not in NHANES_TABLE_SCHEMAS:
+                        raise ValueError(f"No schema found for table '{table_name}'")
+                    # A recreated table keeps its key type
+                    id_type = PARTICIPANT_ID_SQL_TYPE
+                    if _table_exists(conn, table_name):
+                        id_type = _table_columns(conn, table_name).get("participant_id", id_type)
+                    conn.execute(f"DROP TABLE IF EXISTS {table_name};")
+                    conn.execute(table_schema(NHANES_TABLES[table_name], id_type))
+                    logger.info(f"Recreated table '{table_name}'")
+
+                table_columns = _table_columns(conn, table_name)
+                matching_columns = [col for col in df.columns if col in table_columns]
+                if not matching_columns:
+                    raise ValueError(f"None of the DataFrame columns match '{table_name}'")
+                dropped = set(df.columns) - set(matching_columns)
+                if dropped:
+                    logger.warning(f"Dropping columns not in table '{table_name}': {sorted(dropped)}")
+                if if_exists == "fail" and conn.execute(f"SELECT 1 FROM {table_name} LIMIT 1;").fetchone():
+                    raise ValueError(f"Table '{table_name}' already has rows")
+
+                frame = df[matching_columns]
+                if "participant_id" in matching_columns:
+                    frame = frame.assign(participant_id=_sql_participant_ids(
+                        frame["participant_id"], table_columns["participant_id"]))
+
+                drop_table_indexes(conn, table_name)
+                statement = upsert_statement(table_name, matching_columns)
+                for rows in _sql_rows(frame):
+                    conn.executemany(statement, rows)
+                create_table_indexes(conn, table_name)
+                loaded[table_name] = len(df)
+                # Without recreate, only the loaded participants' rows can have changed
+                if "participant_id" in matching_columns and not recreate:
+                    changed_ids[table_name] = _sql_values(frame["participant_id"])
+                else:
+                    changed_ids[table_name] = None
+
+            if _table_exists(conn, WIDE_TABLE):
+                if WIDE_BASE_TABLE in changed_ids:
+                    create_participant_wide(conn)
+                else:
+                    for table_name, ids in changed_ids.items():
+                        if table_name in NHANES_TABLES:
+                            refresh_participant_wide(conn, table_name, ids)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    for table_name, rows in loaded.items():
+        logger.info(f"Inserted {rows} rows into '{table_name}'")
+    return loaded
+
+
+# Materialized wide table
+# participant_wide holds one row per participant of the base table and the columns of
+# every NHANES table (LEFT JOINed on participant_id; column names are unique across the
+# tables), so dashboard group-by queries read one indexed table instead of joining.
+# SQLite has no materialized views: the table is built by create_participant_wide and
+# kept current by bulk_load, which refreshes only the columns of the tables it loads.
+WIDE_TABLE = "participant_wide"
+WIDE_BASE_TABLE = "demographics"
+
+# Rows are stored in this order (participant_id is a UNIQUE column, not the rowid), so a
+# group-by walking the covering indexes below reads neighbouring rows instead of jumping
+# across the table for every participant
+WIDE_CLUSTER_COLUMNS = ["gender", "race_ethnicity", "pir_category"]
+
+WIDE_TABLE_DEFINITION = {
+    "name": WIDE_TABLE,
+    "columns": {
+        column: sql_type
+        for table in NHANES_TABLES.values() for column, sql_type in table["columns"].items()
+    },
+    # Covering indexes for the common dashboard filters and their weighted counts
+    "indexes": [
+        ["gender", "race_ethnicity", "pir_category", "interview_sample_weight"],
+        ["race_ethnicity", "pir_category", "interview_sample_weight"],
+        ["pir_category", "interview_sample_weight"],
+        ["bp_category", "gender", "race_ethnicity", "interview_sample_weight"],
+    ],
+}
+
+WIDE_TABLE_INDEXES = index_schemas(WIDE_TABLE_DEFINITION)
+
+
+def wide_table_schema(id_type: str = PARTICIPANT_ID_SQL_TYPE) -> str:
+    """
+    Builds the CREATE TABLE statement of participant_wide. Unlike the NHANES tables, the
+    rowid is not participant_id, so rows keep the WIDE_CLUSTER_COLUMNS order they are
+    inserted in; a UNIQUE index on participant_id serves the refreshes.
+
+    Parameters:
+        id_type (str): SQL type of participant_id, 'INTEGER' or 'TEXT'.
+
+    Returns:
+        str: The CREATE TABLE IF NOT EXISTS statement.
+    """
+    return table_schema(WIDE_TABLE_DEFINITION, id_type).replace(
+        f"participant_id {id_type} PRIMARY KEY", f"participant_id {id_type} NOT NULL UNIQUE"
+    )
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection) -> Iterator[None]:
+    """
+    Runs the block in a transaction: a new one that is committed (or rolled back), or the
+    caller's if one is already open (e.g. inside bulk_load), left for the caller to end.
+    """
+    if conn.in_transaction:
+        yield
+        return
+    conn.execute("BEGIN;")
+    try:
+        yield
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _wide_sources(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """
+    Returns source table -> its columns in participant_wide, for the tables in the
+    database, base table first.
+    """
+    sources = {}
+    for table_name in [WIDE_BASE_TABLE] + [name for name in NHANES_TABLES if name != WIDE_BASE_TABLE]:
+        if _table_exists(conn, table_name):
+            present = _table_columns(conn, table_name)
+            sources[table_name] = [col for col in NHANES_TABLES[table_name]["columns"] if col in present]
+    return sources
+
+
+def create_participant_wide(conn: sqlite3.Connection) -> int:
+    """
+    Builds (or rebuilds) participant_wide from the NHANES tables in the database: every
+    participant of the base table (demographics) with the columns of all tables, missing
+    tables and rows giving NULLs. Its key has the type of the base table's participant_id.
+
+    Parameters:
+        conn (sqlite3.Connection): The active database connection.
+
+    Returns:
+        int: Number of rows in participant_wide.
+
+    Raises:
+        ValueError: If the base table does not exist.
+    """
+    if not _table_exists(conn, WIDE_BASE_TABLE):
+        raise ValueError(f"Table '{WIDE_BASE_TABLE}' does not exist in the database.")
+
+    with _transaction(conn):
+        id_type = _table_columns(conn, WIDE_BASE_TABLE)["participant_id"]
+        conn.execute(f"DROP TABLE IF EXISTS {WIDE_TABLE};")
+        conn.execute(wide_table_schema(id_type))
+
+        columns, selected, joins = [], [], []
+        for position, (table_name, table_columns) in enumerate(_wide_sources(conn).items()):
+            alias = f"t{position}"
+            columns += table_columns
+            selected += [f"{alias}.{col}" for col in table_columns]
+            if position:
+                joins.append(f"LEFT JOIN {table_name} {alias} ON {alias}.participant_id = t0.participant_id")
+        conn.execute(
+            f"INSERT INTO {WIDE_TABLE} (participant_id, {', '.join(columns)}) "
+            f"SELECT t0.participant_id, {', '.join(selected)} "
+            f"FROM {WIDE_BASE_TABLE} t0 {' '.join(joins)} "
+            f"ORDER BY {', '.join(f't0.{col}' for col in WIDE_CLUSTER_COLUMNS)}, t0.participant_id;"
+        )
+        create_table_indexes(conn, WIDE_TABLE)
+        rows = conn.execute(f"SELECT COUNT(*) FROM {WIDE_TABLE};").fetchone()[0]
+
+    logger.info(f"Built '{WIDE_TABLE}' with {rows} rows")
+    return rows
+
+
+def refresh_participant_wide(
+    conn: sqlite3.Connection,
+    table_name: str,
+    participant_ids: Optional[List[Any]] = None
+) -> None:
+    """
+    Brings participant_wide up to date after one source table changed, by copying that
+    table's columns only (participants missing from it get NULLs). A change to the base
+    table can add or remove participants, so it rebuilds the whole table instead.
+
+    Parameters:
+        conn (sqlite3.Connection): The active database connection.
+        table_name (str): The source table that changed.
+        participant_ids (list, optional): The participants whose rows changed (e.g. the
+            rows just upserted); by default every row is refreshed.
+    """
+    if not _table_exists(conn, WIDE_TABLE) or table_name == WIDE_BASE_TABLE:
+        create_participant_wide(conn)
+        return
+    if table_name not in NHANES_TABLES:
+        raise ValueError(f"Table '{table_name}' is not a source of '{WIDE_TABLE}'")
+
+    columns = list(NHANES_TABLES[table_name]["columns"])
+    if _table_exists(conn, table_name):
+        present = _table_columns(conn, table_name)
+        columns = [col for col in columns if col in present]
+        source = (f"SELECT {', '.join(columns)} FROM {table_name} s "
+                  f"WHERE s.participant_id = {WIDE_TABLE}.participant_id")
+    else:
+        source = f"SELECT {', '.join('NULL' for _ in columns)}"
+    if not columns:
+        return
+    update = f"UPDATE {WIDE_TABLE} SET ({', '.join(columns)}) = ({source})"
+
+    with _transaction(conn):
+        if participant_ids is None:
+            conn.execute(f"{update};")
+            return
+        # The changed ids go through a temporary table so the update is one statement
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS wide_refresh_ids (participant_id PRIMARY KEY);")
+        conn.execute("DELETE FROM temp.wide_refresh_ids;")
+        conn.executemany("INSERT OR IGNORE INTO temp.wide_refresh_ids VALUES (?);",
+                         [(pid,) for pid in participant_ids])
+        conn.execute(f"{update} WHERE participant_id IN (SELECT participant_id FROM temp.wide_refresh_ids);")
+        conn.execute("DELETE FROM temp.wide_refresh_ids;")
 
 
 # DataFrame to SQLite Saver
 
+@profiled("sqlite", name_arg="table_name")
 def save_to_sqlite(
     df: pd.DataFrame,
     conn: sqlite3.Connection,
@@ -197,70 +592,863 @@ def save_to_sqlite(
     recreate: bool = False
 ) -> None:
     """
-    Save a DataFrame to a SQLite table.
+    Save a DataFrame to a SQLite table with a bulk load (see bulk_load).
+
+    Rows of participants already in the table are updated instead of failing on the
+    primary key, and the table's secondary indexes are rebuilt after the rows are in.
+    A failed load is rolled back, logged and raised.
 
     Parameters:
         df: pandas DataFrame
         conn: sqlite3.Connection object
         table_name: Target table name
-        if_exists: Use 'append' or 'fail'
+        if_exists: Use 'append' (upsert on participant_id) or 'fail' (table must be empty)
         recreate: If True, drops and recreates the table before inserting
+
+    Raises:
+        sqlite3.Error: If SQLite rejects the load (e.g. sqlite3.IntegrityError).
+        ValueError: If the table or its columns do not match, or it is not empty with 'fail'.
     """
-    cursor = conn.cursor()
+    try:
+        bulk_load(conn, {table_name: df}, recreate=recreate, if_exists=if_exists)
+    except sqlite3.IntegrityError as e:
+        logger.error(f"Integrity constraint error for '{table_name}': {e}")
+        raise
+    except sqlite3.Error as e:
+        logger.error(f"SQLite error while saving to '{table_name}': {e}")
+        raise
+    except ValueError as e:
+        logger.error(f"Could not save to '{table_name}': {e}")
+        raise
+
+
+# SQL Query Runner
+
+QueryParams = Optional[Union[Sequence[Any], Dict[str, Any]]]
+
+def run_query(
+    conn: sqlite3.Connection,
+    query: str,
+    params: QueryParams = None,
+    chunksize: Optional[int] = None
+) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+    """
+    Runs a SQL query on the connected database and returns the results as a DataFrame,
+    or as an iterator of DataFrame chunks with chunksize (see iter_query).
+
+    Parameters:
+        conn (sqlite3.Connection): The database connection.
+        query (str): The SQL query to run, with ? or :name placeholders for its parameters.
+            Passing values as parameters keeps the SQL text constant, so the connection
+            reuses its prepared statement.
+        params (sequence or dict, optional): Values of the placeholders.
+        chunksize (int, optional): If set, rows per chunk of a streamed result.
 
+    Returns:
+        pd.DataFrame: The query results in tabular form (an iterator of chunks with chunksize).
+    """
+    if chunksize is not None:
+        return iter_query(conn, query, params, chunksize=chunksize)
+    return pd.read_sql_query(query, conn, params=params)
+
+
+# Streaming Query Results
+# Rows fetched per record batch or DataFrame chunk
+QUERY_BATCH_ROWS = 50_000
+
+
+def _record_batch(columns: List[tuple], schema: pa.Schema) -> pa.RecordBatch:
+    # Converted with inferred types, then cast: a safe cast refuses to truncate values
+    # (converting 1.5 straight to int64 would silently give 1)
     try:
-        # Recreate the table if needed
-        if recreate:
-            if table_name in NHANES_TABLE_SCHEMAS:
-                cursor.execute(f"DROP TABLE IF EXISTS {table_name};")
-                cursor.execute(NHANES_TABLE_SCHEMAS[table_name])
-                conn.commit()
-                print(f"Recreated table '{table_name}'")
-            else:
-                raise ValueError(f"No schema found for table '{table_name}'")
+        arrays = []
+        for values, field in zip(columns, schema):
+            array = pa.array(values)
+            arrays.append(array if array.type == field.type else array.cast(field.type))
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise TypeError(f"A query column changed type between batches ({e}); pass an explicit schema") from e
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
 
-        # Check the structure of the table
-        cursor.execute(f"PRAGMA table_info({table_name});")
-        table_info = cursor.fetchall()
 
-        if not table_info:
-            raise ValueError(f"Table '{table_name}' does not exist in the database.")
+def iter_query_batches(
+    conn: sqlite3.Connection,
+    query: str,
+    params: QueryParams = None,
+    batch_size: int = QUERY_BATCH_ROWS,
+    schema: Optional[pa.Schema] = None
+) -> Iterator[pa.RecordBatch]:
+    """
+    Runs a SQL query and yields its results as Arrow record batches of up to batch_size
+    rows, so only one batch of the result is in memory at a time.
 
-        table_columns = [col[1] for col in table_info]
+    Column types are inferred from the first rows (SQLite does not report the types of
+    result columns); rows whose columns are all NULL so far are held back until every
+    column has a type. At least one batch is yielded, empty for an empty result.
 
-        matching_columns = [col for col in df.columns if col in table_columns]
-        if not matching_columns:
-            raise ValueError(f"None of the DataFrame columns match '{table_name}'")
+    Parameters:
+        conn (sqlite3.Connection): The database connection.
+        query (str): The SQL query to run, with ? or :name placeholders for its parameters.
+        params (sequence or dict, optional): Values of the placeholders.
+        batch_size (int): Rows per batch.
+        schema (pa.Schema, optional): Types of the result columns, instead of inferring them.
 
-        # Drop extra columns from the DataFrame that are not needed
-        filtered_df = df[matching_columns]
-        dropped = set(df.columns) - set(filtered_df.columns)
-        if dropped:
-            print(f"Dropping columns not in table '{table_name}': {sorted(dropped)}")
+    Yields:
+        pa.RecordBatch: The next rows of the result.
 
-        # Save to database
-        filtered_df.to_sql(table_name, conn, if_exists=if_exists, index=False)
-        print(f"Inserted {len(filtered_df)} rows into '{table_name}'")
+    Raises:
+        TypeError: If a column's values no longer fit the inferred type (e.g. an expression
+            returning integers, then fractions); pass a schema for such queries.
+    """
+    cursor = conn.execute(query, params if params is not None else ())
+    try:
+        names = [column[0] for column in cursor.description or []]
+        types: List[Optional[pa.DataType]] = list(schema.types) if schema is not None else [None] * len(names)
+        held: List[List[tuple]] = []
+        yielded = False
+        for rows in iter(lambda: cursor.fetchmany(batch_size), []):
+            columns = list(zip(*rows))
+            if schema is None:
+                for position, values in enumerate(columns):
+                    if types[position] is None:
+                        inferred = pa.array(values).type
+                        types[position] = None if pa.types.is_null(inferred) else inferred
+                if None in types:
+                    held.append(columns)
+                    continue
+                schema = pa.schema([pa.field(name, arrow_type) for name, arrow_type in zip(names, types)])
+            for batch_columns in held + [columns]:
+                yield _record_batch(batch_columns, schema)
+                yielded = True
+            held = []
 
-    except sqlite3.IntegrityError as e:
-        print(f"Integrity constraint error for '{table_name}': {e}")
-    except sqlite3.Error as e:
-        print(f"SQLite error while saving to '{table_name}': {e}")
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+        if schema is None:
+            # Columns that were NULL in every row keep Arrow's null type
+            schema = pa.schema([pa.field(name, arrow_type or pa.null()) for name, arrow_type in zip(names, types)])
+        for batch_columns in held:
+            yield _record_batch(batch_columns, schema)
+            yielded = True
+        if not yielded:
+            yield pa.RecordBatch.from_pylist([], schema=schema)
+    finally:
+        cursor.close()
 
 
-# SQL Query Runner
+def iter_query(
+    conn: sqlite3.Connection,
+    query: str,
+    params: QueryParams = None,
+    chunksize: int = QUERY_BATCH_ROWS
+) -> Iterator[pd.DataFrame]:
+    """
+    Runs a SQL query and yields its results as DataFrames of up to chunksize rows.
+
+    Every chunk has the same dtypes, matching those run_query gives for the whole result
+    (e.g. an integer column with NULLs is float64 in every chunk, not only some).
+
+    Parameters:
+        conn (sqlite3.Connection): The database connection.
+        query (str): The SQL query to run, with ? or :name placeholders for its parameters.
+        params (sequence or dict, optional): Values of the placeholders.
+        chunksize (int): Rows per chunk.
 
-def run_query(conn: sqlite3.Connection, query: str) -> pd.DataFrame:
+    Yields:
+        pd.DataFrame: The next rows of the result.
     """
-    Runs a SQL query on the connected database and returns the results as a DataFrame.
+    for batch in iter_query_batches(conn, query, params, batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def export_query(
+    conn: sqlite3.Connection,
+    query: str,
+    file_name: str,
+    params: QueryParams = None,
+    storage_format: Optional[str] = None,
+    output_dir: Union[str, Path] = FINAL_DATA_DIR,
+    batch_size: int = QUERY_BATCH_ROWS
+) -> Path:
+    """
+    Streams the results of a SQL query into a Parquet or CSV file, one record batch at
+    a time, so memory stays bounded by batch_size rows whatever the result size.
 
     Parameters:
         conn (sqlite3.Connection): The database connection.
-        query (str): The SQL query to run.
+        query (str): The SQL query to run, with ? or :name placeholders for its parameters.
+        file_name (str): Output file name; its extension follows the storage format.
+        params (sequence or dict, optional): Values of the placeholders.
+        storage_format (str, optional): 'parquet' or 'csv'. Defaults to config.STORAGE_FORMAT.
+        output_dir (str or Path): Output folder (FINAL_DATA_DIR by default).
+        batch_size (int): Rows fetched and written at a time.
+
+    Returns:
+        Path: The file that was written.
+    """
+    batches = iter_query_batches(conn, query, params, batch_size=batch_size)
+    first = next(batches)
+    rows = 0
+
+    def counted(batches: Iterable[pa.RecordBatch]) -> Iterator[pa.RecordBatch]:
+        nonlocal rows
+        for batch in batches:
+            rows += batch.num_rows
+            yield batch
+
+    out_path = write_batches(counted(itertools.chain([first], batches)), Path(output_dir) / file_name,
+                             first.schema, storage_format)
+    logger.info(f"Exported {rows} rows to {pretty_path(out_path)}")
+    return out_path
+
+
+# Read-only Query Service
+# Settings of the pooled read-only connections; query_only makes any write fail
+# even if the file could be opened for writing
+READ_ONLY_PRAGMAS = {
+    "query_only": "ON",
+    "temp_store": "MEMORY",
+    "cache_size": -16_384,  # KiB, i.e. 16 MiB of page cache per connection
+    "mmap_size": 268_435_456,  # read pages through a 256 MiB memory map
+}
+
+
+def connect_read_only(
+    db_path: Union[str, Path] = DATABASE_PATH,
+    cached_statements: int = SQLITE_CACHED_STATEMENTS
+) -> sqlite3.Connection:
+    """
+    Opens a read-only connection (a mode=ro URI) that can be handed between threads.
+
+    Parameters:
+        db_path (str or Path): The database file. It must exist.
+        cached_statements (int): Prepared statements kept per connection, reused when the
+            same SQL text runs again.
 
     Returns:
-        pd.DataFrame: The query results in tabular form.
+        sqlite3.Connection: The read-only connection.
+    """
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=cached_statements)
+    for pragma, value in READ_ONLY_PRAGMAS.items():
+        conn.execute(f"PRAGMA {pragma} = {value};")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of read-only connections to one database file.
+
+    Connections are opened on demand, up to `size`, and reused by later queries; a thread
+    asking for one while all are in use waits until one is returned.
+    """
+    def __init__(
+        self,
+        db_path: Union[str, Path] = DATABASE_PATH,
+        size: int = SQLITE_POOL_SIZE,
+        timeout: float = 30.0,
+        cached_statements: int = SQLITE_CACHED_STATEMENTS
+    ):
+        """
+        Parameters:
+            db_path (str or Path): The database file.
+            size (int): Most connections open at once.
+            timeout (float): Seconds to wait for a free connection before raising TimeoutError.
+            cached_statements (int): Prepared statements cached per connection.
+        """
+        self.db_path = Path(db_path).resolve()
+        if not self.db_path.exists():
+            raise FileNotFoundError(f"Database not found: {pretty_path(self.db_path)}")
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError(f"Connection pool of {pretty_path(self.db_path)} is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                conn = connect_read_only(self.db_path, self.cached_statements)
+            except BaseException:
+                with self._lock:
+                    self._opened -= 1
+                raise
+            logger.debug(f"Opened read-only connection {self._opened}/{self.size} to {pretty_path(self.db_path)}")
+            return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No free connection to {pretty_path(self.db_path)} after {self.timeout}s")
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Lends a connection for the duration of the block and returns it to the pool.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self) -> None:
+        """
+        Closes the idle connections; connections still lent out are closed when returned.
+        """
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def database_stamp(db_path: Union[str, Path]) -> Tuple[Optional[Tuple[int, int]], ...]:
+    """
+    Returns the modification time and size of the database file and of its write-ahead
+    log. In WAL mode commits only append to the -wal file, so both are needed to tell
+    that the database changed.
+    """
+    stamps = []
+    for suffix in ("", "-wal"):
+        try:
+            stat = os.stat(f"{db_path}{suffix}")
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamps.append(None)
+    return tuple(stamps)
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results whose entries expire after `ttl` seconds.
+    """
+    def __init__(self, max_entries: int = QUERY_CACHE_MAX_ENTRIES, ttl: float = QUERY_CACHE_TTL):
+        """
+        Parameters:
+            max_entries (int): Most results kept; the least recently used is evicted first.
+            ttl (float): Seconds a result stays valid. 0 turns the cache off.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, pd.DataFrame]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        """
+        Returns the cached result of a key, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, result: pd.DataFrame) -> None:
+        """
+        Stores a result, evicting the least recently used ones past max_entries.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of entries, hits and misses.
+        """
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_pools: Dict[Path, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+query_cache = QueryCache()
+
+
+def get_connection_pool(db_path: Union[str, Path] = DATABASE_PATH) -> ConnectionPool:
+    """
+    Returns the shared connection pool of a database file, creating it on first use.
+    """
+    path = Path(db_path).resolve()
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ConnectionPool(path)
+        return pool
+
+
+def close_connection_pools() -> None:
+    """
+    Closes every shared connection pool (e.g. before replacing the database file).
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def _params_key(params: QueryParams) -> Hashable:
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return tuple(sorted(params.items()))
+    return tuple(params)
+
+
+def query(
+    sql: str,
+    params: QueryParams = None,
+    db_path: Union[str, Path] = DATABASE_PATH,
+    use_cache: bool = True
+) -> pd.DataFrame:
+    """
+    Runs a read-only query on a pooled connection, returning a cached result when the same
+    SQL and parameters already ran on the same version of the database.
+
+    Safe to call from many threads (e.g. the Streamlit dashboard's sessions). Results are
+    cached in query_cache for QUERY_CACHE_TTL seconds; a write to the database changes its
+    file stamps (see database_stamp), so results read before it are not reused.
+
+    Parameters:
+        sql (str): The SQL query, with ? or :name placeholders for its parameters.
+        params (sequence or dict, optional): Values of the placeholders.
+        db_path (str or Path): The database file (DATABASE_PATH by default).
+        use_cache (bool): If False, always runs the query (the result is not cached).
+
+    Returns:
+        pd.DataFrame: The query results; a copy the caller is free to modify.
+    """
+    path = Path(db_path).resolve()
+    use_cache = use_cache and query_cache.enabled
+    if use_cache:
+        # Stamped before running, so a write during the query leaves the entry stale
+        key = (str(path), database_stamp(path), sql, _params_key(params))
+        cached = query_cache.get(key)
+        if cached is not None:
+            return cached.copy()
+
+    with get_connection_pool(path).connection() as conn:
+        result = run_query(conn, sql, params)
+    if use_cache:
+        query_cache.put(key, result)
+        return result.copy()
+    return result
+
+
+def clear_query_cache() -> None:
+    """
+    Empties the query result cache.
+    """
+    query_cache.clear()
+
+
+# Analytical Backends
+# The same tables can live in SQLite (row-oriented) or in a columnar store: one Parquet
+# file per table, read column by column and aggregated with Arrow compute. Both backends
+# share save / run_query / aggregate, so analyses can switch with DB_BACKEND.
+SQL_TO_ARROW_TYPES = {"INTEGER": pa.int64(), "REAL": pa.float64(), "TEXT": pa.string()}
+
+# Aggregations of aggregate(): with a weight, 'sum' and 'mean' are weighted
+AGGREGATE_FUNCTIONS = ("sum", "mean", "min", "max")
+
+COLUMN_TABLES = {column: name for name, table in NHANES_TABLES.items() for column in table["columns"]}
+
+Aggregations = Dict[str, Tuple[str, str]]
+
+
+def arrow_table_schema(table_name: str, id_type: str = PARTICIPANT_ID_SQL_TYPE) -> pa.Schema:
+    """
+    Returns the Arrow schema of an NHANES table: participant_id, then the spec's columns
+    with their SQL types mapped by SQL_TO_ARROW_TYPES.
+    """
+    table = NHANES_TABLES[table_name]
+    return pa.schema(
+        [pa.field("participant_id", SQL_TO_ARROW_TYPES[id_type], nullable=False)]
+        + [pa.field(column, SQL_TO_ARROW_TYPES[sql_type]) for column, sql_type in table["columns"].items()]
+    )
+
+
+def _aggregate_plan(
+    by: List[str],
+    values: Aggregations,
+    weight: Optional[str],
+    filters: Optional[Dict[str, Any]]
+) -> Dict[str, List[str]]:
+    """
+    Checks an aggregation and returns the tables it reads: table -> its columns used.
+    """
+    for name, (column, function) in values.items():
+        if function not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Aggregation of '{name}' must be one of {AGGREGATE_FUNCTIONS}, got '{function}'")
+    columns = by + [column for column, _ in values.values()] + ([weight] if weight else []) + list(filters or {})
+    tables: Dict[str, List[str]] = {}
+    for column in dict.fromkeys(columns):
+        if column not in COLUMN_TABLES:
+            raise ValueError(f"Column '{column}' is not in any NHANES table")
+        tables.setdefault(COLUMN_TABLES[column], []).append(column)
+    return tables
+
+
+def aggregate_sql(
+    by: List[str],
+    values: Aggregations,
+    weight: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None
+) -> Tuple[str, List[Any]]:
+    """
+    Builds the SQLite query of an aggregation (see SQLiteBackend.aggregate).
+
+    Returns:
+        tuple: The SQL text and its parameters (the filter values).
+    """
+    tables = _aggregate_plan(by, values, weight, filters)
+    names = list(tables)
+    from_sql = " ".join([names[0]] + [f"JOIN {name} USING (participant_id)" for name in names[1:]])
+
+    selected = by + ["COUNT(*) AS n"] + ([f"SUM({weight}) AS weighted_n"] if weight else [])
+    for name, (column, function) in values.items():
+        if function == "mean":
+            expression = f"SUM({weight} * {column}) / SUM({weight})" if weight else f"AVG({column})"
+        elif function == "sum":
+            expression = f"SUM({weight} * {column})" if weight else f"SUM({column})"
+        else:
+            expression = f"{function.upper()}({column})"
+        selected.append(f"{expression} AS {name}")
+
+    # Rows missing any column used are left out, as dropna() does before weighted statistics
+    conditions = [f"{column} IS NOT NULL" for columns in tables.values() for column in columns]
+    conditions += [f"{column} = ?" for column in filters or {}]
+    sql = f"SELECT {', '.join(selected)} FROM {from_sql} WHERE {' AND '.join(conditions)}"
+    if by:
+        sql += f" GROUP BY {', '.join(by)} ORDER BY {', '.join(by)}"
+    return sql, list((filters or {}).values())
+
+
+class SQLiteBackend:
+    """
+    The NHANES tables in a SQLite database (bulk_load, run_query and aggregations in SQL).
+    """
+    name = "sqlite"
+
+    def __init__(self, db_path: Union[str, Path] = DATABASE_PATH):
+        """
+        Parameters:
+            db_path (str or Path): The database file; missing NHANES tables are created.
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        for schema in NHANES_TABLE_SCHEMAS.values():
+            self.conn.execute(schema)
+        self.conn.commit()
+
+    def save(self, df: pd.DataFrame, table_name: str, if_exists: str = "append", recreate: bool = False) -> int:
+        """
+        Loads a DataFrame into a table like save_to_sqlite (see bulk_load).
+
+        Returns:
+            int: Number of rows loaded.
+        """
+        return bulk_load(self.conn, {table_name: df}, recreate=recreate, if_exists=if_exists)[table_name]
+
+    def run_query(self, query: str, params: QueryParams = None) -> pd.DataFrame:
+        """
+        Runs a SQL query (see run_query).
+        """
+        return run_query(self.conn, query, params)
+
+    def aggregate(
+        self,
+        by: List[str],
+        values: Aggregations,
+        weight: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """
+        Groups participants by columns of any NHANES tables and aggregates other columns.
+
+        Tables are joined on participant_id; only rows with every column used are kept.
+
+        Parameters:
+            by (list): Group-by columns, e.g. ['gender', 'race_ethnicity'].
+            values (dict): Output column -> (column, 'sum' | 'mean' | 'min' | 'max').
+            weight (str, optional): Survey weight column; 'sum' and 'mean' are then weighted.
+            filters (dict, optional): Column -> value the rows must have.
+
+        Returns:
+            pd.DataFrame: The groups, sorted, with n (rows), weighted_n (sum of the weights,
+                if weighted) and the aggregated values.
+        """
+        sql, params = aggregate_sql(by, values, weight, filters)
+        return run_query(self.conn, sql, params)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class ColumnarBackend:
+    """
+    The NHANES tables as Parquet files (one per table, in COLUMNAR_DB_DIR), read through
+    memory maps and aggregated with Arrow compute. Queries read only the columns they use.
+
+    SQL (run_query) runs on DuckDB or polars, whichever is installed (COLUMNAR_SQL_ENGINE);
+    save and aggregate need only pyarrow.
+    """
+    name = "columnar"
+
+    def __init__(self, root: Union[str, Path] = COLUMNAR_DB_DIR, sql_engine: str = COLUMNAR_SQL_ENGINE):
+        """
+        Parameters:
+            root (str or Path): Folder of the table files.
+            sql_engine (str): 'duckdb', 'polars' or 'auto'.
+        """
+        self.root = Path(root)
+        self.sql_engine = sql_engine
+
+    def table_path(self, table_name: str) -> Path:
+        return self.root / f"{table_name}.parquet"
+
+    def tables(self) -> List[str]:
+        """
+        Returns the NHANES tables stored so far.
+        """
+        return [name for name in NHANES_TABLES if self.table_path(name).exists()]
+
+    def read_table(self, table_name: str, columns: Optional[List[str]] = None) -> pa.Table:
+        """
+        Reads (some columns of) a stored table.
+        """
+        path = self.table_path(table_name)
+        if not path.exists():
+            raise ValueError(f"Table '{table_name}' does not exist in {pretty_path(self.root)}")
+        return pq.read_table(path, columns=columns, memory_map=True)
+
+    def _write(self, table_name: str, table: pa.Table) -> None:
+        # Written next to the table, then swapped in, so readers never see a partial file
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.table_path(table_name)
+        tmp_path = path.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        record_write(path)
+
+    def save(self, df: pd.DataFrame, table_name: str, if_exists: str = "append", recreate: bool = False) -> int:
+        """
+        Saves a DataFrame into a table with the semantics of bulk_load: columns not in the
+        table are left out, and rows of participants already stored are updated (columns
+        not in the DataFrame keep their stored values).
+
+        Parameters:
+            df (pd.DataFrame): The rows to save.
+            table_name (str): An NHANES table.
+            if_exists (str): 'append' (upsert) or 'fail' (raise if the table has rows).
+            recreate (bool): If True, replaces the table's rows with the DataFrame's.
+
+        Returns:
+            int: Number of rows saved.
+        """
+        if if_exists not in ("append", "fail"):
+            raise ValueError(f"if_exists must be 'append' or 'fail', got '{if_exists}'")
+        if table_name not in NHANES_TABLES:
+            raise ValueError(f"No schema found for table '{table_name}'")
+
+        existing = None if recreate or not self.table_path(table_name).exists() else self.read_table(table_name)
+        id_type = "TEXT" if existing is not None and pa.types.is_string(existing.schema.field("participant_id").type) \
+            else PARTICIPANT_ID_SQL_TYPE
+        schema = arrow_table_schema(table_name, id_type)
+        if if_exists == "fail" and existing is not None and existing.num_rows:
+            raise ValueError(f"Table '{table_name}' already has rows")
+
+        matching = [col for col in df.columns if col in schema.names]
+        if "participant_id" not in matching:
+            raise ValueError(f"DataFrame has no participant_id column for '{table_name}'")
+        frame = df[matching].assign(participant_id=_sql_participant_ids(df["participant_id"], id_type))
+        # As with upserts, the last row of a participant wins
+        frame = frame.drop_duplicates("participant_id", keep="last")
+        # Numbers saved into a TEXT column are stored as their text, as SQLite does
+        for col in matching:
+            if col != "participant_id" and pa.types.is_string(schema.field(col).type) \
+                    and pd.api.types.is_numeric_dtype(frame[col].dtype):
+                frame[col] = frame[col].astype(str).where(frame[col].notna(), None)
+        new = pa.Table.from_pandas(frame, preserve_index=False).cast(
+            pa.schema([schema.field(col) for col in matching])
+        )
+
+        missing = [name for name in schema.names if name not in matching]
+        if existing is not None:
+            if missing:
+                new = new.join(existing.select(["participant_id"] + missing), "participant_id",
+                               join_type="left outer")
+            kept = existing.filter(pc.invert(pc.is_in(existing["participant_id"], value_set=new["participant_id"])))
+            table = pa.concat_tables([kept.cast(schema), new.select(schema.names).cast(schema)])
+        else:
+            for name in missing:
+                new = new.append_column(schema.field(name), pa.nulls(new.num_rows, schema.field(name).type))
+            table = new.select(schema.names).cast(schema)
+
+        self._write(table_name, table.sort_by("participant_id"))
+        return len(frame)
+
+    def materialize_from_sqlite(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        """
+        Copies every NHANES table of a SQLite database into the columnar store, streaming
+        each one in record batches (see iter_query_batches).
+
+        Returns:
+            dict: Table name -> rows copied.
+        """
+        copied = {}
+        for table_name in NHANES_TABLES:
+            if not _table_exists(conn, table_name):
+                continue
+            id_type = _table_columns(conn, table_name)["participant_id"]
+            schema = arrow_table_schema(table_name, id_type)
+            batches = iter_query_batches(
+                conn, f"SELECT {', '.join(schema.names)} FROM {table_name} ORDER BY participant_id",
+                schema=schema
+            )
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp_path = write_batches(batches, self.table_path(table_name).with_suffix(".tmp.parquet"),
+                                     schema, "parquet")
+            os.replace(tmp_path, self.table_path(table_name))
+            copied[table_name] = pq.ParquetFile(self.table_path(table_name)).metadata.num_rows
+            logger.info(f"Materialized {copied[table_name]} rows of '{table_name}' in {pretty_path(self.root)}")
+        return copied
+
+    def _sql_engine(self) -> str:
+        engines = ["duckdb", "polars"] if self.sql_engine == "auto" else [self.sql_engine]
+        for engine in engines:
+            try:
+                __import__(engine)
+                return engine
+            except ImportError:
+                continue
+        raise ImportError(f"SQL on the columnar tables needs {' or '.join(engines)}; install it, "
+                          f"or use aggregate(), which needs only pyarrow")
+
+    def run_query(self, query: str, params: QueryParams = None) -> pd.DataFrame:
+        """
+        Runs a SQL query over the stored tables, referenced by their table names.
+
+        Parameters:
+            query (str): The SQL query (? placeholders with DuckDB only).
+            params (sequence, optional): Values of the placeholders.
+
+        Returns:
+            pd.DataFrame: The query results in tabular form.
+        """
+        engine = self._sql_engine()
+        paths = {name: self.table_path(name) for name in self.tables()}
+        if engine == "duckdb":
+            import duckdb
+            with duckdb.connect() as conn:
+                for name, path in paths.items():
+                    conn.execute(f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{path.as_posix()}')")
+                return conn.execute(query, params or []).df()
+
+        import polars as pl
+        if params:
+            raise ValueError("Query parameters need the duckdb engine; polars SQL takes literal values")
+        context = pl.SQLContext(frames={name: pl.scan_parquet(path) for name, path in paths.items()})
+        return context.execute(query, eager=True).to_pandas()
+
+    def aggregate(
+        self,
+        by: List[str],
+        values: Aggregations,
+        weight: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """
+        Same aggregation as SQLiteBackend.aggregate, computed with Arrow compute on the
+        columns it uses only.
+        """
+        tables = _aggregate_plan(by, values, weight, filters)
+        joined = None
+        for table_name, columns in tables.items():
+            table = self.read_table(table_name, ["participant_id"] + columns)
+            joined = table if joined is None else joined.join(table, "participant_id", join_type="inner")
+
+        mask = None
+        conditions = [pc.is_valid(joined[column]) for columns in tables.values() for column in columns]
+        conditions += [pc.equal(joined[column], value) for column, value in (filters or {}).items()]
+        for condition in conditions:
+            mask = condition if mask is None else pc.and_(mask, condition)
+        joined = joined.filter(mask)
+
+        aggregations = [([], "count_all")] + ([(weight, "sum")] if weight else [])
+        outputs = {"n": "count_all", **({"weighted_n": f"{weight}_sum"} if weight else {})}
+        for name, (column, function) in values.items():
+            if function in ("sum", "mean") and weight:
+                product = f"__{name}_weighted"
+                joined = joined.append_column(product, pc.multiply(joined[column], joined[weight]))
+                aggregation = (product, "sum")
+            else:
+                aggregation = (column, function)
+            if aggregation not in aggregations:
+                aggregations.append(aggregation)
+            outputs[name] = "_".join(aggregation)
+        grouped = joined.group_by(by).aggregate(aggregations)
+
+        result = {column: grouped[column] for column in by}
+        for name, column in outputs.items():
+            result[name] = grouped[column]
+            if name in values and values[name][1] == "mean" and weight:
+                result[name] = pc.divide(grouped[column], grouped[f"{weight}_sum"])
+        table = pa.table(result)
+        if by:
+            table = table.sort_by([(column, "ascending") for column in by])
+        return table.to_pandas()
+
+
+BACKENDS = {"sqlite": SQLiteBackend, "columnar": ColumnarBackend}
+
+
+def get_backend(name: str = DB_BACKEND, **kwargs: Any) -> Union[SQLiteBackend, ColumnarBackend]:
+    """
+    Returns the storage backend of the NHANES tables (DB_BACKEND by default).
+
+    Parameters:
+        name (str): 'sqlite' or 'columnar'.
+        **kwargs: Passed to the backend (db_path for SQLite, root and sql_engine for columnar).
     """
-    return pd.read_sql_query(query, conn)
+    if name not in BACKENDS:
+        raise ValueError(f"Backend must be one of {list(BACKENDS)}, got '{name}'")
+    return BACKENDS[name](**kwargs)
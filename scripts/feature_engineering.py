@@ -10,12 +10,28 @@ Key functionalities include:
 - Categorizing poverty-income ratio, physical activity, sleep, BMI, blood pressure, cholesterol, and glucose levels.
 - Creating flags and labels for diabetes and cardiovascular disease status.
 - Adding binary indicators and categorical labels to improve data usability for analysis.
+- Vectorized, column-level versions of the categorizers driven by a threshold table
+  (THRESHOLD_TABLE), returning ordered categoricals.
+- Applying all of the above to the cleaned datasets in one step (engineer_features).
 
 """
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
 
 import pandas as pd
 import numpy as np
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
+
+from scripts.pipeline_cache import PipelineCache, hash_dataframe, hash_source, make_key
+from scripts.profiling import profile_stage
+from scripts.pipeline_log import get_logger
+
+logger = get_logger(__name__)
 
 # 1. Categorizes the poverty-income ratio
 def get_pir_category(pir: Optional[float]) -> str:
@@ -241,13 +257,13 @@ def engineer_diq_features(df: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: DataFrame with added 'diabetes_meds_cat' and 'diabetes_status' columns.
     """
     if df.empty:
-        print("DIQ features: Input dataframe empty. Skipping...")
+        logger.warning("DIQ features: Input dataframe empty. Skipping...")
         return df
 
     if not {'diabetes_dx', 'diabetes_meds'}.issubset(df.columns):
         raise KeyError("Input DataFrame must contain 'diabetes_dx' and 'diabetes_meds' columns.")
 
-    df['diabetes_meds_cat'] = df['diabetes_meds'].apply(label_meds)
+    df['diabetes_meds_cat'] = label_meds_column(df['diabetes_meds'])
 
     dx_1 = df['diabetes_dx'].fillna(0) == 1
     meds_1 = df['diabetes_meds'].fillna(0) == 1
@@ -270,7 +286,7 @@ def engineer_mcq_features(df: pd.DataFrame) -> pd.DataFrame:
         pd.DataFrame: DataFrame with added 'any_cvd' column.
     """
     if df.empty:
-        print("MCQ features: Input dataframe empty. Skipping...")
+        logger.warning("MCQ features: Input dataframe empty. Skipping...")
         return df
 
     # Exclude non-condition columns if present
@@ -283,3 +299,244 @@ def engineer_mcq_features(df: pd.DataFrame) -> pd.DataFrame:
     df['any_cvd'] = cond_df.max(axis=1)
 
     return df
+
+
+# 13. Glucose Feature Engineering
+def engineer_glu_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Engineer glucose category, hypo/hyperglycemia flags and log glucose.
+
+    Args:
+        df (pd.DataFrame): Input dataframe containing 'fasting_glucose_mg_dl'.
+
+    Returns:
+        pd.DataFrame: Copy of the dataframe with added glucose feature columns.
+    """
+    df_glu = df.copy()
+
+    # Add glucose category
+    df_glu['glucose_category'] = categorize_column("glucose_category", df_glu['fasting_glucose_mg_dl'])
+
+    # Compute flags only once
+    flags_df = glucose_flag_columns(df_glu['fasting_glucose_mg_dl'])
+
+    # Drop existing flag columns if they exist (to avoid duplicates)
+    df_glu = df_glu.drop(columns=[col for col in df_glu.columns if col in ['hypoglycemia_flag', 'hyperglycemia_flag']], errors='ignore')
+
+    df_glu = pd.concat([df_glu, flags_df], axis=1)
+
+    # Add log column
+    df_glu['log_fasting_glucose_mg_dl'] = np.log(df_glu['fasting_glucose_mg_dl'].clip(lower=1))
+    return df_glu
+
+
+# 14. Threshold table for the vectorized categorizers
+# Each input column is cut at its edges: a value moves past an edge when it is >= edge,
+# or > edge for edges listed in 'right_closed'. 'levels' maps each band of an input to a
+# label position (default: band number). With several inputs the highest level wins,
+# so e.g. blood pressure takes the worse of the systolic and diastolic category.
+# Rows with a missing input get the 'missing' label.
+THRESHOLD_TABLE: Dict[str, Dict[str, Any]] = {
+    "pir_category": {
+        "inputs": [{"edges": [1, 2, 5]}],
+        "labels": ["Low", "Mid", "High", "Very High"],
+        "missing": "Missing",
+    },
+    "activity_level": {
+        "inputs": [{"edges": [150, 300]}],
+        "labels": ["Low active", "Moderately active", "Highly active"],
+        "missing": "Missing",
+    },
+    "sleep_category": {
+        "inputs": [{"edges": [6, 9], "right_closed": [9]}],
+        "labels": ["Short Sleep", "Normal Sleep", "Long Sleep"],
+        "missing": "Missing",
+    },
+    "bmi_category": {
+        "inputs": [{"edges": [18.5, 25, 30]}],
+        "labels": ["Underweight", "Normal", "Overweight", "Obese"],
+        "missing": "Missing",
+    },
+    "bp_category": {
+        "inputs": [
+            {"edges": [120, 130, 140, 180]},                # systolic
+            {"edges": [80, 90, 120], "levels": [0, 2, 3, 4]},  # diastolic
+        ],
+        "labels": ["Normal", "Elevated", "Hypertension Stage 1", "Hypertension Stage 2", "Hypertensive Crisis"],
+        "missing": "Unknown",
+    },
+    "cholesterol_category": {
+        "inputs": [{"edges": [200, 240]}],
+        "labels": ["Desirable", "Borderline high", "High"],
+        "missing": "Missing",
+    },
+    "glucose_category": {
+        "inputs": [{"edges": [100, 126]}],
+        "labels": ["Normal", "Prediabetes", "Diabetes"],
+        "missing": "Missing",
+    },
+}
+
+# Scalar categorizer that each threshold table entry reproduces
+SCALAR_CATEGORIZERS: Dict[str, Callable[..., str]] = {
+    "pir_category": get_pir_category,
+    "activity_level": categorize_activity_level,
+    "sleep_category": categorize_sleep,
+    "bmi_category": categorize_bmi,
+    "bp_category": categorize_bp,
+    "cholesterol_category": cholesterol_category,
+    "glucose_category": glucose_category,
+}
+
+MEDS_LABELS = ["Not taking meds", "Taking meds", "Unknown"]
+
+
+# 15. Vectorized categorization from the threshold table
+def categorize_column(name: str, *values: pd.Series) -> pd.Series:
+    """
+    Categorize whole columns with a THRESHOLD_TABLE entry, giving the same labels as
+    the matching scalar function (e.g. 'bp_category' matches categorize_bp).
+
+    Args:
+        name (str): Key of the THRESHOLD_TABLE entry.
+        *values (pd.Series): One column per entry input, in order (e.g. systolic, diastolic).
+
+    Returns:
+        pd.Series: Ordered categorical with the entry labels followed by its missing label.
+    """
+    rule = THRESHOLD_TABLE[name]
+    if len(values) != len(rule["inputs"]):
+        raise ValueError(f"'{name}' expects {len(rule['inputs'])} column(s), got {len(values)}")
+
+    levels = np.zeros(len(values[0]), dtype=np.int8)
+    missing = np.zeros(len(values[0]), dtype=bool)
+    for column, spec in zip(values, rule["inputs"]):
+        x = pd.to_numeric(column, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        right_closed = spec.get("right_closed", [])
+        band = np.zeros(len(x), dtype=np.int8)
+        for edge in spec["edges"]:
+            band += (x > edge) if edge in right_closed else (x >= edge)
+        band_levels = np.asarray(spec.get("levels", range(len(spec["edges"]) + 1)), dtype=np.int8)
+        np.maximum(levels, band_levels[band], out=levels)
+        missing |= np.isnan(x)
+
+    categories = rule["labels"] + [rule["missing"]]
+    codes = np.where(missing, len(categories) - 1, levels)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=categories, ordered=True),
+        index=values[0].index
+    )
+
+
+# 16. Vectorized Medication Labeling
+def label_meds_column(values: pd.Series) -> pd.Series:
+    """
+    Label medication status for a whole column, matching label_meds.
+
+    Args:
+        values (pd.Series): Medication flags (1, 0, or missing).
+
+    Returns:
+        pd.Series: Ordered categorical of medication status labels.
+    """
+    codes = np.select([values.eq(0).to_numpy(), values.eq(1).to_numpy()], [0, 1], default=2)
+    return pd.Series(
+        pd.Categorical.from_codes(codes, categories=MEDS_LABELS, ordered=True),
+        index=values.index
+    )
+
+
+# 17. Vectorized Glucose Abnormal Flags
+def glucose_flag_columns(values: pd.Series) -> pd.DataFrame:
+    """
+    Flag hypo- and hyperglycemia for a whole column, matching glucose_flags.
+
+    Args:
+        values (pd.Series): Fasting glucose levels.
+
+    Returns:
+        pd.DataFrame: Integer columns 'hypoglycemia_flag' and 'hyperglycemia_flag'
+        (0 for missing values).
+    """
+    return pd.DataFrame({
+        'hypoglycemia_flag': (values < 70).astype(np.int64),
+        'hyperglycemia_flag': (values > 140).astype(np.int64),
+    }, index=values.index)
+
+
+def _add_pir_category(df: pd.DataFrame) -> pd.DataFrame:
+    df["pir_category"] = categorize_column("pir_category", df["poverty_income_ratio"])
+    return df
+
+
+def _add_activity_level(df: pd.DataFrame) -> pd.DataFrame:
+    df['activity_level'] = categorize_column("activity_level", df['total_weekly_min'])
+    return df
+
+
+def _add_sleep_category(df: pd.DataFrame) -> pd.DataFrame:
+    df['sleep_category'] = categorize_column("sleep_category", df['sleep_avg_hr'])
+    return df
+
+
+def _add_bp_category(df: pd.DataFrame) -> pd.DataFrame:
+    df['bp_category'] = categorize_column("bp_category", df['systolic_avg'], df['diastolic_avg'])
+    return df
+
+
+def _add_obesity_flag(df: pd.DataFrame) -> pd.DataFrame:
+    df['obese'] = (df['bmi'] >= 30).astype(int)
+    return df
+
+
+def _add_cholesterol_category(df: pd.DataFrame) -> pd.DataFrame:
+    df['cholesterol_category'] = categorize_column("cholesterol_category", df['total_cholesterol'])
+    return df
+
+
+# Feature engineering step for each cleaned dataset
+FEATURE_ENGINEERS: Dict[str, Callable[[pd.DataFrame], pd.DataFrame]] = {
+    "DEMO_L": _add_pir_category,
+    "PAQ_L": _add_activity_level,
+    "SLQ_L": _add_sleep_category,
+    "BPXO_L": _add_bp_category,
+    "BMX_L": _add_obesity_flag,
+    "TCHOL_L": _add_cholesterol_category,
+    "GLU_L": engineer_glu_features,
+    "DIQ_L": engineer_diq_features,
+    "MCQ_L": engineer_mcq_features,
+}
+
+
+# 18. Feature Engineering for all cleaned datasets
+def engineer_features(
+    cleaned_data: Dict[str, pd.DataFrame],
+    cache: Optional[PipelineCache] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Add the engineered features to each cleaned dataset that has a feature step.
+
+    Datasets without a feature step (e.g. dietary files) are left unchanged.
+
+    Args:
+        cleaned_data (Dict[str, pd.DataFrame]): Cleaned datasets keyed by dataset name.
+        cache (Optional[PipelineCache]): If given, a dataset whose cleaned data and feature
+            code are unchanged is loaded from the cache instead of recomputed.
+
+    Returns:
+        Dict[str, pd.DataFrame]: The same dictionary, with feature columns added.
+    """
+    for name, func in FEATURE_ENGINEERS.items():
+        if name not in cleaned_data or cleaned_data[name].empty:
+            continue
+        df = cleaned_data[name]
+        with profile_stage("features", name) as record:
+            record["rows_in"] = len(df)
+            if cache is None:
+                cleaned_data[name] = func(df)
+            else:
+                key = make_key("features", name, hash_dataframe(df), hash_source(func))
+                cleaned_data[name] = cache.cached("features", name, key, lambda: func(df))
+            record["rows_out"] = len(cleaned_data[name])
+
+    return cleaned_data
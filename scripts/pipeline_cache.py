@@ -0,0 +1,285 @@
+"""
+scripts\\pipeline_cache.py
+
+Content-hash cache for the cleaning, HEI scoring and feature engineering stages.
+
+Each cached artifact is keyed on a hash of:
+- the bytes of the stage input (a DataFrame or the files it reads),
+- the relevant dataset spec (or config.datasets entry),
+- the source code of the function (and module) that produces it.
+
+If none of these changed, the stage loads its cached Parquet artifact instead of
+recomputing it. The cache keeps an index of its entries, evicts the least recently
+used ones when it grows past its size limit, and can report what was reused.
+
+Run `python scripts/pipeline_cache.py` to print the cache report, or
+`python scripts/pipeline_cache.py clear` to empty the cache.
+"""
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import hashlib
+import inspect
+import json
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from scripts.config import CACHE_DIR, CACHE_MAX_BYTES
+from scripts.storage import list_parts, load_dataframe
+from scripts.utils import pretty_path
+from scripts.pipeline_log import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_FILE = "index.json"
+
+
+# 1. Hashing helpers
+def hash_file(path: Union[str, Path], block_size: int = 1 << 20) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's bytes.
+
+    For a folder of part files (see storage.save_part), every part is hashed with its
+    name, in the order the parts are read back.
+    """
+    path = Path(path)
+    files = list_parts(path) if path.is_dir() else [path]
+    digest = hashlib.sha256()
+    for file in files:
+        if path.is_dir():
+            digest.update(file.name.encode())
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """
+    Returns a SHA-256 hex digest of a DataFrame's values, index, column names and dtypes.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(col) for col in df.columns]).encode())
+    digest.update(json.dumps([str(dtype) for dtype in df.dtypes]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def hash_source(*objects: Any) -> str:
+    """
+    Returns a SHA-256 hex digest of the source code of functions or modules.
+
+    For a function, the source of its whole module is hashed as well, so changes to
+    helpers it calls in the same file also change the key.
+    """
+    digest = hashlib.sha256()
+    for obj in objects:
+        digest.update(inspect.getsource(obj).encode())
+        module = inspect.getmodule(obj)
+        if module is not None and module is not obj:
+            digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+
+def make_key(*parts: Any) -> str:
+    """
+    Combines hashes, config entries and other JSON-serializable parts into one cache key.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# 2. Stage cache
+class PipelineCache:
+    """
+    Size-bounded LRU cache of pipeline stage artifacts stored as Parquet files.
+
+    Args:
+        cache_dir: Folder holding the artifacts and the index file.
+        max_bytes: Total artifact size above which least recently used entries are evicted.
+        enabled: If False, every lookup misses and nothing is stored.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = CACHE_DIR,
+        max_bytes: int = CACHE_MAX_BYTES,
+        enabled: bool = True
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.events: List[Dict[str, Any]] = []
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index = self._load_index()
+
+    def _index_path(self) -> Path:
+        return self.cache_dir / INDEX_FILE
+
+    def _artifact_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.parquet"
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        path = self._index_path()
+        if not path.exists():
+            return {}
+        try:
+            index = json.loads(path.read_text())
+        except (OSError, ValueError):
+            logger.warning(f"Cache index at {pretty_path(path)} is unreadable. Starting with an empty cache.")
+            return {}
+        # Forget entries whose artifact was removed outside the cache
+        return {key: entry for key, entry in index.items() if self._artifact_path(key).exists()}
+
+    def _save_index(self) -> None:
+        self._index_path().write_text(json.dumps(self.index, indent=2))
+
+    def _record(self, stage: str, name: str, key: str, status: str) -> None:
+        self.events.append({"stage": stage, "name": name, "status": status, "key": key[:12]})
+
+    def get(self, stage: str, name: str, key: str) -> Optional[pd.DataFrame]:
+        """
+        Returns the cached artifact for a key, or None on a miss.
+        """
+        if not self.enabled or key not in self.index:
+            return None
+        try:
+            df = load_dataframe(self._artifact_path(key))
+        except Exception as e:
+            logger.warning(f"Failed to read cached {stage} artifact for {name}: {e}")
+            self.index.pop(key, None)
+            self._save_index()
+            return None
+
+        entry = self.index[key]
+        entry["last_used"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        entry["last_status"] = "reused"
+        self._save_index()
+        self._record(stage, name, key, "reused")
+        return df
+
+    def put(self, stage: str, name: str, key: str, df: pd.DataFrame) -> None:
+        """
+        Stores an artifact under a key and evicts old entries if the cache is too large.
+        """
+        if not self.enabled:
+            self._record(stage, name, key, "computed")
+            return
+        # Keep the index so a reused artifact is identical to a freshly computed one
+        path = self._artifact_path(key)
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=True), path)
+        now = time.time()
+        self.index[key] = {
+            "stage": stage,
+            "name": name,
+            "size": path.stat().st_size,
+            "created": now,
+            "last_used": now,
+            "hits": 0,
+            "last_status": "computed",
+        }
+        self._record(stage, name, key, "computed")
+        self.evict()
+        self._save_index()
+
+    def cached(self, stage: str, name: str, key: str, compute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """
+        Returns the cached artifact for a key, computing and storing it on a miss.
+        """
+        df = self.get(stage, name, key)
+        if df is not None:
+            logger.info(f"[cache] Reusing {stage} result for {name}")
+            return df
+        df = compute()
+        if isinstance(df, pd.DataFrame) and not df.empty:
+            self.put(stage, name, key, df)
+        return df
+
+    def evict(self) -> List[str]:
+        """
+        Removes least recently used artifacts until the cache fits in max_bytes.
+
+        Returns:
+            List[str]: Keys of the evicted entries.
+        """
+        evicted = []
+        total = sum(entry["size"] for entry in self.index.values())
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            self._artifact_path(key).unlink(missing_ok=True)
+            total -= entry["size"]
+            evicted.append(key)
+            logger.info(f"[cache] Evicted {entry['stage']} artifact for {entry['name']}")
+        for key in evicted:
+            del self.index[key]
+        return evicted
+
+    def clear(self) -> None:
+        """
+        Removes every cached artifact.
+        """
+        for key in list(self.index):
+            self._artifact_path(key).unlink(missing_ok=True)
+        self.index = {}
+        self._save_index()
+
+    def report(self) -> pd.DataFrame:
+        """
+        Summarizes what was reused or recomputed.
+
+        Returns:
+            pd.DataFrame: The lookups made through this cache object if there were any,
+            otherwise every entry in the cache index.
+        """
+        if self.events:
+            return pd.DataFrame(self.events)
+
+        rows = [
+            {
+                "stage": entry["stage"],
+                "name": entry["name"],
+                "last_status": entry.get("last_status"),
+                "hits": entry.get("hits", 0),
+                "size_kb": round(entry["size"] / 1024, 1),
+                "last_used": pd.Timestamp(entry["last_used"], unit="s").floor("s"),
+                "key": key[:12],
+            }
+            for key, entry in self.index.items()
+        ]
+        columns = ["stage", "name", "last_status", "hits", "size_kb", "last_used", "key"]
+        return pd.DataFrame(rows, columns=columns).sort_values(["stage", "name"], ignore_index=True)
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """
+    Prints the cache report, or clears the cache when called with 'clear'.
+    """
+    args = args or []
+    cache = PipelineCache()
+    if args[:1] == ["clear"]:
+        cache.clear()
+        print(f"Cleared cache at {pretty_path(cache.cache_dir)}")
+        return
+
+    report = cache.report()
+    if report.empty:
+        print(f"Cache at {pretty_path(cache.cache_dir)} is empty.")
+        return
+    total_kb = report["size_kb"].sum()
+    print(f"Cache at {pretty_path(cache.cache_dir)}: {len(report)} entries, {total_kb:.1f} KB "
+          f"(limit {cache.max_bytes / 1024:.0f} KB)")
+    print(report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
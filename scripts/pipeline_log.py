@@ -0,0 +1,220 @@
+"""
+scripts\\pipeline_log.py
+
+Leveled, structured logging for the pipeline's progress messages and data diagnostics.
+
+- Every module logs through get_logger(__name__), a child of the 'nhanes' logger.
+- Levels, from most to least verbose: DEBUG, DIAGNOSTIC, INFO, WARNING, ERROR.
+  DIAGNOSTIC messages carry data summaries (missing value tables, describe(), range
+  audits); log_diagnostic only computes them when that level is enabled.
+- LOG_LEVEL (config) sets the level: DIAGNOSTIC by default, which prints the same
+  output as before; INFO keeps the progress messages only; QUIET (production mode)
+  keeps warnings and errors and skips every diagnostic computation.
+- LOG_FORMAT='json' writes one JSON object per message instead of plain text, with
+  the logger, level, message and any fields passed as keyword arguments (e.g. dataset,
+  rows) so runs can be searched and aggregated.
+
+Messages go to the current sys.stdout, so output captured in worker processes
+(see data_cleaning.clean_datasets_parallel) is still replayed in the parent.
+"""
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import json
+import logging
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+from typing import Any, Callable, Iterator, Optional, Union
+
+from scripts.config import LOG_FORMAT, LOG_LEVEL
+
+# Level of data diagnostics, between DEBUG and INFO
+DIAGNOSTIC = 15
+logging.addLevelName(DIAGNOSTIC, "DIAGNOSTIC")
+
+# LOG_LEVEL names besides the standard logging ones
+LEVEL_ALIASES = {"DIAGNOSTIC": DIAGNOSTIC, "QUIET": logging.WARNING}
+
+ROOT_LOGGER = "nhanes"
+
+# Attributes every LogRecord has; anything else was passed as a structured field
+_RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "taskName"}
+
+
+# 1. Formatting
+def _fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES}
+
+
+def _to_json_value(value: Any) -> Any:
+    """
+    Converts a diagnostic payload (Series, DataFrame, numpy scalar, ...) to plain JSON values.
+    """
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return json.loads(value.to_json(orient="index" if isinstance(value, pd.Series) else "split",
+                                        default_handler=str))
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (tuple, list)):
+        return [_to_json_value(item) for item in value]
+    return value if isinstance(value, (str, int, float, bool, dict, type(None))) else str(value)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Plain messages, as the pipeline printed them. A diagnostic's data is printed below its title.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        data = getattr(record, "data", None)
+        if data is not None:
+            message = f"{message}\n{data}" if message else str(data)
+        if record.exc_info:
+            message = f"{message}\n{self.formatException(record.exc_info)}"
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per message: time, level, logger, message and the structured fields.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update({key: _to_json_value(value) for key, value in _fields(record).items()})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """
+    Writes to whatever sys.stdout is when a message is logged (not when the handler was made).
+    """
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+# 2. Configuration
+def parse_level(level: Union[str, int]) -> int:
+    """
+    Returns the numeric level of a level name ('INFO', 'DIAGNOSTIC', 'QUIET', ...) or number.
+    """
+    if isinstance(level, int):
+        return level
+    name = str(level).strip().upper()
+    if name in LEVEL_ALIASES:
+        return LEVEL_ALIASES[name]
+    value = logging.getLevelName(name)
+    if not isinstance(value, int):
+        raise ValueError(f"Unknown log level: {level!r}")
+    return value
+
+
+def configure_logging(level: Union[str, int] = LOG_LEVEL, log_format: str = LOG_FORMAT) -> logging.Logger:
+    """
+    Sets the level and output format of the pipeline loggers.
+
+    Args:
+        level: Level name or number (see LEVEL_ALIASES for 'DIAGNOSTIC' and 'QUIET').
+        log_format: 'text' or 'json'.
+
+    Returns:
+        logging.Logger: The 'nhanes' parent logger.
+    """
+    if log_format not in ("text", "json"):
+        raise ValueError(f"Unknown log format: {log_format!r}")
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel(parse_level(level))
+    root.propagate = False
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    handler = _StdoutHandler()
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    root.addHandler(handler)
+    return root
+
+
+def set_log_level(level: Union[str, int]) -> int:
+    """
+    Changes the level of the pipeline loggers (e.g. set_log_level('QUIET') in production).
+
+    Returns:
+        int: The previous level.
+    """
+    root = logging.getLogger(ROOT_LOGGER)
+    previous = root.level
+    root.setLevel(parse_level(level))
+    return previous
+
+
+@contextmanager
+def log_level(level: Union[str, int]) -> Iterator[None]:
+    """
+    Sets the level of the pipeline loggers for a block, e.g. `with log_level('QUIET'):`
+    around benchmarked calls, and restores the previous level afterwards.
+    """
+    previous = set_log_level(level)
+    try:
+        yield
+    finally:
+        set_log_level(previous)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns the pipeline logger of a module, e.g. get_logger(__name__) in scripts/clean_demo.py
+    gives 'nhanes.clean_demo'.
+    """
+    return logging.getLogger(f"{ROOT_LOGGER}.{name.rsplit('.', 1)[-1]}")
+
+
+# 3. Diagnostics
+def diagnostics_enabled(logger: logging.Logger) -> bool:
+    """
+    True if the logger writes DIAGNOSTIC messages, i.e. data summaries are worth computing.
+    """
+    return logger.isEnabledFor(DIAGNOSTIC)
+
+
+def log_diagnostic(
+    logger: logging.Logger,
+    title: str,
+    compute: Optional[Callable[[], Any]] = None,
+    **fields: Any
+) -> None:
+    """
+    Logs a data summary at DIAGNOSTIC level, computing it only if that level is enabled.
+
+    Args:
+        logger: Logger of the calling module.
+        title: Message line (e.g. 'Missing values in dataset: BMX_L').
+        compute: Function returning the summary (e.g. lambda: df.isnull().sum()); it is not
+            called when diagnostics are off. Without it only the title is logged.
+        **fields: Structured fields of the message (e.g. dataset='BMX_L').
+    """
+    if not logger.isEnabledFor(DIAGNOSTIC):
+        return
+    if compute is not None:
+        fields["data"] = compute()
+    logger.log(DIAGNOSTIC, title, extra=fields)
+
+
+configure_logging()
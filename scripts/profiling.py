@@ -0,0 +1,394 @@
+"""
+scripts\\profiling.py
+
+Lightweight timing and memory instrumentation for the pipeline stages.
+
+- profile_stage (context manager) and profiled (decorator) record the wall time, CPU
+  time, peak RSS, rows in and out and bytes written of a loader, cleaner, HEI,
+  feature or SQLite step.
+- A single background thread samples the process RSS while any stage is running,
+  so nested stages (e.g. the loaders inside process_datasets) each get their peak.
+- storage.save_dataframe and friends report the files they write (record_write).
+- Records collected in worker processes are sent back with the worker's result
+  and added to the parent's run (add_records).
+- A run keeps its last config.PROFILE_MAX_RECORDS records; reset_profile starts over.
+- Stages are nested per thread, so record_rows and record_write update the stages of
+  the calling thread only.
+- save_profile_report writes the run as JSON and Parquet; print_profile_summary
+  prints a summary table.
+
+Recording is always on and only costs a few system calls per stage.
+"""
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+import psutil
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Union
+
+from scripts.config import PROFILE_DIR, PROFILE_MAX_RECORDS
+
+# Seconds between two RSS samples while a stage is running
+RSS_SAMPLE_INTERVAL = 0.005
+
+# Columns of the profile report, in order
+PROFILE_COLUMNS = [
+    "run_id", "stage", "name", "depth", "pid", "started_at", "wall_s", "cpu_s",
+    "peak_rss_mb", "rss_delta_mb", "rows_in", "rows_out", "bytes_written", "error",
+]
+
+_run_id = uuid.uuid4().hex[:12]
+_records: Deque[Dict[str, Any]] = deque(maxlen=PROFILE_MAX_RECORDS)
+# Records added since the run started, including those dropped from _records
+_recorded = 0
+# Running stages of every thread (for the RSS sampler) and of each thread (_local.stack)
+_active: List[Dict[str, Any]] = []
+_local = threading.local()
+_lock = threading.Lock()
+_sampler: Optional[threading.Thread] = None
+_process = psutil.Process()
+
+
+def _reset_after_fork() -> None:
+    """
+    A forked worker starts with no running stages or records of its own; the sampler
+    thread and the process handle of the parent do not carry over.
+    """
+    global _lock, _sampler, _process, _local, _recorded
+    _lock = threading.Lock()
+    _sampler = None
+    _process = psutil.Process()
+    _local = threading.local()
+    _active.clear()
+    _records.clear()
+    _recorded = 0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+# 1. RSS sampling
+def _sample_rss() -> None:
+    """
+    Sampler thread: raises the peak RSS of every running stage until none is left.
+    """
+    global _sampler
+    while True:
+        time.sleep(RSS_SAMPLE_INTERVAL)
+        rss = _process.memory_info().rss
+        with _lock:
+            if not _active:
+                _sampler = None
+                return
+            for record in _active:
+                record["_peak_rss"] = max(record["_peak_rss"], rss)
+
+
+def _start_sampler() -> None:
+    global _sampler
+    if _sampler is None:
+        _sampler = threading.Thread(target=_sample_rss, name="rss-sampler", daemon=True)
+        _sampler.start()
+
+
+def _stack() -> List[Dict[str, Any]]:
+    """
+    Running stages of the calling thread, innermost last.
+    """
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def _add_records(records: List[Dict[str, Any]]) -> None:
+    """
+    Appends finished records to the run (the oldest are dropped past PROFILE_MAX_RECORDS).
+    """
+    global _recorded
+    with _lock:
+        _records.extend(records)
+        _recorded += len(records)
+
+
+# 2. Recording stages
+@contextmanager
+def profile_stage(stage: str, name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Records the cost of the code inside the block as one profile record.
+
+    The yielded record can be updated inside the block, e.g. record["rows_in"] = len(df).
+
+    Args:
+        stage: Pipeline stage ('load', 'clean', 'hei', 'features', 'sqlite', ...).
+        name: What is processed (dataset, file or table name). Defaults to the stage.
+
+    Yields:
+        Dict[str, Any]: The record being filled in.
+    """
+    rss = _process.memory_info().rss
+    stack = _stack()
+    record: Dict[str, Any] = {
+        "run_id": _run_id,
+        "stage": stage,
+        "name": name or stage,
+        "depth": len(stack),
+        "pid": os.getpid(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="microseconds"),
+        "rows_in": None,
+        "rows_out": None,
+        "bytes_written": 0,
+        "error": None,
+        "_start_rss": rss,
+        "_peak_rss": rss,
+    }
+    stack.append(record)
+    with _lock:
+        _active.append(record)
+        _start_sampler()
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield record
+    except BaseException as e:
+        record["error"] = type(e).__name__
+        raise
+    finally:
+        record["wall_s"] = time.perf_counter() - wall
+        record["cpu_s"] = time.process_time() - cpu
+        rss = _process.memory_info().rss
+        stack.remove(record)
+        with _lock:
+            _active.remove(record)
+            peak = max(record.pop("_peak_rss"), rss)
+        record["peak_rss_mb"] = peak / 1e6
+        record["rss_delta_mb"] = (peak - record.pop("_start_rss")) / 1e6
+        _add_records([record])
+
+
+def _count_rows(value: Any) -> Optional[int]:
+    """
+    Rows of a DataFrame, of the first item of a tuple, or summed over a dict of DataFrames.
+    """
+    if isinstance(value, pd.DataFrame):
+        return len(value)
+    if isinstance(value, tuple) and value and isinstance(value[0], pd.DataFrame):
+        return len(value[0])
+    if isinstance(value, dict) and value and all(isinstance(v, pd.DataFrame) for v in value.values()):
+        return sum(len(v) for v in value.values())
+    return None
+
+
+def profiled(
+    stage: str,
+    name: Optional[str] = None,
+    name_arg: Optional[str] = None
+) -> Callable[[Callable], Callable]:
+    """
+    Decorator recording each call of a function with profile_stage.
+
+    Rows in are counted on the first argument and rows out on the return value
+    (DataFrame, dict of DataFrames, or a tuple starting with a DataFrame); the function
+    can also set them with record_rows.
+
+    Args:
+        stage: Pipeline stage of the function.
+        name: Name of the records (e.g. the dataset a cleaner is for). Defaults to the
+            function name.
+        name_arg: Argument whose value names the record instead (e.g. 'table_name', or
+            'file_path' for which the file name is used).
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            label = name or func.__name__
+            if name_arg is not None:
+                bound = signature.bind_partial(*args, **kwargs)
+                bound.apply_defaults()
+                value = bound.arguments.get(name_arg)
+                is_path = isinstance(value, Path) or (isinstance(value, str) and name_arg.endswith("path"))
+                label = Path(value).name if is_path else str(value)
+            with profile_stage(stage, label) as record:
+                if args:
+                    record["rows_in"] = _count_rows(args[0])
+                result = func(*args, **kwargs)
+                if record["rows_out"] is None:
+                    record["rows_out"] = _count_rows(result)
+            return result
+
+        return wrapper
+    return decorator
+
+
+def record_rows(rows_in: Optional[int] = None, rows_out: Optional[int] = None) -> None:
+    """
+    Sets the rows in and/or out of the calling thread's innermost running stage
+    (e.g. for chunked cleaners).
+    """
+    stack = _stack()
+    if stack:
+        record = stack[-1]
+        if rows_in is not None:
+            record["rows_in"] = rows_in
+        if rows_out is not None:
+            record["rows_out"] = rows_out
+
+
+def record_write(path: Union[str, Path]) -> None:
+    """
+    Adds the size of a file just written to every running stage of the calling thread.
+    """
+    stack = _stack()
+    if not stack:
+        return
+    try:
+        size = Path(path).stat().st_size
+    except OSError:
+        return
+    for record in stack:
+        record["bytes_written"] += size
+
+
+# 3. Collecting the run
+def profile_records() -> List[Dict[str, Any]]:
+    """
+    Returns the records of this run so far, in the order the stages finished.
+    """
+    with _lock:
+        return list(_records)
+
+
+def profile_mark() -> int:
+    """
+    Returns a mark of the records so far, for records_since.
+    """
+    return _recorded
+
+
+def records_since(mark: int) -> List[Dict[str, Any]]:
+    """
+    Returns the records added since profile_mark returned `mark` (the ones still kept).
+    """
+    with _lock:
+        count = min(_recorded - mark, len(_records))
+        return list(_records)[len(_records) - count:] if count > 0 else []
+
+
+def add_records(records: List[Dict[str, Any]]) -> None:
+    """
+    Adds records collected in a worker process to this run.
+    """
+    _add_records([{**record, "run_id": _run_id} for record in records])
+
+
+def reset_profile() -> str:
+    """
+    Forgets the recorded stages and starts a new run.
+
+    Returns:
+        str: The new run id.
+    """
+    global _run_id, _recorded
+    with _lock:
+        _records.clear()
+        _recorded = 0
+        _run_id = uuid.uuid4().hex[:12]
+    return _run_id
+
+
+def profile_report(records: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
+    """
+    Returns the records (of this run by default) as a DataFrame ordered by start time.
+    """
+    records = profile_records() if records is None else records
+    report = pd.DataFrame(records, columns=PROFILE_COLUMNS)
+    report[["rows_in", "rows_out"]] = report[["rows_in", "rows_out"]].astype("Int64")
+    return report.sort_values(["started_at", "depth"], kind="stable").reset_index(drop=True)
+
+
+def save_profile_report(output_dir: Union[str, Path] = PROFILE_DIR) -> Dict[str, Path]:
+    """
+    Writes the run's profile report as JSON (with run metadata) and Parquet.
+
+    Args:
+        output_dir: Folder for the reports, named profile_<start>_<run id>.
+
+    Returns:
+        Dict[str, Path]: The 'json' and 'parquet' files written.
+    """
+    report = profile_report()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    started = report["started_at"].min() if not report.empty else datetime.now(timezone.utc).isoformat()
+    stem = f"profile_{started[:19].replace(':', '').replace('-', '')}_{_run_id}"
+
+    json_path = output_dir / f"{stem}.json"
+    payload = {
+        "run_id": _run_id,
+        "python": sys.version.split()[0],
+        "pandas": pd.__version__,
+        "cpu_count": os.cpu_count(),
+        "stages": json.loads(report.to_json(orient="records")),
+    }
+    json_path.write_text(json.dumps(payload, indent=2))
+
+    parquet_path = output_dir / f"{stem}.parquet"
+    report.to_parquet(parquet_path, index=False)
+    return {"json": json_path, "parquet": parquet_path}
+
+
+def print_profile_summary(records: Optional[List[Dict[str, Any]]] = None) -> pd.DataFrame:
+    """
+    Prints one line per recorded stage (nested stages indented) and the totals per stage.
+
+    Returns:
+        pd.DataFrame: The printed table.
+    """
+    report = profile_report(records)
+    if report.empty:
+        print("No pipeline stages were recorded.")
+        return report
+
+    names = ["  " * depth + name for depth, name in zip(report["depth"], report["name"])]
+    width = max(len(name) for name in names)
+    table = pd.DataFrame({
+        "stage": report["stage"],
+        "name": [name.ljust(width) for name in names],
+        "wall_s": report["wall_s"].round(3),
+        "cpu_s": report["cpu_s"].round(3),
+        "peak_rss_mb": report["peak_rss_mb"].round(1),
+        "rss_delta_mb": report["rss_delta_mb"].round(1),
+        "rows_in": report["rows_in"],
+        "rows_out": report["rows_out"],
+        "written_mb": (report["bytes_written"] / 1e6).round(2),
+    })
+    print(f"Profile of run {_run_id}:")
+    print(table.to_string(index=False))
+
+    # Totals over outermost stages only, so nested stages are not counted twice
+    top = report[report["depth"] == 0].groupby("stage", sort=False)
+    totals = top.agg(calls=("name", "size"), wall_s=("wall_s", "sum"), cpu_s=("cpu_s", "sum"),
+                     peak_rss_mb=("peak_rss_mb", "max"), bytes_written=("bytes_written", "sum"))
+    print("\nTotals per stage:")
+    print(totals.round(3).to_string())
+    return table
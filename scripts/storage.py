@@ -0,0 +1,439 @@
+"""
+scripts\\storage.py
+
+Storage helpers for the interim, clean, processed and final data stages.
+
+- Saves DataFrames as Parquet (default) or CSV, chosen by config.STORAGE_FORMAT.
+- Writes Parquet with an explicit Arrow schema so dtypes survive the round-trip
+  (e.g. participant_id keeps the dtype chosen by config.PARTICIPANT_ID_DTYPE).
+- Reads Parquet through memory-mapped Arrow tables to avoid extra copies.
+- Falls back to whichever format exists on disk, so older CSV outputs still load.
+- Stores datasets cleaned out of core as a folder of part files (see save_part),
+  which every reader below accepts in place of a single file.
+- Partitions stage folders by NHANES cycle (data/clean/cycle=J/...) while a cycle
+  other than the default one is processed (see use_cycle).
+"""
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from scripts.config import PARTICIPANT_ID_DTYPE, STORAGE_FORMAT
+from scripts.profiling import record_write
+
+STORAGE_EXTENSIONS = {"parquet": ".parquet", "csv": ".csv"}
+
+# Arrow and pandas types matching each supported participant_id dtype
+ID_ARROW_TYPES: Dict[str, pa.DataType] = {
+    "Int64": pa.int64(),
+    "str": pa.string(),
+    "category": pa.dictionary(pa.int32(), pa.string()),
+    "string[pyarrow]": pa.string(),
+}
+ID_PANDAS_DTYPES: Dict[str, object] = {
+    "Int64": "Int64",
+    "str": str,
+    "category": "category",
+    "string[pyarrow]": "string[pyarrow]",
+}
+
+# Explicit Arrow types for identifier columns shared across datasets
+KEY_COLUMN_TYPES: Dict[str, pa.DataType] = {
+    "participant_id": ID_ARROW_TYPES[PARTICIPANT_ID_DTYPE],
+}
+
+# pandas dtypes used for identifier columns when reading CSV files
+KEY_COLUMN_DTYPES: Dict[str, object] = {
+    "participant_id": ID_PANDAS_DTYPES[PARTICIPANT_ID_DTYPE],
+}
+
+
+# NHANES cycle whose files are being processed; None for the default single-cycle run
+_active_cycle: Optional[str] = None
+
+
+@contextmanager
+def use_cycle(cycle: Optional[str]) -> Iterator[None]:
+    """
+    Routes interim and clean outputs to the cycle=<cycle> partition of each stage folder
+    while the block runs. Use None for the unpartitioned default layout.
+    """
+    global _active_cycle
+    previous, _active_cycle = _active_cycle, cycle
+    try:
+        yield
+    finally:
+        _active_cycle = previous
+
+
+def cycle_partition(stage_dir: Union[str, Path], cycle: str) -> Path:
+    """
+    Returns the folder of a cycle inside a stage folder (e.g. data/clean/cycle=J).
+    """
+    return Path(stage_dir) / f"cycle={cycle}"
+
+
+def partition_dir(stage_dir: Union[str, Path]) -> Path:
+    """
+    Returns the folder outputs of a stage are written to: the stage folder itself, or
+    the partition of the cycle set with use_cycle.
+    """
+    if _active_cycle is None:
+        return Path(stage_dir)
+    return cycle_partition(stage_dir, _active_cycle)
+
+
+def _check_format(storage_format: Optional[str]) -> str:
+    storage_format = storage_format or STORAGE_FORMAT
+    if storage_format not in STORAGE_EXTENSIONS:
+        raise ValueError(
+            f"storage_format must be one of {list(STORAGE_EXTENSIONS)}, got '{storage_format}'"
+        )
+    return storage_format
+
+
+def storage_path(path: Union[str, Path], storage_format: Optional[str] = None) -> Path:
+    """
+    Returns the path with the file extension of the given storage format.
+
+    Args:
+        path: Output path, with or without an extension (e.g. 'data/clean/bmx_l_clean.csv').
+        storage_format: 'parquet' or 'csv'. Defaults to config.STORAGE_FORMAT.
+    """
+    return Path(path).with_suffix(STORAGE_EXTENSIONS[_check_format(storage_format)])
+
+
+def resolve_path(path: Union[str, Path]) -> Optional[Path]:
+    """
+    Finds the stored file for a path: the path as given if it is a stored file in a
+    supported format, otherwise the configured format, then the path as given, then any
+    other supported format, then a folder of parts.
+
+    Returns:
+        The existing file or part folder path, or None if no stored version exists.
+    """
+    path = Path(path)
+    if path.suffix in STORAGE_EXTENSIONS.values() and path.is_file():
+        return path
+    candidates = [storage_path(path), path] + [
+        path.with_suffix(ext) for ext in STORAGE_EXTENSIONS.values()
+    ]
+    for candidate in candidates:
+        if candidate.is_file():
+            return candidate
+    if list_parts(parts_dir(path)):
+        return parts_dir(path)
+    return None
+
+
+def parts_dir(path: Union[str, Path]) -> Path:
+    """
+    Returns the folder holding the part files of a dataset (its path without extension).
+    """
+    return Path(path).with_suffix("")
+
+
+def list_parts(folder: Union[str, Path]) -> List[Path]:
+    """
+    Returns the part files in a folder, in the order they were written.
+    """
+    folder = Path(folder)
+    if not folder.is_dir():
+        return []
+    return sorted(
+        part for part in folder.glob("part-*")
+        if part.suffix in STORAGE_EXTENSIONS.values()
+    )
+
+
+def remove_stored(path: Union[str, Path]) -> None:
+    """
+    Removes every stored version of a dataset (single files and part files), so a
+    rewritten dataset is not shadowed by an older one in another layout.
+    """
+    path = Path(path)
+    for ext in STORAGE_EXTENSIONS.values():
+        path.with_suffix(ext).unlink(missing_ok=True)
+    for part in list_parts(parts_dir(path)):
+        part.unlink()
+
+
+def staging_path(path: Union[str, Path]) -> Path:
+    """
+    Returns the path parts of a dataset are written under until the dataset is complete
+    (e.g. data/clean/dr1iff_l_clean.partial/ for data/clean/dr1iff_l_clean.csv).
+    """
+    path = Path(path)
+    return path.with_name(f"{parts_dir(path).name}.partial{path.suffix}")
+
+
+def replace_with_parts(staged: Union[str, Path], path: Union[str, Path]) -> Path:
+    """
+    Replaces every stored version of a dataset with the parts written under `staged`,
+    so readers never see a dataset that is only partly written.
+
+    Returns:
+        Path: The folder now holding the parts of the dataset.
+    """
+    remove_stored(path)
+    target = parts_dir(path)
+    if target.is_dir():
+        target.rmdir()
+    return parts_dir(staged).rename(target)
+
+
+def save_part(
+    df: pd.DataFrame,
+    path: Union[str, Path],
+    index: int,
+    storage_format: Optional[str] = None
+) -> Path:
+    """
+    Saves one part of a dataset written in chunks (e.g. data/clean/dr1iff_l_clean/part-00003.parquet).
+
+    Args:
+        df: Rows of this part.
+        path: Dataset path, as passed to save_dataframe.
+        index: Position of the part; parts are read back in this order.
+        storage_format: 'parquet' or 'csv'. Defaults to config.STORAGE_FORMAT.
+
+    Returns:
+        Path: The part file that was written.
+    """
+    return save_dataframe(df, parts_dir(path) / f"part-{index:05d}", storage_format)
+
+
+def build_schema(df: pd.DataFrame, column_types: Optional[Dict[str, pa.DataType]] = None) -> pa.Schema:
+    """
+    Builds the Arrow schema used to write a DataFrame.
+
+    Types are inferred from the DataFrame dtypes, then identifier columns stored as
+    Python objects are pinned to the types in KEY_COLUMN_TYPES (or `column_types`).
+
+    Args:
+        df: DataFrame to describe.
+        column_types: Optional overrides of Arrow types by column name.
+
+    Returns:
+        pa.Schema: Schema including the pandas metadata needed to restore dtypes.
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+
+    # Identifier overrides only apply to object columns; typed columns keep their dtype
+    overrides = {
+        name: arrow_type for name, arrow_type in KEY_COLUMN_TYPES.items()
+        if name in df.columns and df[name].dtype == object
+    }
+    overrides.update(column_types or {})
+
+    for name, arrow_type in overrides.items():
+        index = schema.get_field_index(name)
+        if index >= 0:
+            schema = schema.set(index, pa.field(name, arrow_type))
+    return schema
+
+
+def save_dataframe(
+    df: pd.DataFrame,
+    path: Union[str, Path],
+    storage_format: Optional[str] = None,
+    schema: Optional[pa.Schema] = None
+) -> Path:
+    """
+    Saves a DataFrame in the configured storage format.
+
+    Args:
+        df: DataFrame to save.
+        path: Output path; its extension is replaced to match the storage format.
+        storage_format: 'parquet' or 'csv'. Defaults to config.STORAGE_FORMAT.
+        schema: Explicit Arrow schema for Parquet output. Built with build_schema if None.
+
+    Returns:
+        Path: The file that was written.
+    """
+    storage_format = _check_format(storage_format)
+    out_path = storage_path(path, storage_format)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if storage_format == "csv":
+        df.to_csv(out_path, index=False)
+    else:
+        schema = schema or build_schema(df)
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        pq.write_table(table, out_path)
+    record_write(out_path)
+    return out_path
+
+
+def _csv_column_types() -> Dict[str, pa.DataType]:
+    # The CSV reader cannot parse straight into dictionary types
+    return {
+        name: arrow_type.value_type if pa.types.is_dictionary(arrow_type) else arrow_type
+        for name, arrow_type in KEY_COLUMN_TYPES.items()
+    }
+
+
+def read_table(path: Union[str, Path], columns: Optional[List[str]] = None) -> pa.Table:
+    """
+    Reads a stored dataset as an Arrow table.
+
+    Parquet files are memory-mapped; CSV files are parsed with the Arrow CSV reader,
+    reading identifier columns with the types in KEY_COLUMN_TYPES.
+
+    Args:
+        path: Stored file path (any supported extension; see resolve_path).
+        columns: Optional subset of columns to read.
+
+    Raises:
+        FileNotFoundError: If no stored version of the file exists.
+    """
+    resolved = resolve_path(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No stored file found for {path}")
+
+    if resolved.is_dir():
+        tables = [read_table(part, columns) for part in list_parts(resolved)]
+        return pa.concat_tables(tables, promote_options="permissive")
+    if resolved.suffix == STORAGE_EXTENSIONS["csv"]:
+        from pyarrow import csv as pa_csv
+        convert_options = pa_csv.ConvertOptions(
+            column_types=_csv_column_types(), include_columns=columns
+        )
+        return pa_csv.read_csv(resolved, convert_options=convert_options)
+    return pq.read_table(resolved, columns=columns, memory_map=True)
+
+
+def load_dataframe(path: Union[str, Path], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Loads a stored dataset into a DataFrame.
+
+    Parquet files are converted from memory-mapped Arrow buffers without consolidating
+    columns into 2D blocks, so numeric columns without nulls are not copied again.
+    CSV files are read with pandas, using the identifier dtypes in KEY_COLUMN_DTYPES.
+
+    Args:
+        path: Stored file path (any supported extension; see resolve_path).
+        columns: Optional subset of columns to read.
+
+    Raises:
+        FileNotFoundError: If no stored version of the file exists.
+    """
+    resolved = resolve_path(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No stored file found for {path}")
+
+    if resolved.is_dir():
+        parts = [load_dataframe(part, columns) for part in list_parts(resolved)]
+        return pd.concat(parts, ignore_index=True)
+    if resolved.suffix == STORAGE_EXTENSIONS["csv"]:
+        return pd.read_csv(resolved, usecols=columns, dtype=KEY_COLUMN_DTYPES)
+
+    table = pq.read_table(resolved, columns=columns, memory_map=True)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def iter_batches(path: Union[str, Path], batch_size: int = 65_536) -> Iterator[pa.RecordBatch]:
+    """
+    Streams a stored dataset as Arrow record batches, so only one batch is held in memory.
+
+    Args:
+        path: Stored file path (any supported extension; see resolve_path).
+        batch_size: Rows per batch for Parquet files (CSV files are read in blocks).
+
+    Raises:
+        FileNotFoundError: If no stored version of the file exists.
+    """
+    resolved = resolve_path(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No stored file found for {path}")
+
+    if resolved.is_dir():
+        for part in list_parts(resolved):
+            yield from iter_batches(part, batch_size)
+    elif resolved.suffix == STORAGE_EXTENSIONS["csv"]:
+        from pyarrow import csv as pa_csv
+        convert_options = pa_csv.ConvertOptions(column_types=_csv_column_types())
+        yield from pa_csv.open_csv(resolved, convert_options=convert_options)
+    else:
+        yield from pq.ParquetFile(resolved, memory_map=True).iter_batches(batch_size=batch_size)
+
+
+def count_rows(path: Union[str, Path]) -> int:
+    """
+    Returns the number of rows of a stored dataset (from the Parquet footers when possible).
+
+    Raises:
+        FileNotFoundError: If no stored version of the file exists.
+    """
+    resolved = resolve_path(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No stored file found for {path}")
+    if resolved.is_dir():
+        return sum(count_rows(part) for part in list_parts(resolved))
+    if resolved.suffix == STORAGE_EXTENSIONS["parquet"]:
+        return pq.ParquetFile(resolved).metadata.num_rows
+    return sum(batch.num_rows for batch in iter_batches(resolved))
+
+
+def read_schema(path: Union[str, Path]) -> pa.Schema:
+    """
+    Returns the Arrow schema of a stored dataset without reading all of its rows.
+
+    Raises:
+        FileNotFoundError: If no stored version of the file exists.
+    """
+    resolved = resolve_path(path)
+    if resolved is None:
+        raise FileNotFoundError(f"No stored file found for {path}")
+
+    if resolved.is_dir():
+        resolved = list_parts(resolved)[0]
+    if resolved.suffix == STORAGE_EXTENSIONS["csv"]:
+        from pyarrow import csv as pa_csv
+        convert_options = pa_csv.ConvertOptions(column_types=_csv_column_types())
+        return pa_csv.open_csv(resolved, convert_options=convert_options).schema
+    return pq.read_schema(resolved, memory_map=True)
+
+
+def write_batches(
+    batches: Iterable[pa.RecordBatch],
+    path: Union[str, Path],
+    schema: pa.Schema,
+    storage_format: Optional[str] = None
+) -> Path:
+    """
+    Writes record batches to one file as they arrive, without collecting them in memory.
+
+    Args:
+        batches: Record batches matching `schema`.
+        path: Output path; its extension is replaced to match the storage format.
+        schema: Schema of the output file.
+        storage_format: 'parquet' or 'csv'. Defaults to config.STORAGE_FORMAT.
+
+    Returns:
+        Path: The file that was written.
+    """
+    storage_format = _check_format(storage_format)
+    out_path = storage_path(path, storage_format)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if storage_format == "csv":
+        from pyarrow import csv as pa_csv
+        writer = pa_csv.CSVWriter(out_path, schema)
+    else:
+        writer = pq.ParquetWriter(out_path, schema)
+    with writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    record_write(out_path)
+    return out_path
+
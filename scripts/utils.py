@@ -3,16 +3,38 @@ scripts\\utils.py
 
 Common utility functions for NHANES project:
 - Validation of SAS transport files (.xpt) and Excel (.xls, .xlsx) files
-- Data exploration summaries
+- Header-only validation of SAS transport files against configured columns
+- Data exploration summaries, logged only when diagnostics are enabled
 - Data cleaning helpers.
+- Normalization of participant ids (SEQN) shared by all cleaners
+- Opt-in pandas Copy-on-Write mode and copies that follow it
 - format path for display while printing the file_path
 """
+import io
 import pandas as pd
 import numpy as np
+import struct
 from pathlib import Path
 import pyreadstat
-from scripts.config import BASE_PATH
-from typing import Dict, List, Optional, Union
+from scripts.config import BASE_PATH, COPY_ON_WRITE, PARTICIPANT_ID_DTYPE
+from scripts.pipeline_log import diagnostics_enabled, get_logger, log_diagnostic
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from scripts.pipeline_cache import PipelineCache
+
+logger = get_logger(__name__)
+
+# SAS transport (XPORT v5) layout: the file is a sequence of 80-byte records
+XPT_RECORD_LENGTH = 80
+XPT_HEADER_PREFIX = b"HEADER RECORD*******"
+
+# Interval closures and actions accepted by apply_range_rules
+RANGE_CLOSED = ("both", "left", "right", "neither")
+RANGE_ACTIONS = ("null", "drop")
+
+# Supported dtypes for participant_id (see normalize_participant_id)
+PARTICIPANT_ID_DTYPES = ("Int64", "str", "category", "string[pyarrow]")
 
 # 1. function for validate_and_read_xpt_and_xls/xlsx files
 def validate_xpt_and_excel_files(datasets: Dict[str, Dict[str, str]]) -> Dict[str, str]:
@@ -38,11 +60,11 @@ def validate_xpt_and_excel_files(datasets: Dict[str, Dict[str, str]]) -> Dict[st
     for name, info in datasets.items():
         file_path = Path(info["file_path"])
         if not file_path.exists():
-            print(f"File not found for: {name}")
+            logger.warning(f"File not found for: {name}")
             failed_files[name] = "File missing"
             continue
 
-        print(f"File found for: {name}")
+        logger.info(f"File found for: {name}")
 
         ext = file_path.suffix.lower()
 
@@ -50,25 +72,25 @@ def validate_xpt_and_excel_files(datasets: Dict[str, Dict[str, str]]) -> Dict[st
             if ext == ".xpt":
                 try:
                     data = pd.read_sas(file_path, format="xport")
-                    print(f"Successfully read {name} as .xpt with pandas. Rows: {len(data)}")
+                    logger.info(f"Successfully read {name} as .xpt with pandas. Rows: {len(data)}")
                 except Exception as e1:
-                    print(f"pandas read_sas failed for {name}: {e1}, trying pyreadstat...")
+                    logger.warning(f"pandas read_sas failed for {name}: {e1}, trying pyreadstat...")
                     data, meta = pyreadstat.read_sas7bdat(str(file_path))
-                    print(f"Successfully read {name} as .xpt with pyreadstat. Rows: {len(data)}")
+                    logger.info(f"Successfully read {name} as .xpt with pyreadstat. Rows: {len(data)}")
 
             elif ext in [".xls", ".xlsx"]:
                 data = pd.read_excel(file_path)
-                print(f"Successfully read {name} as Excel file. Rows: {len(data)}")
+                logger.info(f"Successfully read {name} as Excel file. Rows: {len(data)}")
 
             else:
                 # Unsupported file extension for this validation
                 msg = f"Unsupported file extension: {ext}"
-                print(msg)
+                logger.warning(msg)
                 failed_files[name] = msg
                 continue
 
         except Exception as e:
-            print(f"Failed to read {name} due to: {e}")
+            logger.error(f"Failed to read {name} due to: {e}")
             failed_files[name] = f"Error reading file: {e}"
 
     return failed_files
@@ -91,27 +113,34 @@ def pretty_path(path: Path) -> str:
 # 3. function for missing values
 def show_missing(df: pd.DataFrame, name: str) -> None:
     """
-    Print the number of missing values for each column in a dataframe.
+    Log the number of missing values for each column in a dataframe.
+
+    The counts are a DIAGNOSTIC message: they are not computed at all when the
+    log level is INFO or higher (see scripts/pipeline_log.py).
 
     Args:
         df: The dataframe to inspect.
         name: A label for the dataset (just for display purposes).
     """
-    print(f"Missing values in dataset: {name}")
-    print(df.isnull().sum())
+    log_diagnostic(logger, f"Missing values in dataset: {name}", lambda: df.isnull().sum(), dataset=name)
 
 # 4. function for rename the columns
-def rename_columns(df: pd.DataFrame, new_names: Dict[str, str]) -> pd.DataFrame:
+def rename_columns(df: pd.DataFrame, new_names: Dict[str, str], inplace: bool = False) -> pd.DataFrame:
     """
     Rename columns in the dataframe using the provided mapping.
 
     Args:
         df: The original dataframe.
         new_names: Dictionary mapping current column names to new names.
+        inplace: If True, rename the columns of `df` itself (no data is copied).
 
     Returns:
-        A new dataframe with updated column names.
+        A new dataframe with updated column names (`df` itself if inplace). Under
+        Copy-on-Write the new dataframe shares its data with `df` until either changes.
     """
+    if inplace:
+        df.rename(columns=new_names, inplace=True)
+        return df
     return df.rename(columns=new_names)
 
 # 5. function for dropping rows
@@ -163,28 +192,38 @@ def drop_invalid_weight(
     Returns:
         Filtered dataframe with only valid weights.
     """
-    cleaned_df = df[
-        df[weight_column].notna() &
-        (df[weight_column] >= min_valid) &
-        (df[weight_column] <= max_valid)
-    ]
+    cleaned_df = df[valid_weight_mask(df[weight_column], min_valid, max_valid)]
     return cleaned_df
 
+
+def valid_weight_mask(weights: pd.Series, min_valid: float = 100, max_valid: float = 1_000_000) -> np.ndarray:
+    """
+    Boolean mask of the rows drop_invalid_weight keeps, for cleaners that combine
+    several row filters into one selection.
+    """
+    values = pd.to_numeric(weights, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return (values >= min_valid) & (values <= max_valid)
+
 # 8. function for replacing zeros with nans
-def replace_zeros_with_nan(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+def replace_zeros_with_nan(df: pd.DataFrame, columns: List[str], inplace: bool = False) -> pd.DataFrame:
     """
     Replace zeros with NaNs in selected columns.
 
+    Only columns that contain a zero are rewritten; the others are left as they are.
+
     Args:
         df: The dataframe to update.
         columns: List of columns where 0 should be treated as missing.
+        inplace: If True, modify `df` directly instead of working on a copy.
 
     Returns:
         The updated dataframe with 0s replaced by NaNs in the specified columns.
     """
-    df = df.copy()
+    df = working_copy(df, inplace)
     for col in columns:
-        df[col] = df[col].replace(0, np.nan)
+        zeros = df[col].eq(0).fillna(False).to_numpy(dtype=bool)
+        if zeros.any():
+            df[col] = df[col].mask(zeros)
     return df
 
 # 9. function for removing 5.39e-79
@@ -192,86 +231,475 @@ def replace_close_values_with_nan(
     df: pd.DataFrame,
     target: float,
     tolerance: float,
-    columns: Optional[List[str]] = None
+    columns: Optional[List[str]] = None,
+    inplace: bool = False
 ) -> pd.DataFrame:
     """
     Replace values that are within a given tolerance of a target value with NaN.
 
+    All selected columns are compared against the target in one vectorized NumPy pass;
+    only columns that contain a matching value are rewritten.
+
     Args:
         df: The dataframe to work on.
         target: The reference value to compare against.
         tolerance: How close a value can be to the target before being replaced.
         columns: Specific columns to apply this to. If None, it will apply to all numeric columns.
+        inplace: If True, modify `df` directly instead of working on a copy.
 
     Returns:
         The modified dataframe with close values replaced by NaN.
     """
-    df = df.copy()
+    df = working_copy(df, inplace)
     if columns is None:
         columns = df.select_dtypes(include=[np.number]).columns
 
+    present = []
     for col in columns:
         if col in df.columns:
-            df[col] = df[col].apply(
-                lambda x: np.nan if pd.notna(x) and abs(x - target) <= tolerance else x
-            )
+            present.append(col)
         else:
-            print(f"Column '{col}' not found in dataframe.")
+            logger.warning(f"Column '{col}' not found in dataframe.")
+    if not present:
+        return df
+
+    # NaN never compares as close, so missing values are left untouched
+    values = df[present].to_numpy(dtype=np.float64, na_value=np.nan)
+    with np.errstate(invalid="ignore"):
+        close = np.abs(values - target) <= tolerance
+
+    # values may be a read-only view of df under Copy-on-Write, so columns are rebuilt
+    for j in np.flatnonzero(close.any(axis=0)):
+        df[present[j]] = np.where(close[:, j], np.nan, values[:, j])
     return df
 
 # 10. function for exploring the data (DataFrame or a dictionary of DataFrames)
 def explore_data(
     data: Union[pd.DataFrame, Dict[str, pd.DataFrame]],
-    name: Optional[str] = None
+    name: Optional[str] = None,
+    mode: Optional[str] = None,
+    cache: Optional["PipelineCache"] = None
 ) -> None:
     """
-    Print a comprehensive summary of a DataFrame or a dictionary of DataFrames.
+    Log a comprehensive summary of a DataFrame or a dictionary of DataFrames.
+
+    The summary is logged at DIAGNOSTIC level and nothing is computed when that level
+    is disabled, e.g. with LOG_LEVEL=INFO or QUIET. Summary statistics, missing, unique
+    and duplicated values come from data_profile.profile_dataframe.
 
     Args:
         data: A single DataFrame or a dictionary of DataFrames to explore.
         name: Optional dataset name (used if data is a single DataFrame).
+        mode: 'exact', 'approx' (bounded-memory estimates) or 'auto'. Defaults to
+            EXPLORE_MODE (see scripts/config.py).
+        cache: If given, profiles are computed once per content and reused from this
+            cache afterwards; by default nothing is written to disk.
     """
-    
+    if not diagnostics_enabled(logger):
+        return
+    # Imported here: data_profile uses the pipeline cache, which imports this module
+    from scripts.data_profile import profile_dataframe
+
     def explore_single_df(df: pd.DataFrame, dataset_name: str) -> None:
         if df is None or df.empty:
-            print(f"No data to explore for {dataset_name}")
+            logger.warning(f"No data to explore for {dataset_name}", extra={"dataset": dataset_name})
             return
-        print(f"\n--- Exploring {dataset_name} ---")
-        print(f"Shape: {df.shape}")
-        print("\nFirst 5 rows:")
-        print(df.head())
-        print("\nInfo:")
-        df.info()
-        print("\nData types:")
-        print(df.dtypes)
-        print("\nSummary statistics (including categorical):")
-        print(df.describe(include='all').T)
-        print("\nMissing values per column:")
-        print(df.isnull().sum())
-        print("\nColumn names:")
-        print(df.columns.to_list())
-        print("\nUnique values per column:")
-        print(df.nunique())
-        print(f"\nDuplicated rows count: {df.duplicated().sum()}")
-        
+
+        def section(title: str, compute=None) -> None:
+            log_diagnostic(logger, title, compute, dataset=dataset_name)
+
+        def info() -> str:
+            buffer = io.StringIO()
+            df.info(buf=buffer)
+            return buffer.getvalue().rstrip("\n")
+
+        section(f"\n--- Exploring {dataset_name} ---")
+        section(f"Shape: {df.shape}")
+        section("\nFirst 5 rows:", df.head)
+        section("\nInfo:", info)
+        section("\nData types:", lambda: df.dtypes)
+
+        profile = profile_dataframe(df, dataset_name, cache=cache, **({"mode": mode} if mode else {}))
+        approx = " (approximate)" if profile.attrs["mode"] == "approx" else ""
+        section(f"\nSummary statistics (including categorical){approx}:", lambda: profile.drop(columns="missing"))
+        section("\nMissing values per column:", lambda: profile["missing"])
+        section("\nColumn names:", df.columns.to_list)
+        section(f"\nUnique values per column{approx}:", lambda: profile["distinct"])
+        section(f"\nDuplicated rows count: {profile.attrs['duplicated_rows']}")
+
         cat_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
         num_cols = df.select_dtypes(include=['number']).columns.tolist()
-        print("\nCategorical columns:", cat_cols)
-        print("Numerical columns:", num_cols)
-        print("-" * 40)
+        section(f"\nCategorical columns: {cat_cols}")
+        section(f"Numerical columns: {num_cols}")
+        section("-" * 40)
 
     if isinstance(data, dict):
         for dataset_name, df in data.items():            
             if not isinstance(df, pd.DataFrame):
-                print(f"{dataset_name} is not a DataFrame. Skipping...")
+                logger.warning(f"{dataset_name} is not a DataFrame. Skipping...")
                 continue
             try:
                 explore_single_df(df, dataset_name)
             except Exception as e:
-                print(f"Error exploring {dataset_name}: {e}")
+                logger.error(f"Error exploring {dataset_name}: {e}")
     else:
         dataset_name = name or "Dataset"
         try:
             explore_single_df(data, dataset_name)
         except Exception as e:
-            print(f"Error exploring {dataset_name}: {e}")
+            logger.error(f"Error exploring {dataset_name}: {e}")
+
+
+# 11. function for reading the header of a SAS transport (.xpt) file
+def read_xpt_header(file_path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Reads the library, member and variable (NAMESTR) headers of a SAS transport file
+    without decoding any observation rows.
+
+    Only the first member of the file is read, which is how NHANES distributes its files.
+
+    Args:
+        file_path: Path to the .xpt file.
+
+    Returns:
+        Dict[str, Any]: Header information with the keys
+            'member_name', 'label', 'variables' (list of dicts with 'name', 'label',
+            'type', 'length' and 'position'), 'row_length' and 'data_offset'
+            (byte offset of the first observation).
+
+    Raises:
+        ValueError: If the file does not follow the XPORT v5 header layout.
+    """
+    record = XPT_RECORD_LENGTH
+
+    with open(file_path, "rb") as f:
+        library_header = f.read(record)
+        if not library_header.startswith(XPT_HEADER_PREFIX + b"LIBRARY HEADER RECORD"):
+            raise ValueError("Not a SAS transport file: library header record not found")
+
+        # Skip the two library description records
+        f.read(2 * record)
+
+        member_header = f.read(record)
+        if not member_header.startswith(XPT_HEADER_PREFIX + b"MEMBER  HEADER RECORD"):
+            raise ValueError("Member header record not found")
+        namestr_length = int(member_header[74:78])
+
+        descriptor_header = f.read(record)
+        if not descriptor_header.startswith(XPT_HEADER_PREFIX + b"DSCRPTR HEADER RECORD"):
+            raise ValueError("Member descriptor header record not found")
+
+        member_info = f.read(record)
+        member_name = member_info[8:16].decode("ascii", errors="replace").strip()
+        member_label = f.read(record)[32:72].decode("latin-1").strip()
+
+        namestr_header = f.read(record)
+        if not namestr_header.startswith(XPT_HEADER_PREFIX + b"NAMESTR HEADER RECORD"):
+            raise ValueError("NAMESTR header record not found")
+        n_vars = int(namestr_header[54:58])
+
+        # NAMESTR records are packed back to back and padded to a full 80-byte record
+        namestr_bytes = n_vars * namestr_length
+        padded = namestr_bytes + (-namestr_bytes % record)
+        namestr_block = f.read(padded)
+        if len(namestr_block) < namestr_bytes:
+            raise ValueError("File ends inside the NAMESTR records")
+
+        variables = []
+        for i in range(n_vars):
+            entry = namestr_block[i * namestr_length:(i + 1) * namestr_length]
+            var_type, _, length, _ = struct.unpack(">hhhh", entry[:8])
+            variables.append({
+                "name": entry[8:16].decode("ascii", errors="replace").strip(),
+                "label": entry[16:56].decode("latin-1").strip(),
+                "type": "numeric" if var_type == 1 else "char",
+                "length": length,
+                "position": struct.unpack(">i", entry[84:88])[0],
+            })
+
+        obs_header = f.read(record)
+        if not obs_header.startswith(XPT_HEADER_PREFIX + b"OBS     HEADER RECORD"):
+            raise ValueError("OBS header record not found")
+        data_offset = f.tell()
+
+    return {
+        "member_name": member_name,
+        "label": member_label,
+        "variables": variables,
+        "row_length": sum(var["length"] for var in variables),
+        "data_offset": data_offset,
+    }
+
+# 12. function for header-only validation of the configured datasets
+def validate_dataset_headers(datasets: Dict[str, Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Validates datasets by reading only their headers, without decoding any rows.
+
+    For .xpt files, the member headers are parsed and the configured 'columns' are
+    checked against the variable names. For Excel files, only the header row of the
+    configured sheet is read.
+
+    Args:
+        datasets (Dict[str, Dict[str, Any]]): Dataset configuration keyed by dataset name,
+            with 'file_path' and optionally 'columns' and 'sheet_name'.
+
+    Returns:
+        Dict[str, str]: A dictionary mapping dataset names to error messages for any files
+        that failed validation. Valid datasets do not appear in the result.
+    """
+    failed_files = {}
+
+    for name, info in datasets.items():
+        file_path = Path(info["file_path"])
+        if not file_path.exists():
+            logger.warning(f"File not found for: {name}")
+            failed_files[name] = "File missing"
+            continue
+
+        ext = file_path.suffix.lower()
+
+        try:
+            if ext == ".xpt":
+                header = read_xpt_header(file_path)
+                available = [var["name"] for var in header["variables"]]
+            elif ext in [".xls", ".xlsx"]:
+                sheet_name = info.get("sheet_name") or 0
+                available = pd.read_excel(file_path, sheet_name=sheet_name, nrows=0).columns.tolist()
+            else:
+                msg = f"Unsupported file extension: {ext}"
+                logger.warning(msg)
+                failed_files[name] = msg
+                continue
+        except Exception as e:
+            logger.error(f"Failed to read header of {name} due to: {e}")
+            failed_files[name] = f"Error reading file header: {e}"
+            continue
+
+        missing_cols = [col for col in info.get("columns") or [] if col not in available]
+        if missing_cols:
+            logger.warning(f"Missing columns {missing_cols} in {name}")
+            failed_files[name] = f"Missing columns: {missing_cols}"
+            continue
+
+        logger.info(f"Header validated for: {name} ({len(available)} columns)")
+
+    return failed_files
+
+# 13. function for normalizing participant ids (SEQN)
+def normalize_participant_id(ids: pd.Series, id_dtype: Optional[str] = None) -> pd.Series:
+    """
+    Convert raw SEQN values (floats from XPT files, ints or numeric strings from CSV)
+    into participant ids of a single dtype, without a Python call per row.
+
+    Args:
+        ids: Raw participant id values.
+        id_dtype: Target dtype, one of PARTICIPANT_ID_DTYPES:
+            - 'Int64': nullable integers (smallest and fastest to merge on),
+            - 'str': Python strings such as '130378' (the original format),
+            - 'category': categorical of the string ids,
+            - 'string[pyarrow]': Arrow-backed strings.
+            Defaults to config.PARTICIPANT_ID_DTYPE.
+
+    Returns:
+        pd.Series: Normalized ids with the same index and name; missing ids stay missing.
+    """
+    id_dtype = id_dtype or PARTICIPANT_ID_DTYPE
+    if id_dtype not in PARTICIPANT_ID_DTYPES:
+        raise ValueError(f"id_dtype must be one of {PARTICIPANT_ID_DTYPES}, got '{id_dtype}'")
+
+    # SEQN values are whole numbers; truncate like int() would
+    values = np.trunc(
+        pd.to_numeric(ids, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    )
+
+    if id_dtype == "Int64":
+        return pd.Series(pd.array(values, dtype="Int64"), index=ids.index, name=ids.name)
+
+    valid = ~np.isnan(values)
+    if id_dtype == "category":
+        # Build the categories from the unique ids, not from one string per row
+        uniques, inverse = np.unique(values[valid], return_inverse=True)
+        codes = np.full(len(values), -1, dtype=np.int64)
+        codes[valid] = inverse
+        categorical = pd.Categorical.from_codes(codes, categories=uniques.astype(np.int64).astype(str))
+        return pd.Series(categorical, index=ids.index, name=ids.name)
+
+    strings = np.full(len(values), np.nan, dtype=object)
+    strings[valid] = values[valid].astype(np.int64).astype(str)
+
+    if id_dtype == "str":
+        return pd.Series(strings, index=ids.index, name=ids.name)
+    return pd.Series(strings, index=ids.index, name=ids.name, dtype="string[pyarrow]")
+
+
+# 14. function for converting frequency/unit question pairs to weekly frequencies
+def frequency_per_week(
+    freq: pd.Series,
+    unit: pd.Series,
+    limits: Dict[str, float],
+    conversion: Dict[str, float]
+) -> Tuple[pd.Series, pd.Series]:
+    """
+    Caps reported frequencies at a plausible maximum per unit and converts them to
+    times per week, by mapping the unit codes through small lookup arrays.
+
+    Works for any NHANES "how often" question answered as a number plus a unit code
+    (e.g. PAD790Q/PAD790U with units 'D', 'W', 'M', 'Y').
+
+    Args:
+        freq: Reported frequencies.
+        unit: Unit code of each frequency.
+        limits: Maximum plausible frequency per unit code. Units not listed are not capped.
+        conversion: Factor converting each unit to times per week. Units not listed give NaN.
+
+    Returns:
+        Tuple[pd.Series, pd.Series]: The capped frequencies (NaN above the limit or
+        without a unit) and the weekly frequencies.
+    """
+    codes = list(dict.fromkeys(list(limits) + list(conversion)))
+    # Last slot is used for units that are not in the lookup tables
+    limit_table = np.array([limits.get(code, np.inf) for code in codes] + [np.inf], dtype=np.float64)
+    factor_table = np.array([conversion.get(code, np.nan) for code in codes] + [np.nan], dtype=np.float64)
+
+    unit_idx = pd.Index(codes).get_indexer(unit)
+    values = pd.to_numeric(freq, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+    capped = np.where(
+        unit.isna().to_numpy() | ~(values <= limit_table[unit_idx]), np.nan, values
+    )
+    weekly = capped * factor_table[unit_idx]
+    return (
+        pd.Series(capped, index=freq.index, name=freq.name),
+        pd.Series(weekly, index=freq.index)
+    )
+
+
+# 15. function for applying declarative plausibility ranges
+def apply_range_rules(
+    df: pd.DataFrame,
+    rules: List[Dict[str, Any]],
+    inplace: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Applies plausibility range rules to a DataFrame in one masked NumPy pass.
+
+    Each rule is a dict with:
+        - 'name': label used in the audit table,
+        - 'columns': columns the range applies to,
+        - 'min' / 'max': bounds (None for an open end),
+        - 'closed': which bounds are inside the range, one of RANGE_CLOSED (default 'both'),
+        - 'action': 'null' to set out-of-range values to NaN, or 'drop' to remove the row.
+
+    Missing values are never counted as out of range. All rules are checked against the
+    values before any rule is applied.
+
+    Args:
+        df: Input DataFrame.
+        rules: List of range rules.
+        inplace: If True, modify df directly instead of a copy (rows are still dropped
+            in a new DataFrame).
+
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: The cleaned DataFrame, and an audit table with
+        the number of rows and values each rule affected.
+    """
+    columns, lower, upper, include_lower, include_upper, rule_of_column = [], [], [], [], [], []
+    for i, rule in enumerate(rules):
+        closed = rule.get("closed", "both")
+        action = rule.get("action", "null")
+        if closed not in RANGE_CLOSED:
+            raise ValueError(f"Rule '{rule['name']}': closed must be one of {RANGE_CLOSED}, got '{closed}'")
+        if action not in RANGE_ACTIONS:
+            raise ValueError(f"Rule '{rule['name']}': action must be one of {RANGE_ACTIONS}, got '{action}'")
+        missing_cols = [col for col in rule["columns"] if col not in df.columns]
+        if missing_cols:
+            raise KeyError(f"Rule '{rule['name']}': missing columns {missing_cols}")
+        for col in rule["columns"]:
+            columns.append(col)
+            lower.append(-np.inf if rule.get("min") is None else rule["min"])
+            upper.append(np.inf if rule.get("max") is None else rule["max"])
+            include_lower.append(closed in ("both", "left"))
+            include_upper.append(closed in ("both", "right"))
+            rule_of_column.append(i)
+
+    values = df[columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    lower, upper = np.array(lower), np.array(upper)
+    below = np.where(include_lower, values < lower, values <= lower)
+    above = np.where(include_upper, values > upper, values >= upper)
+    out_of_range = below | above
+    rule_of_column = np.array(rule_of_column)
+
+    audit = []
+    drop_rows = np.zeros(len(df), dtype=bool)
+    null_masks: Dict[str, np.ndarray] = {}
+    for i, rule in enumerate(rules):
+        rule_mask = out_of_range[:, rule_of_column == i]
+        rows = rule_mask.any(axis=1)
+        action = rule.get("action", "null")
+        if action == "drop":
+            drop_rows |= rows
+        else:
+            for j, col in enumerate(rule["columns"]):
+                null_masks[col] = null_masks.get(col, False) | rule_mask[:, j]
+        audit.append({
+            "rule": rule["name"],
+            "columns": ", ".join(rule["columns"]),
+            "min": rule.get("min"),
+            "max": rule.get("max"),
+            "closed": rule.get("closed", "both"),
+            "action": action,
+            "rows_affected": int(rows.sum()),
+            "values_affected": int(rule_mask.sum()),
+        })
+
+    # Only rewrite columns with out-of-range values, so untouched columns keep their dtype
+    df = working_copy(df, inplace)
+    for col, mask in null_masks.items():
+        if mask.any():
+            df[col] = np.where(mask, np.nan, values[:, columns.index(col)])
+
+    if drop_rows.any():
+        df = df[~drop_rows]
+    return df, pd.DataFrame(audit)
+
+
+# 16. functions for pandas Copy-on-Write
+def set_copy_on_write(enabled: bool = True) -> None:
+    """
+    Turn pandas Copy-on-Write mode on or off for this process (see config.COPY_ON_WRITE).
+
+    With Copy-on-Write, renames, column selections and row filters share data with the
+    frame they come from and only copy a column when it is modified, so a cleaner never
+    changes the raw dataframe it was given and makes no defensive copies.
+    """
+    pd.set_option("mode.copy_on_write", enabled)
+
+
+def copy_on_write_enabled() -> bool:
+    """
+    Whether pandas Copy-on-Write mode is on.
+    """
+    return pd.get_option("mode.copy_on_write") is True
+
+
+def working_copy(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    """
+    Return the dataframe a helper should modify.
+
+    Helpers only replace whole columns of their working copy, so under Copy-on-Write a
+    shallow copy already keeps `df` unchanged; otherwise the data is copied.
+
+    Args:
+        df: The dataframe passed to the helper.
+        inplace: If True, the helper modifies `df` itself.
+
+    Returns:
+        `df` if inplace, otherwise a copy of it.
+    """
+    if inplace:
+        return df
+    return df.copy(deep=not copy_on_write_enabled())
+
+
+if COPY_ON_WRITE:
+    set_copy_on_write(True)
@@ -0,0 +1,204 @@
+"""
+scripts\\xpt_reader.py
+
+Column-projected reader for SAS transport (XPORT v5) files.
+
+The XPORT format stores observations as fixed-width records, so each variable sits
+at a known byte offset inside every row. This reader uses the NAMESTR header to find
+those offsets and decodes only the requested columns:
+- Streams rows in chunks, so peak memory follows the projected width, not the file width.
+- Converts IBM 370 floating point values to IEEE doubles exactly like pandas.read_sas.
+- Can be used as a drop-in replacement for pd.read_sas(..., format="xport").
+"""
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from scripts.utils import read_xpt_header, XPT_RECORD_LENGTH
+
+# Default number of observations decoded per chunk
+DEFAULT_CHUNKSIZE = 50_000
+
+# Eight ASCII blanks read as a big integer; used to find the padding after the last row
+BLANK_WORD = np.frombuffer(b" " * 8, dtype=np.uint64)[0]
+
+
+def _count_rows(file_path: Path, header: Dict[str, Any]) -> int:
+    """
+    Counts the observations in an XPORT file from its size, ignoring the blank padding
+    that fills up the last 80-byte record.
+    """
+    total_length = file_path.stat().st_size - header["data_offset"]
+    row_length = header["row_length"]
+    if row_length == 0:
+        return 0
+    if row_length > XPT_RECORD_LENGTH:
+        return total_length // row_length
+
+    with open(file_path, "rb") as f:
+        f.seek(-XPT_RECORD_LENGTH, 2)
+        last_record = np.frombuffer(f.read(XPT_RECORD_LENGTH), dtype=np.uint64)
+    tail_pad = 8 * np.count_nonzero(last_record == BLANK_WORD)
+    return (total_length - tail_pad) // row_length
+
+
+def _ibm_to_ieee(raw: np.ndarray) -> np.ndarray:
+    """
+    Converts an (n, length) uint8 array of IBM 370 floats into float64 values.
+
+    Values shorter than 8 bytes are right-padded with zeros. SAS missing values
+    ('.', '.A'-'.Z' and '._') are returned as NaN.
+    """
+    n, length = raw.shape
+    padded = np.zeros((n, 8), dtype=np.uint8)
+    padded[:, :length] = raw
+
+    words = padded.view(">u4")
+    xport1 = words[:, 0].astype(np.uint32)
+    xport2 = words[:, 1].astype(np.uint32)
+
+    first_byte = padded[:, 0]
+    missing = (
+        ((first_byte >= 0x41) & (first_byte <= 0x5A)) | (first_byte == 0x5F) | (first_byte == 0x2E)
+    ) & ~padded[:, 1:].any(axis=1)
+
+    # Normalize the hexadecimal mantissa into a binary one
+    shift = np.zeros(n, dtype=np.uint32)
+    shift[(xport1 & 0x00200000) != 0] = 1
+    shift[(xport1 & 0x00400000) != 0] = 2
+    shift[(xport1 & 0x00800000) != 0] = 3
+
+    ieee1 = (xport1 & 0x00FFFFFF) >> shift
+    ieee2 = (xport2 >> shift) | ((xport1 & 0x00000007) << (29 + (3 - shift)))
+    ieee1 &= 0xFFEFFFFF
+    ieee1 |= (
+        (((((xport1 >> 24) & 0x7F) - 65) << 2) + shift + 1023) << 20
+    ) | (xport1 & 0x80000000)
+
+    ieee = np.empty(n, dtype=[("f0", ">u4"), ("f1", ">u4")])
+    ieee["f0"] = ieee1
+    ieee["f1"] = ieee2
+    values = ieee.view(">f8").astype(np.float64)
+    values[missing] = np.nan
+    return values
+
+
+def _decode_char(raw: np.ndarray, encoding: Optional[str]) -> np.ndarray:
+    """
+    Converts an (n, length) uint8 array of fixed-width text into an object array,
+    stripping trailing blanks. Values stay as bytes unless an encoding is given.
+    """
+    values = raw.copy().view(f"S{raw.shape[1]}").ravel()
+    if encoding is None:
+        return np.array([value.rstrip() for value in values], dtype=object)
+    return np.array([value.rstrip().decode(encoding) for value in values], dtype=object)
+
+
+def _project(header: Dict[str, Any], columns: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """
+    Returns the NAMESTR entries for the requested columns, in the requested order.
+
+    Raises:
+        KeyError: If any requested column is not in the file.
+    """
+    by_name = {var["name"]: var for var in header["variables"]}
+    if columns is None:
+        return header["variables"]
+
+    missing_cols = [col for col in columns if col not in by_name]
+    if missing_cols:
+        raise KeyError(f"Missing columns {missing_cols}")
+    return [by_name[col] for col in columns]
+
+
+def iter_xpt_chunks(
+    file_path: Union[str, Path],
+    columns: Optional[List[str]] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    encoding: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Streams an XPORT file as DataFrames of at most `chunksize` rows, decoding only
+    the requested columns.
+
+    Args:
+        file_path: Path to the .xpt file.
+        columns: Columns to decode, in output order. None decodes every column.
+        chunksize: Number of observations per chunk.
+        encoding: Encoding for character columns. None keeps them as bytes, like pandas.
+
+    Yields:
+        pd.DataFrame: The next chunk of projected rows.
+    """
+    path = Path(file_path)
+    header = read_xpt_header(path)
+    fields = _project(header, columns)
+    row_length = header["row_length"]
+    n_rows = _count_rows(path, header)
+
+    with open(path, "rb") as f:
+        f.seek(header["data_offset"])
+        start = 0
+        while start < n_rows:
+            count = min(chunksize, n_rows - start)
+            block = np.frombuffer(f.read(count * row_length), dtype=np.uint8)
+            rows = block.reshape(count, row_length)
+
+            data = {}
+            for field in fields:
+                raw = rows[:, field["position"]:field["position"] + field["length"]]
+                if field["type"] == "numeric":
+                    data[field["name"]] = _ibm_to_ieee(raw)
+                else:
+                    data[field["name"]] = _decode_char(raw, encoding)
+
+            yield pd.DataFrame(data, columns=[field["name"] for field in fields],
+                               index=pd.RangeIndex(start, start + count))
+            start += count
+
+
+def read_xpt_columns(
+    file_path: Union[str, Path],
+    columns: Optional[List[str]] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    encoding: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Reads the requested columns of an XPORT file into a single DataFrame.
+
+    Output arrays are allocated once for the projected columns and filled chunk by
+    chunk, so the full-width rows are never held in memory at the same time.
+
+    Args:
+        file_path: Path to the .xpt file.
+        columns: Columns to decode, in output order. None decodes every column.
+        chunksize: Number of observations decoded per chunk.
+        encoding: Encoding for character columns. None keeps them as bytes, like pandas.
+
+    Returns:
+        pd.DataFrame: The projected data, with the same values and dtypes as
+        pd.read_sas(file_path, format="xport")[columns].
+    """
+    path = Path(file_path)
+    header = read_xpt_header(path)
+    fields = _project(header, columns)
+    n_rows = _count_rows(path, header)
+
+    data = {
+        field["name"]: np.empty(n_rows, dtype=np.float64 if field["type"] == "numeric" else object)
+        for field in fields
+    }
+    for chunk in iter_xpt_chunks(path, columns, chunksize=chunksize, encoding=encoding):
+        start, stop = chunk.index.start, chunk.index.stop
+        for name, values in data.items():
+            values[start:stop] = chunk[name].to_numpy()
+
+    return pd.DataFrame(data, columns=[field["name"] for field in fields])
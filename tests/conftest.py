@@ -0,0 +1,12 @@
+"""
+tests\\conftest.py
+
+Shared setup of the pytest suite: makes the project root importable as in the scripts.
+"""
+import sys
+from pathlib import Path
+
+# Add project root to sys.path
+project_root = Path(__file__).parent.parent.resolve()
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
@@ -0,0 +1,27 @@
+"""
+tests\\test_calculating_usda_hei_score.py
+
+Checks of the FPED intake aggregation (scripts/calculating_usda_hei_score.py).
+"""
+import numpy as np
+import pandas as pd
+
+from scripts.calculating_usda_hei_score import FPED_NUTRIENT_COLS, aggregate_fped_intake, build_fped_matrix
+
+
+def test_aggregate_fped_intake_skips_unobserved_categories():
+    fped = pd.DataFrame(np.ones((2, len(FPED_NUTRIENT_COLS))), columns=FPED_NUTRIENT_COLS)
+    fped.insert(0, "FOODCODE", [11_000_000, 11_000_001])
+    foods = pd.DataFrame({
+        "participant_id": pd.Categorical([3, 1, 3], categories=[1, 2, 3, 4]),
+        "food_code": [11_000_000.0, 11_000_001.0, 11_000_001.0],
+        "grams_consumed": [100.0, 50.0, 200.0],
+        "energy_kcal": [10.0, 20.0, 30.0],
+        "food_item_weight": [1.0, 2.0, 3.0],
+    })
+
+    intake = aggregate_fped_intake(foods, build_fped_matrix(fped))
+
+    assert intake["participant_id"].tolist() == [1, 3]
+    assert intake["F_TOTAL_TOT"].tolist() == [0.5, 3.0]
+    assert intake["energy"].tolist() == [20.0, 40.0]
@@ -0,0 +1,32 @@
+"""
+tests\\test_clean_diet.py
+
+Checks of the out-of-core individual foods cleaner (scripts/clean_diet.py).
+"""
+import pandas as pd
+
+from scripts import clean_diet
+from scripts.cycles import write_synthetic_cycle
+from scripts.storage import load_dataframe, staging_path
+
+
+def test_failed_chunked_run_keeps_previous_output(tmp_path, monkeypatch):
+    write_synthetic_cycle("J", tmp_path / "raw", n_participants=200)
+    raw_path = tmp_path / "raw" / "DR1IFF_J.xpt"
+    output_path = tmp_path / "clean" / "dr1iff_l_clean.csv"
+    monkeypatch.setattr(clean_diet, "CLEAN_DATA_DIR", tmp_path / "clean")
+
+    assert clean_diet.clean_individual_diet_chunked(raw_path, chunksize=300) is not None
+    previous = load_dataframe(output_path)
+
+    chunks = clean_diet.iter_xpt_chunks
+
+    def failing_chunks(*args, **kwargs):
+        yield next(chunks(*args, **kwargs))
+        raise OSError("truncated file")
+
+    monkeypatch.setattr(clean_diet, "iter_xpt_chunks", failing_chunks)
+    assert clean_diet.clean_individual_diet_chunked(raw_path, chunksize=300) is None
+
+    pd.testing.assert_frame_equal(load_dataframe(output_path), previous)
+    assert not staging_path(output_path).with_suffix("").exists()
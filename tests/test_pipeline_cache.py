@@ -0,0 +1,68 @@
+"""
+tests\\test_pipeline_cache.py
+
+Checks of the stage cache keys (scripts/pipeline_cache.py), including datasets stored
+as folders of part files by the chunked cleaners.
+"""
+import numpy as np
+import pandas as pd
+
+from scripts.calculating_usda_hei_score import FPED_NUTRIENT_COLS, calculate_hei_scores
+from scripts.pipeline_cache import PipelineCache, hash_file
+from scripts.storage import parts_dir, save_dataframe, save_part
+
+
+def _recall_files(clean_dir, n_participants=20, foods_per_participant=5, chunks=2):
+    """
+    Writes a small day-1 recall (individual foods as part files) and FPED table.
+    """
+    rng = np.random.default_rng(0)
+    codes = np.arange(11_000_000, 11_000_010)
+    fped = pd.DataFrame(rng.uniform(0, 2, (len(codes), len(FPED_NUTRIENT_COLS))), columns=FPED_NUTRIENT_COLS)
+    fped.insert(0, "FOODCODE", codes)
+    fped.insert(1, "DESCRIPTION", [f"food {code}" for code in codes])
+
+    ids = np.arange(1, n_participants + 1)
+    foods = pd.DataFrame({
+        "participant_id": np.repeat(ids, foods_per_participant),
+        "food_code": rng.choice(codes, n_participants * foods_per_participant).astype(float),
+        "grams_consumed": rng.uniform(10, 300, n_participants * foods_per_participant),
+        "energy_kcal": rng.uniform(10, 400, n_participants * foods_per_participant),
+        "food_item_weight": np.repeat(rng.uniform(1_000, 50_000, n_participants), foods_per_participant),
+    })
+    totals = pd.DataFrame({
+        "participant_id": ids,
+        "energy_kcal": rng.uniform(1_000, 3_000, n_participants),
+        "satfat_g": rng.uniform(10, 40, n_participants),
+        "sodium_mg": rng.uniform(1_000, 5_000, n_participants),
+        "total_diet_weight": foods.groupby("participant_id")["food_item_weight"].first().to_numpy(),
+    })
+
+    foods_path = clean_dir / "dr1iff_l_clean.csv"
+    rows_per_chunk = -(-len(foods) // chunks)
+    for index, start in enumerate(range(0, len(foods), rows_per_chunk)):
+        save_part(foods.iloc[start:start + rows_per_chunk], foods_path, index, "parquet")
+    save_dataframe(totals, clean_dir / "dr1tot_l_clean.csv", "parquet")
+    save_dataframe(fped, clean_dir / "fped_1720_clean.csv", "parquet")
+    return parts_dir(foods_path)
+
+
+def test_hash_file_of_part_folder_follows_its_parts(tmp_path):
+    folder = _recall_files(tmp_path)
+    before = hash_file(folder)
+    assert hash_file(folder) == before
+
+    save_part(pd.DataFrame({"participant_id": [99]}), folder, 2, "parquet")
+    assert hash_file(folder) != before
+
+
+def test_hei_cache_with_chunked_foods(tmp_path):
+    clean_dir = tmp_path / "clean"
+    clean_dir.mkdir()
+    _recall_files(clean_dir)
+    cache = PipelineCache(tmp_path / "cache")
+
+    first = calculate_hei_scores(clean_dir, tmp_path / "processed", save_csv=False, cache=cache)
+    reused = calculate_hei_scores(clean_dir, tmp_path / "processed", save_csv=False, cache=cache)
+    assert cache.report()["status"].tolist()[-1] == "reused"
+    pd.testing.assert_frame_equal(reused.reset_index(drop=True), first.reset_index(drop=True), check_dtype=False)
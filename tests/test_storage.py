@@ -0,0 +1,19 @@
+"""
+tests\\test_storage.py
+
+Checks of how stored datasets are found (scripts/storage.py).
+"""
+import pandas as pd
+
+from scripts.storage import resolve_path, save_dataframe
+
+
+def test_resolve_path_prefers_the_path_as_given(tmp_path):
+    df = pd.DataFrame({"participant_id": [1, 2]})
+    csv_path = save_dataframe(df, tmp_path / "demo_l_clean.csv", "csv")
+    parquet_path = save_dataframe(df, tmp_path / "demo_l_clean.csv", "parquet")
+
+    assert resolve_path(csv_path) == csv_path
+    assert resolve_path(parquet_path) == parquet_path
+    assert resolve_path(tmp_path / "demo_l_clean.xpt") is not None
+    assert resolve_path(tmp_path / "missing_clean.csv") is None
@@ -0,0 +1,25 @@
+"""
+tests\\test_utils.py
+
+Checks of the shared helpers (scripts/utils.py).
+"""
+import pandas as pd
+
+from scripts import data_profile
+from scripts.pipeline_cache import PipelineCache
+from scripts.pipeline_log import log_level
+from scripts.utils import explore_data
+
+
+def test_explore_data_caches_profiles_only_when_asked(tmp_path, monkeypatch):
+    df = pd.DataFrame({"participant_id": [1, 2, 3], "age": [30.0, 41.0, None]})
+    monkeypatch.setattr(data_profile, "PipelineCache", lambda *args, **kwargs: PipelineCache(tmp_path / "default"))
+
+    with log_level("DIAGNOSTIC"):
+        explore_data(df, "DEMO_L")
+        assert not (tmp_path / "default").exists()
+
+        cache = PipelineCache(tmp_path / "cache")
+        explore_data(df, "DEMO_L", cache=cache)
+        explore_data(df, "DEMO_L", cache=cache)
+    assert cache.report()["status"].tolist()[-1] == "reused"
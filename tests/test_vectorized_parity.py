@@ -0,0 +1,94 @@
+"""
+tests\\test_vectorized_parity.py
+
+Checks that the vectorized pipeline functions give the same results as the row-by-row
+reference versions timed in scripts/benchmarks.py.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.benchmarks import (
+    XPT_ARTIFACT,
+    _edge_values,
+    _merge_fped_intake,
+    _replace_close_values_apply,
+    make_artifact_frame
+)
+from scripts.calculating_usda_hei_score import FPED_NUTRIENT_COLS, aggregate_fped_intake, build_fped_matrix
+from scripts.feature_engineering import (
+    THRESHOLD_TABLE,
+    SCALAR_CATEGORIZERS,
+    categorize_column,
+    label_meds,
+    label_meds_column,
+    glucose_flags,
+    glucose_flag_columns
+)
+from scripts.utils import normalize_participant_id, replace_close_values_with_nan
+
+N_ROWS = 20_000
+
+
+def test_replace_close_values_matches_apply():
+    df = make_artifact_frame(N_ROWS)
+    columns = df.columns.tolist()
+    expected = _replace_close_values_apply(df, XPT_ARTIFACT, 1e-80, columns)
+
+    pd.testing.assert_frame_equal(replace_close_values_with_nan(df, XPT_ARTIFACT, 1e-80, columns), expected)
+    replace_close_values_with_nan(df, XPT_ARTIFACT, 1e-80, columns, inplace=True)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_normalize_participant_id_matches_str_int():
+    rng = np.random.default_rng(0)
+    seqn = pd.Series(rng.permutation(N_ROWS) + 130_000, dtype=np.float64, name="participant_id")
+    seqn[rng.random(N_ROWS) < 0.01] = np.nan
+
+    legacy = seqn.apply(lambda x: str(int(x)) if pd.notnull(x) else np.nan)
+    pd.testing.assert_series_equal(normalize_participant_id(seqn, "str"), legacy)
+
+
+@pytest.mark.parametrize("name", list(THRESHOLD_TABLE))
+def test_categorize_column_matches_scalar(name):
+    rng = np.random.default_rng(0)
+    columns = [pd.Series(_edge_values(rng, spec["edges"], N_ROWS)) for spec in THRESHOLD_TABLE[name]["inputs"]]
+    expected = pd.Series([SCALAR_CATEGORIZERS[name](*row) for row in zip(*columns)], index=columns[0].index)
+
+    result = categorize_column(name, *columns)
+    assert result.cat.ordered
+    pd.testing.assert_series_equal(result.astype(object), expected)
+
+
+def test_label_meds_column_matches_scalar():
+    meds = pd.Series(np.random.default_rng(0).choice([0.0, 1.0, np.nan], size=N_ROWS))
+
+    result = label_meds_column(meds)
+    assert result.cat.ordered
+    pd.testing.assert_series_equal(result.astype(object), meds.apply(label_meds))
+
+
+def test_glucose_flag_columns_match_scalar():
+    glucose = pd.Series(_edge_values(np.random.default_rng(0), [70, 140], N_ROWS))
+
+    pd.testing.assert_frame_equal(glucose_flag_columns(glucose), glucose.apply(glucose_flags).apply(pd.Series))
+
+
+def test_sparse_fped_aggregation_matches_merge():
+    rng = np.random.default_rng(0)
+    codes = np.arange(11_000_000, 11_000_500)
+    fped = pd.DataFrame(rng.gamma(0.5, 1.0, size=(len(codes), len(FPED_NUTRIENT_COLS))), columns=FPED_NUTRIENT_COLS)
+    fped.insert(0, "FOODCODE", codes)
+    foods = pd.DataFrame({
+        "participant_id": pd.array(np.repeat(np.arange(500) + 130_000, 30), dtype="Int64"),
+        "food_code": rng.choice(codes, size=15_000).astype(np.float64),
+        "grams_consumed": rng.gamma(2.0, 80.0, size=15_000),
+        "energy_kcal": rng.gamma(2.0, 90.0, size=15_000),
+        "food_item_weight": rng.uniform(0.5, 2.0, size=15_000),
+    })
+
+    pd.testing.assert_frame_equal(
+        aggregate_fped_intake(foods, build_fped_matrix(fped)),
+        _merge_fped_intake(foods, fped),
+        rtol=1e-10
+    )